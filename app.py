@@ -1,77 +1,259 @@
-from fastapi import FastAPI, File, UploadFile, HTTPException
-from fastapi.responses import JSONResponse
-from src.pipeline.faceswap_pipeline import initiate_face_swapper
+from fastapi import FastAPI, File, Form, Request, UploadFile, HTTPException
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse, Response, StreamingResponse
+from starlette.background import BackgroundTask
+from starlette.concurrency import run_in_threadpool
+from typing import List
+from contextlib import asynccontextmanager
+from dataclasses import asdict
+from src.pipeline.faceswap_pipeline import (
+    initiate_face_swapper, initiate_identity_registration, initiate_video_face_swap,
+    initiate_gallery_enrollment, initiate_gallery_match
+)
+from src.components.model_registry import get_model_registry
+from src.components.detection_cache import get_detection_cache
+from src.components.result_store import get_result_store
+from src.components.identity_registry import get_identity_registry
+from src.components.gallery_index import PERSON_ID_PATTERN, get_gallery_index
+from src.components.artifact_sink import get_artifact_sink
+from src.components.inference_executor import get_inference_executor
+from src.components.session_store import get_session_store
+from src.components.batch_jobs import get_batch_job_manager
+from src.components.micro_batcher import get_micro_batch_scheduler
+from src.components.metrics import get_metrics
+from src.components.model_store import get_model_store
+from src.components.thumbnailer import THUMBNAIL_MODES, get_thumbnailer
+from src.components.worker_supervisor import get_worker_index
+from src.entity.face_swap_artifact import SessionArtifact
+from src.exceptions import InferenceQueueFullError, InferenceTimeoutError
+from src.constants import UPLOADS_DIR, VIDEO_TIMEOUT_SECONDS
+from src.utils import IMAGE_FORMATS, compute_image_hash, decode_image_bytes
 from src.logger import logging
 import os
+import sys
+import json
+import uuid
 import base64
+import asyncio
+import shutil
+import zipfile
+import tempfile
+import time
 
-app = FastAPI()
 
-# Global variable to store the latest upload data
-latest_session_data = {}
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Fetch and verify missing or changed weights before the models are loaded. Under serve.py
+    # the parent process may have done both already, before forking this worker
+    model_store = get_model_store()
+    model_registry = get_model_registry()
+    if model_store.model_store_config.prefetch_on_startup and not model_registry.is_ready:
+        for artifact in model_store.prefetch():
+            if artifact.error is not None:
+                logging.error(f"Model {artifact.name} is not installed: {artifact.error}")
+    # Load and warm up the models once, before the first request is served
+    try:
+        model_registry.load()
+    except Exception as e:
+        logging.error(f"Model registry failed to load at startup: {str(e)}", exc_info=True)
+    # Pick up batch jobs that were interrupted by the previous shutdown; with several workers, only the first does
+    if get_worker_index() in (None, 0):
+        try:
+            get_batch_job_manager().resume()
+        except Exception as e:
+            logging.error(f"Failed to resume batch jobs: {str(e)}", exc_info=True)
+    yield
+    get_batch_job_manager().shutdown(wait=False)
+    get_inference_executor().shutdown(wait=False)
+    get_micro_batch_scheduler().close()
+    get_thumbnailer().shutdown(wait=False)
+    get_artifact_sink().shutdown(wait=True)
+
+
+app = FastAPI(lifespan=lifespan)
+
+
+def _runtime_gauges() -> list:
+    """
+    Current state the components already track, read when /metrics is scraped.
+    """
+    executor = get_inference_executor().stats()
+    cache = get_detection_cache().stats()
+    gauges = [
+        ("faceswap_models_ready", "1 when the models are loaded and warmed up.", int(get_model_registry().is_ready), {}),
+        ("faceswap_inference_in_flight", "Requests running or queued in the inference executor.", executor.in_flight, {}),
+        ("faceswap_inference_queue_depth", "Requests waiting for a free inference worker.", executor.queue_depth, {}),
+        ("faceswap_inference_rejected", "Requests rejected because the inference queue was full.", executor.rejected, {}),
+        ("faceswap_inference_timed_out", "Requests that exceeded the inference timeout.", executor.timed_out, {}),
+        ("faceswap_detection_cache_entries", "Images in the detection cache.", cache.entries, {}),
+        ("faceswap_detection_cache_bytes", "Estimated memory used by the detection cache.", cache.bytes_used, {}),
+        ("faceswap_detection_cache_hit_rate", "Detection cache hit rate since startup.", cache.hit_rate, {}),
+    ]
+    for stats in get_micro_batch_scheduler().stats():
+        gauges.append(("faceswap_micro_batch_avg_size", "Average merged batch size.", stats.avg_batch_size, {"model": stats.name}))
+    return gauges
+
+
+metrics = get_metrics()
+if metrics.enabled:
+    metrics.add_collector(_runtime_gauges)
+
+    @app.middleware("http")
+    async def record_request_metrics(request: Request, call_next):
+        # Stage spans recorded while serving this request (including in the inference workers) land in its trace
+        token = metrics.start_trace()
+        start = time.perf_counter()
+        status_code = 500
+        try:
+            response = await call_next(request)
+            status_code = response.status_code
+        finally:
+            spans = metrics.end_trace(token)
+            elapsed = time.perf_counter() - start
+            route = request.scope.get("route")
+            metrics.observe_request(request.method, getattr(route, "path", "unmatched"), status_code, elapsed)
+        if metrics.server_timing:
+            response.headers["Server-Timing"] = metrics.server_timing_header(spans, elapsed)
+        return response
+
+# Errors that endpoints re-raise untouched instead of wrapping them in a 500
+PASSTHROUGH_ERRORS = (HTTPException, InferenceQueueFullError, InferenceTimeoutError)
+
+@app.exception_handler(InferenceQueueFullError)
+async def inference_queue_full_handler(request: Request, exc: InferenceQueueFullError):
+    logging.warning(f"Rejecting request: {str(exc)}")
+    return JSONResponse(status_code=503, content={"detail": str(exc)}, headers={"Retry-After": str(exc.retry_after)})
+
+@app.exception_handler(InferenceTimeoutError)
+async def inference_timeout_handler(request: Request, exc: InferenceTimeoutError):
+    logging.warning(f"Request timed out: {str(exc)}")
+    return JSONResponse(status_code=504, content={"detail": str(exc)})
+
+def _persist_upload(upload: UploadFile, data: bytes):
+    """
+    Queues an uploaded file for the optional artifact sink under a unique name.
+    """
+    filename = os.path.basename(upload.filename or "upload")
+    return get_artifact_sink().submit(os.path.join(UPLOADS_DIR, f"{uuid.uuid4().hex[:8]}_{filename}"), data)
+
+def _thumbnail_response(thumbnail) -> dict:
+    face = {"index": thumbnail.index, "bbox": thumbnail.bbox}
+    if thumbnail.data is not None:
+        face["base64"] = f"data:{thumbnail.media_type};base64,{base64.b64encode(thumbnail.data).decode('utf-8')}"
+        face["width"], face["height"] = thumbnail.width, thumbnail.height
+        face["path"] = thumbnail.path
+    return face
+
+def _require_identity(identity_id: str) -> None:
+    """
+    Rejects a malformed identity id with 400 and an unknown one with 404, before any work is done.
+    """
+    try:
+        known = get_identity_registry().get(identity_id) is not None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not known:
+        raise HTTPException(status_code=404, detail=f"Unknown identity: {identity_id}")
 
 @app.post("/upload-images/")
-async def upload_images(multi_face_image: UploadFile = File(...), single_face_image: UploadFile = File(...)):
+async def upload_images(multi_face_image: UploadFile = File(...), single_face_image: UploadFile = File(None),
+                        identity_id: str = Form(None), faces_mode: str = Form(None)):
+    """
+    Detects the faces of the multi-face image. Each face comes back with its bounding box in
+    the upload's pixel coordinates and, unless faces_mode=coords, a downscaled thumbnail.
+    """
     try:
-        global latest_session_data
-        
-        multi_face_path = os.path.join("artifacts", multi_face_image.filename)
-        single_face_path = os.path.join("artifacts", single_face_image.filename)
-        os.makedirs("artifacts", exist_ok=True)
+        if single_face_image is None and identity_id is None:
+            raise HTTPException(status_code=400, detail="Provide either single_face_image or identity_id.")
+        if faces_mode is not None and faces_mode not in THUMBNAIL_MODES:
+            raise HTTPException(status_code=400, detail=f"Invalid faces_mode. Expected one of {list(THUMBNAIL_MODES)}")
+        if identity_id is not None:
+            _require_identity(identity_id)
 
-        with open(multi_face_path, "wb") as f:
-            f.write(await multi_face_image.read())
-        with open(single_face_path, "wb") as f:
-            f.write(await single_face_image.read())
+        with metrics.span("read_upload"):
+            multi_face_bytes = await multi_face_image.read()
+        with metrics.span("decode"):
+            img_multi_faces = decode_image_bytes(multi_face_bytes)
+        if img_multi_faces is None:
+            raise HTTPException(status_code=400, detail="Could not decode the multi-face image.")
+        _persist_upload(multi_face_image, multi_face_bytes)
 
-        logging.info(f"Calling initiate_face_swapper with {multi_face_path}, {single_face_path}")
-        face_swapper = initiate_face_swapper(multi_face_path, single_face_path, selected_indices=None)
-        
-        if not face_swapper.detected_face_paths:
-            latest_session_data = {
-                "multi_face_path": multi_face_path,
-                "single_face_path": single_face_path,
-                "detected_faces": []
-            }
+        img_single_face = None
+        single_face_bytes = None
+        if identity_id is None:
+            with metrics.span("read_upload"):
+                single_face_bytes = await single_face_image.read()
+            with metrics.span("decode"):
+                img_single_face = decode_image_bytes(single_face_bytes)
+            if img_single_face is None:
+                raise HTTPException(status_code=400, detail="Could not decode the single-face image.")
+            _persist_upload(single_face_image, single_face_bytes)
+
+        with metrics.span("image_hash"):
+            multi_face_hash = compute_image_hash(img_multi_faces)
+        # The session id is chosen up front so persisted thumbnails land in a directory of their own
+        session_id = uuid.uuid4().hex
+        logging.info(f"Calling initiate_face_swapper for detection, identity: {identity_id}")
+        face_swapper = await get_inference_executor().run(
+            initiate_face_swapper,
+            img_multi_faces, img_single_face, selected_indices=None, source_identity_id=identity_id,
+            detect_only=True, multi_face_hash=multi_face_hash, name_prefix=session_id, thumbnail_mode=faces_mode
+        )
+
+        with metrics.span("base64"):
+            detected_faces = [_thumbnail_response(thumbnail) for thumbnail in face_swapper.thumbnails]
+
+        session_id = get_session_store().create(SessionArtifact(
+            multi_face_bytes=multi_face_bytes,
+            single_face_bytes=single_face_bytes,
+            multi_face_hash=multi_face_hash,
+            identity_id=identity_id,
+            faces=face_swapper.faces,
+            # Only the boxes are kept with the session; the thumbnails have been sent
+            detected_faces=[{"index": face["index"], "bbox": face["bbox"]} for face in detected_faces],
+            img_multi_faces=img_multi_faces,
+            img_single_face=img_single_face,
+            session_id=session_id
+        ))
+
+        if not detected_faces:
             return {
                 "message": "No faces detected in the multi-face image. Please try different images.",
+                "session_id": session_id,
                 "detected_faces": [],
-                "multi_face_path": multi_face_path,
-                "single_face_path": single_face_path
+                "identity_id": identity_id
             }
 
-        detected_faces = [
-            {"index": i + 1, "base64": f"data:image/jpeg;base64,{base64_face}", "path": path}
-            for i, (base64_face, path) in enumerate(zip(face_swapper.base64_faces, face_swapper.detected_face_paths))
-        ]
-        
-        latest_session_data = {
-            "multi_face_path": multi_face_path,
-            "single_face_path": single_face_path,
-            "detected_faces": detected_faces
-        }
-        
         return {
-            "message": f"Detected {len(face_swapper.detected_face_paths)} faces. Please select faces to swap by index (e.g., '1,3' or '-1' for all) in the /swap-faces/ endpoint.",
+            "message": f"Detected {len(detected_faces)} faces. Please select faces to swap by index (e.g., '1,3' or '-1' for all) in the /swap-faces/ endpoint with this session_id.",
+            "session_id": session_id,
             "detected_faces": detected_faces,
-            "multi_face_path": multi_face_path,
-            "single_face_path": single_face_path
+            "identity_id": identity_id
         }
+    except PASSTHROUGH_ERRORS:
+        raise
     except Exception as e:
         logging.error(f"Error in image upload endpoint: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Internal Server Error: {str(e)}")
 
 @app.post("/swap-faces/")
-async def swap_faces(indices: str):
+async def swap_faces(session_id: str, indices: str, output_format: str = "jpeg", response_mode: str = "binary"):
+    """
+    Returns the swapped image as raw image bytes (image/jpeg or image/webp).
+    Set response_mode=base64 to get the previous JSON body with a base64 data URI.
+    """
     try:
-        if not latest_session_data:
-            logging.error("No session data available. Please upload images first.")
-            raise HTTPException(status_code=404, detail="No session data available. Please upload images first.")
-        
-        multi_face_path = latest_session_data["multi_face_path"]
-        single_face_path = latest_session_data["single_face_path"]
-        detected_faces = latest_session_data["detected_faces"]
-        
+        session = get_session_store().get(session_id)
+        if session is None:
+            logging.error(f"Unknown or expired session: {session_id}")
+            raise HTTPException(status_code=404, detail="Session not found or expired. Please upload images first.")
+        if output_format not in IMAGE_FORMATS:
+            raise HTTPException(status_code=400, detail=f"Invalid output_format. Expected one of {sorted(IMAGE_FORMATS)}")
+        if response_mode not in ("binary", "base64"):
+            raise HTTPException(status_code=400, detail="Invalid response_mode. Expected 'binary' or 'base64'")
+        if session.identity_id is not None:
+            # The identity may have been deleted since the upload
+            _require_identity(session.identity_id)
+
         if indices == "-1":
             selected_indices = None
         else:
@@ -79,26 +261,398 @@ async def swap_faces(indices: str):
                 selected_indices = [int(i) - 1 for i in indices.split(",") if i.strip().isdigit()]
                 if not selected_indices:
                     raise ValueError("Invalid indices provided")
-                max_index = len(detected_faces)
+                max_index = len(session.faces)
                 if any(i < 0 or i >= max_index for i in selected_indices):
                     raise ValueError(f"Indices out of range. Valid range: 1 to {max_index}")
             except ValueError as e:
                 logging.warning(f"Invalid indices input: {indices}. Error: {str(e)}")
                 raise HTTPException(status_code=400, detail=f"Invalid indices: {str(e)}")
 
-        logging.info(f"Calling initiate_face_swapper with {multi_face_path}, {single_face_path}, indices: {indices}")
-        artifact = initiate_face_swapper(multi_face_path, single_face_path, selected_indices)
+        logging.info(f"Calling initiate_face_swapper with indices: {indices}")
+        artifact = await get_inference_executor().run(
+            initiate_face_swapper,
+            session.img_multi_faces, session.img_single_face, selected_indices, source_identity_id=session.identity_id,
+            output_format=output_format, multi_face_hash=session.multi_face_hash, faces=session.faces
+        )
         
-        if not artifact.result_image_path or not os.path.exists(artifact.result_image_path):
-            logging.error(f"Face swap failed. Result image not found at: {artifact.result_image_path}")
+        if not artifact.result_image_bytes:
+            logging.error("Face swap failed. Result image not generated.")
             raise HTTPException(status_code=500, detail="Face swap failed. Result image not generated.")
 
-        # Convert result image to base64 with tag
-        with open(artifact.result_image_path, "rb") as img_file:
-            img_base64 = base64.b64encode(img_file.read()).decode("utf-8")
-        
-        return JSONResponse(content={"base64": f"data:image/jpeg;base64,{img_base64}"})
+        if response_mode == "base64":
+            with metrics.span("base64"):
+                img_base64 = base64.b64encode(artifact.result_image_bytes).decode("utf-8")
+            return JSONResponse(content={"base64": f"data:{artifact.result_media_type};base64,{img_base64}"},
+                                headers={"X-Result-Cache": "hit" if artifact.cached else "miss"})
+        return Response(content=artifact.result_image_bytes, media_type=artifact.result_media_type,
+                        headers={"X-Result-Cache": "hit" if artifact.cached else "miss"})
     
+    except PASSTHROUGH_ERRORS:
+        raise
     except Exception as e:
         logging.error(f"Error in face swap endpoint: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Internal Server Error: {str(e)}")
+
+@app.delete("/sessions/{session_id}")
+async def delete_session(session_id: str):
+    if not get_session_store().delete(session_id):
+        raise HTTPException(status_code=404, detail="Session not found or expired.")
+    return {"session_id": session_id, "deleted": True}
+
+@app.post("/identities/")
+async def register_identity(single_face_image: UploadFile = File(...)):
+    try:
+        img_single_face = decode_image_bytes(await single_face_image.read())
+        if img_single_face is None:
+            raise HTTPException(status_code=400, detail="Could not decode the single-face image.")
+        identity = await get_inference_executor().run(initiate_identity_registration, img_single_face)
+        return {"identity_id": identity.identity_id, "det_score": identity.det_score, "created_at": identity.created_at}
+    except PASSTHROUGH_ERRORS:
+        raise
+    except Exception as e:
+        logging.error(f"Error registering source identity: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Internal Server Error: {str(e)}")
+
+@app.get("/identities/")
+async def list_identities():
+    return {"identities": get_identity_registry().list_identities()}
+
+@app.delete("/identities/{identity_id}")
+async def delete_identity(identity_id: str):
+    try:
+        removed = get_identity_registry().delete(identity_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not removed:
+        raise HTTPException(status_code=404, detail=f"Unknown identity: {identity_id}")
+    return {"identity_id": identity_id, "deleted": True}
+
+def _parse_match_threshold(threshold):
+    if threshold is not None and not -1.0 <= threshold <= 1.0:
+        raise HTTPException(status_code=400, detail="Invalid threshold. Expected a cosine similarity between -1 and 1.")
+    return threshold
+
+def _parse_mapping(mapping: str) -> dict:
+    """
+    Parses and checks a {gallery person id: source identity id} JSON object.
+    """
+    try:
+        parsed = json.loads(mapping)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid mapping. Expected a JSON object of person_id: identity_id.")
+    if not isinstance(parsed, dict) or not parsed or not all(isinstance(v, str) for v in parsed.values()):
+        raise HTTPException(status_code=400, detail="Invalid mapping. Expected a JSON object of person_id: identity_id.")
+    gallery_index = get_gallery_index()
+    for person_id, identity_id in parsed.items():
+        if gallery_index.get(person_id) is None:
+            raise HTTPException(status_code=404, detail=f"Unknown gallery person: {person_id}")
+        _require_identity(identity_id)
+    return parsed
+
+def _match_response(match, faces) -> dict:
+    return {
+        "index": match.face_index + 1,
+        "bbox": [int(round(float(value))) for value in faces[match.face_index]["bbox"][:4]],
+        "person_id": match.person_id,
+        "label": match.label,
+        "similarity": match.similarity
+    }
+
+@app.post("/gallery/")
+async def enroll_gallery_face(image: UploadFile = File(...), person_id: str = Form(None), label: str = Form(None)):
+    """
+    Enrolls the most confident face of the image in the gallery, as a new person or as another photo of person_id.
+    """
+    try:
+        if person_id is not None and not PERSON_ID_PATTERN.match(person_id):
+            raise HTTPException(status_code=400, detail=f"Invalid person_id: {person_id}")
+        img = decode_image_bytes(await image.read())
+        if img is None:
+            raise HTTPException(status_code=400, detail="Could not decode the image.")
+        person = await get_inference_executor().run(initiate_gallery_enrollment, img, person_id=person_id, label=label)
+        return asdict(person)
+    except PASSTHROUGH_ERRORS:
+        raise
+    except Exception as e:
+        logging.error(f"Error enrolling gallery face: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Internal Server Error: {str(e)}")
+
+@app.get("/gallery/")
+async def list_gallery():
+    gallery_index = get_gallery_index()
+    return {"version": gallery_index.version, "people": [asdict(person) for person in gallery_index.list_people()]}
+
+@app.delete("/gallery/{person_id}")
+async def delete_gallery_person(person_id: str):
+    if not await run_in_threadpool(get_gallery_index().remove, person_id):
+        raise HTTPException(status_code=404, detail=f"Unknown gallery person: {person_id}")
+    return {"person_id": person_id, "deleted": True}
+
+@app.post("/gallery/match")
+async def match_gallery(image: UploadFile = File(...), threshold: float = Form(None)):
+    """
+    Detects the faces of the image and names the gallery person each one matched, if any.
+    """
+    try:
+        threshold = _parse_match_threshold(threshold)
+        img = decode_image_bytes(await image.read())
+        if img is None:
+            raise HTTPException(status_code=400, detail="Could not decode the image.")
+        faces, matches = await get_inference_executor().run(initiate_gallery_match, img, match_threshold=threshold)
+        return {"faces": [_match_response(match, faces) for match in matches]}
+    except PASSTHROUGH_ERRORS:
+        raise
+    except Exception as e:
+        logging.error(f"Error matching gallery faces: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Internal Server Error: {str(e)}")
+
+@app.post("/swap-mapped/")
+async def swap_mapped(multi_face_image: UploadFile = File(...), mapping: str = Form(...),
+                      threshold: float = Form(None), output_format: str = Form("jpeg")):
+    """
+    Swaps by who is in the picture rather than by position, in one pass: mapping is a JSON object
+    {gallery person id: source identity id} and every face matched to a mapped person gets that
+    person's source identity. Returns the image bytes; X-Gallery-Matches lists the swapped faces
+    as [index, person_id, similarity] (it is absent when the result came from the result store).
+    """
+    try:
+        if output_format not in IMAGE_FORMATS:
+            raise HTTPException(status_code=400, detail=f"Invalid output_format. Expected one of {sorted(IMAGE_FORMATS)}")
+        threshold = _parse_match_threshold(threshold)
+        mapping = _parse_mapping(mapping)
+        with metrics.span("read_upload"):
+            multi_face_bytes = await multi_face_image.read()
+        with metrics.span("decode"):
+            img_multi_faces = decode_image_bytes(multi_face_bytes)
+        if img_multi_faces is None:
+            raise HTTPException(status_code=400, detail="Could not decode the multi-face image.")
+
+        artifact = await get_inference_executor().run(
+            initiate_face_swapper, img_multi_faces, mapping=mapping, match_threshold=threshold,
+            output_format=output_format, save_faces=False
+        )
+        if not artifact.result_image_bytes:
+            raise HTTPException(status_code=422, detail="No faces detected in the multi-face image.")
+
+        headers = {"X-Result-Cache": "hit" if artifact.cached else "miss"}
+        if artifact.matches is not None:
+            # Person ids are restricted to header-safe characters; labels are left to GET /gallery/
+            headers["X-Gallery-Matches"] = json.dumps(
+                [[match.face_index + 1, match.person_id, match.similarity]
+                 for match in artifact.matches if match.person_id in mapping],
+                separators=(",", ":")
+            )
+        return Response(content=artifact.result_image_bytes, media_type=artifact.result_media_type, headers=headers)
+    except PASSTHROUGH_ERRORS:
+        raise
+    except Exception as e:
+        logging.error(f"Error in mapped face swap endpoint: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Internal Server Error: {str(e)}")
+
+def _remove_files(*paths):
+    for path in paths:
+        if path and os.path.exists(path):
+            os.remove(path)
+
+@app.post("/swap-video/")
+async def swap_video(video: UploadFile = File(...), single_face_image: UploadFile = File(None),
+                     identity_id: str = Form(None)):
+    """
+    Swaps the source face onto every face of an uploaded video and returns an MP4 (without audio).
+    Detection runs every VIDEO_DETECT_EVERY frames or on a scene change; faces are tracked in between.
+    """
+    input_path = output_path = None
+    try:
+        if single_face_image is None and identity_id is None:
+            raise HTTPException(status_code=400, detail="Provide either single_face_image or identity_id.")
+        if identity_id is not None:
+            _require_identity(identity_id)
+        img_single_face = None
+        if identity_id is None:
+            img_single_face = decode_image_bytes(await single_face_image.read())
+            if img_single_face is None:
+                raise HTTPException(status_code=400, detail="Could not decode the single-face image.")
+
+        # OpenCV reads and writes videos by path, so the clip is spooled to a temporary file
+        suffix = os.path.splitext(video.filename or "")[1] or ".mp4"
+        with tempfile.NamedTemporaryFile(suffix=suffix, delete=False) as f:
+            input_path = f.name
+            await run_in_threadpool(shutil.copyfileobj, video.file, f)
+        with tempfile.NamedTemporaryFile(suffix=".mp4", delete=False) as f:
+            output_path = f.name
+
+        artifact = await get_inference_executor().run(
+            initiate_video_face_swap, input_path, output_path,
+            single_face_img_path=img_single_face, source_identity_id=identity_id,
+            timeout=VIDEO_TIMEOUT_SECONDS
+        )
+        headers = {
+            "X-Frames": str(artifact.frames),
+            "X-Detections": str(artifact.detections),
+            "X-Throughput-FPS": str(artifact.throughput_fps)
+        }
+        return FileResponse(artifact.output_path, media_type="video/mp4", headers=headers,
+                            background=BackgroundTask(_remove_files, input_path, output_path))
+    except PASSTHROUGH_ERRORS:
+        _remove_files(input_path, output_path)
+        raise
+    except Exception as e:
+        _remove_files(input_path, output_path)
+        logging.error(f"Error in video swap endpoint: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Internal Server Error: {str(e)}")
+
+@app.post("/jobs/")
+async def create_batch_job(target_images: List[UploadFile] = File(None), archive: UploadFile = File(None),
+                           target_dir: str = Form(None), single_face_image: UploadFile = File(None),
+                           identity_id: str = Form(None), output_format: str = Form("jpeg"),
+                           mapping: str = Form(None)):
+    """
+    Creates a batch job: one source (a registered identity_id or a single_face_image, registered once)
+    swapped onto every image given as target_images, a zip archive and/or a server-side target_dir.
+    With mapping ({gallery person id: source identity id}, as in /swap-mapped/) each image only has
+    the faces of the mapped gallery people swapped, each with its own source.
+    """
+    try:
+        if mapping is not None:
+            if single_face_image is not None or identity_id is not None:
+                raise HTTPException(status_code=400, detail="Provide either mapping or a single source, not both.")
+            mapping = _parse_mapping(mapping)
+        elif single_face_image is None and identity_id is None:
+            raise HTTPException(status_code=400, detail="Provide either single_face_image or identity_id.")
+        if not target_images and archive is None and target_dir is None:
+            raise HTTPException(status_code=400, detail="Provide target_images, archive or target_dir.")
+        if output_format not in IMAGE_FORMATS:
+            raise HTTPException(status_code=400, detail=f"Invalid output_format. Expected one of {sorted(IMAGE_FORMATS)}")
+
+        if mapping is None and identity_id is None:
+            img_single_face = decode_image_bytes(await single_face_image.read())
+            if img_single_face is None:
+                raise HTTPException(status_code=400, detail="Could not decode the single-face image.")
+            identity = await get_inference_executor().run(initiate_identity_registration, img_single_face)
+            identity_id = identity.identity_id
+        elif mapping is None:
+            _require_identity(identity_id)
+
+        files = [(upload.filename, upload.file) for upload in target_images or []]
+        try:
+            return await run_in_threadpool(
+                get_batch_job_manager().create_job, identity_id, files=files,
+                archive=archive.file if archive is not None else None, directory=target_dir,
+                output_format=output_format, mapping=mapping
+            )
+        except (ValueError, zipfile.BadZipFile) as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    except PASSTHROUGH_ERRORS:
+        raise
+    except Exception as e:
+        logging.error(f"Error creating batch job: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Internal Server Error: {str(e)}")
+
+def _job_summary(job_id: str, include_items: bool = False) -> dict:
+    try:
+        summary = get_batch_job_manager().summary(job_id, include_items=include_items)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if summary is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job: {job_id}")
+    return summary
+
+@app.get("/jobs/")
+async def list_batch_jobs():
+    return {"jobs": get_batch_job_manager().list_jobs()}
+
+@app.get("/jobs/{job_id}")
+async def get_batch_job(job_id: str, include_items: bool = False):
+    return _job_summary(job_id, include_items=include_items)
+
+@app.get("/jobs/{job_id}/stream")
+async def stream_batch_job(job_id: str):
+    """
+    Streams one NDJSON line per finished image as results arrive, then a final line with the job summary.
+    """
+    _job_summary(job_id)
+    batch_job_manager = get_batch_job_manager()
+    poll_seconds = batch_job_manager.batch_job_config.stream_poll_seconds
+
+    async def records():
+        cursor = 0
+        while True:
+            finished, done = batch_job_manager.progress_since(job_id, cursor)
+            for record in finished:
+                yield json.dumps(record) + "\n"
+            cursor += len(finished)
+            if done:
+                yield json.dumps({"job": batch_job_manager.summary(job_id)}) + "\n"
+                return
+            await asyncio.sleep(poll_seconds)
+
+    return StreamingResponse(records(), media_type="application/x-ndjson")
+
+@app.get("/jobs/{job_id}/items/{index}")
+async def get_batch_job_result(job_id: str, index: int):
+    job = _job_summary(job_id)
+    path = get_batch_job_manager().result_path(job_id, index)
+    if path is None or not os.path.exists(path):
+        raise HTTPException(status_code=404, detail=f"No result for item {index} of job {job_id}")
+    return FileResponse(path, media_type=IMAGE_FORMATS[job["output_format"]][1])
+
+@app.delete("/jobs/{job_id}")
+async def cancel_batch_job(job_id: str):
+    _job_summary(job_id)
+    get_batch_job_manager().cancel(job_id)
+    return _job_summary(job_id)
+
+@app.get("/health")
+async def health():
+    return asdict(get_model_registry().status())
+
+@app.get("/ready")
+async def ready():
+    model_registry = get_model_registry()
+    status = asdict(model_registry.status())
+    if not model_registry.is_ready:
+        return JSONResponse(status_code=503, content=status)
+    return status
+
+@app.get("/cache/stats")
+async def cache_stats():
+    return {
+        "detection_cache": asdict(get_detection_cache().stats()),
+        "result_store": asdict(get_result_store().stats())
+    }
+
+@app.get("/executor/stats")
+async def executor_stats():
+    return asdict(get_inference_executor().stats())
+
+@app.get("/batching/stats")
+async def batching_stats():
+    micro_batch_scheduler = get_micro_batch_scheduler()
+    return {
+        "enabled": micro_batch_scheduler.enabled,
+        "batchers": [asdict(stats) for stats in micro_batch_scheduler.stats()]
+    }
+
+@app.get("/metrics")
+async def metrics_endpoint():
+    if not metrics.enabled:
+        raise HTTPException(status_code=404, detail="Metrics are disabled.")
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+@app.get("/models/store")
+def model_store_status():
+    model_store = get_model_store()
+    return {"models": [asdict(model_store.status(name)) for name in model_store.names]}
+
+@app.post("/models/reload")
+def reload_models(force: bool = False):
+    try:
+        return asdict(get_model_registry().reload(force=force))
+    except Exception as e:
+        logging.error(f"Error reloading models: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Model reload failed: {str(e)}")
+
+if __name__ == "__main__":
+    import serve
+
+    sys.exit(serve.main(app=app))
@@ -0,0 +1,112 @@
+"""
+Latency of matching the faces of one image against gallery indexes of growing size.
+
+"loop" is the straightforward per-face path: for every face, a Python loop over the
+gallery's embeddings computing one cosine similarity at a time and keeping each person's
+best. "vectorized" is GalleryIndex.match: one faces x rows matrix product against the
+memory-mapped matrix, a per-person max-reduce and the unique assignment. Both must pick the
+same person for every face. The galleries are random unit vectors with a few photos per
+person; the faces are noisy copies of some of them. "open" is the time a fresh index takes
+to load entries.json and map the matrix.
+
+Usage:
+    python -m benchmarks.gallery_matching --rows 1000 10000 100000 --faces 8
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from src.entity.face_swap_config import ConfigEntity
+from src.components.gallery_index import ENTRIES_FILE, GalleryIndex
+
+
+def build_gallery(output_dir: str, rows: int, photos_per_person: int, dim: int, rng: np.random.Generator):
+    """
+    Writes a gallery in the index's on-disk layout directly; enrolling 100k faces one by one
+    would mostly measure fsync.
+    """
+    config = ConfigEntity()
+    config.output_dir = output_dir
+    gallery_dir = os.path.join(output_dir, config.gallery_dir)
+    os.makedirs(gallery_dir, exist_ok=True)
+    matrix = rng.standard_normal((rows, dim)).astype(np.float32)
+    matrix /= np.linalg.norm(matrix, axis=1, keepdims=True)
+    matrix.tofile(os.path.join(gallery_dir, GalleryIndex._matrix_name(0)))
+    entries = {"generation": 0, "rows": [
+        {"person_id": f"p{i // photos_per_person}", "label": None, "created_at": "2026-01-01T00:00:00"}
+        for i in range(rows)
+    ]}
+    with open(os.path.join(gallery_dir, ENTRIES_FILE), "w") as f:
+        json.dump(entries, f)
+    return config, matrix, [row["person_id"] for row in entries["rows"]]
+
+
+def loop_match(faces: np.ndarray, matrix: np.ndarray, row_people: list, threshold: float) -> list:
+    """
+    One Python-level cosine similarity per (face, row) pair; each face keeps its best person.
+    """
+    matches = []
+    for face in faces:
+        face = face / np.linalg.norm(face)
+        best = {}
+        for row, person_id in zip(matrix, row_people):
+            similarity = float(np.dot(face, row))
+            if similarity > best.get(person_id, -2.0):
+                best[person_id] = similarity
+        person_id, similarity = max(best.items(), key=lambda item: item[1])
+        matches.append(person_id if similarity >= threshold else None)
+    return matches
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Gallery matching benchmark.")
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--faces", type=int, default=8)
+    parser.add_argument("--photos-per-person", type=int, default=3)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--skip-loop-above", type=int, default=100000,
+                        help="Skip the loop path for larger galleries; it grows linearly and gets slow.")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    dim = ConfigEntity().gallery_embedding_dim
+    print(f"faces per image: {args.faces}, photos per person: {args.photos_per_person}")
+    for rows in args.rows:
+        with tempfile.TemporaryDirectory() as output_dir:
+            config, matrix, row_people = build_gallery(output_dir, rows, args.photos_per_person, dim, rng)
+            picked = rng.choice(rows, size=args.faces, replace=False)
+            faces = matrix[picked] + 0.05 * rng.standard_normal((args.faces, dim)).astype(np.float32)
+
+            start = time.perf_counter()
+            gallery = GalleryIndex(config)
+            len(gallery)
+            open_ms = (time.perf_counter() - start) * 1000
+            threshold = gallery.gallery_index_config.match_threshold
+
+            timings = []
+            for _ in range(args.repeats):
+                start = time.perf_counter()
+                matches = gallery.match(faces, threshold)
+                timings.append(time.perf_counter() - start)
+            vectorized_ms = float(np.median(timings)) * 1000
+            expected = [row_people[i] for i in picked]
+            correct = sum(match.person_id == person_id for match, person_id in zip(matches, expected))
+            line = f"rows {rows:>7}: open {open_ms:8.1f} ms  vectorized {vectorized_ms:8.2f} ms  ({correct}/{args.faces} correct)"
+
+            if rows <= args.skip_loop_above:
+                start = time.perf_counter()
+                loop_matches = loop_match(faces, matrix, row_people, threshold)
+                loop_ms = (time.perf_counter() - start) * 1000
+                agree = loop_matches == [match.person_id for match in matches]
+                line += f"  loop {loop_ms:9.1f} ms  speedup {loop_ms / vectorized_ms:7.1f}x  agree {agree}"
+            print(line)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
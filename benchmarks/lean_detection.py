@@ -0,0 +1,101 @@
+"""
+Latency and recall of lean detection against the current full setup.
+
+"full" is FaceAnalysis with every model of the pack, detected at the fixed DET_SIZE
+(FaceAnalysis.get). "lean" loads only detection and recognition and picks the detector
+input per image (FaceDetector). Recall is measured against the full setup's faces:
+a reference face counts as found when a lean face overlaps it with IoU >= --iou.
+Besides the given images, a mosaic of them is tested as a large image with small faces.
+
+Usage:
+    python -m benchmarks.lean_detection --images data/example-1.jpeg data/example-2.jpeg --repeat 5
+"""
+import argparse
+import sys
+import time
+
+import cv2
+import numpy as np
+
+from src.components.face_detector import FaceDetector
+from src.components.model_initializer import ModelInitializer
+from src.entity.face_swap_config import ConfigEntity
+
+
+def iou(a, b) -> float:
+    x0, y0 = max(a[0], b[0]), max(a[1], b[1])
+    x1, y1 = min(a[2], b[2]), min(a[3], b[3])
+    intersection = max(x1 - x0, 0) * max(y1 - y0, 0)
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - intersection
+    return intersection / union if union > 0 else 0.0
+
+
+def make_mosaic(images: list, tiles: int) -> np.ndarray:
+    tile_height = max(image.shape[0] for image in images)
+    row = []
+    for i in range(tiles):
+        image = images[i % len(images)]
+        width = int(image.shape[1] * tile_height / image.shape[0])
+        row.append(cv2.resize(image, (width, tile_height)))
+    return np.vstack([np.hstack(row)] * 2)
+
+
+def timed(fn, repeat: int):
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        durations.append(time.perf_counter() - start)
+    return result, float(np.median(durations))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Lean vs full detection latency and recall.")
+    parser.add_argument("--images", nargs="+", default=["data/example-1.jpeg", "data/example-2.jpeg"])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--iou", type=float, default=0.5)
+    parser.add_argument("--mosaic-tiles", type=int, default=6, help="Images per mosaic row; 0 skips the mosaic.")
+    args = parser.parse_args()
+
+    full_config = ConfigEntity()
+    full_config.detection_mode = "full"
+    lean_config = ConfigEntity()
+    lean_config.detection_mode = "lean"
+    full_app = ModelInitializer(full_config).initialize_model()
+    lean_app = ModelInitializer(lean_config).initialize_model()
+    lean_detector = FaceDetector(lean_config)
+    print(f"full models: {sorted(full_app.models)}")
+    print(f"lean models: {sorted(lean_app.models)}")
+
+    cases = [(path, cv2.imread(path)) for path in args.images]
+    if args.mosaic_tiles:
+        mosaic = make_mosaic([image for _, image in cases], args.mosaic_tiles)
+        cases.append((f"mosaic {mosaic.shape[1]}x{mosaic.shape[0]}", mosaic))
+
+    total_reference = total_found = 0
+    total_full = total_lean = 0.0
+    for name, image in cases:
+        full_faces, full_seconds = timed(lambda: full_app.get(image), args.repeat)
+        lean_faces, lean_seconds = timed(lambda: lean_detector.detect(lean_app, image), args.repeat)
+        found = sum(
+            1 for reference in full_faces
+            if any(iou(reference.bbox, face.bbox) >= args.iou for face in lean_faces)
+        )
+        total_reference += len(full_faces)
+        total_found += found
+        total_full += full_seconds
+        total_lean += lean_seconds
+        recall = found / len(full_faces) if full_faces else 1.0
+        print(
+            f"{name}: full {full_seconds * 1000:7.1f} ms ({len(full_faces)} faces)  "
+            f"lean {lean_seconds * 1000:7.1f} ms ({len(lean_faces)} faces)  recall {recall:.3f}"
+        )
+
+    overall_recall = total_found / total_reference if total_reference else 1.0
+    print(f"total: full {total_full * 1000:.1f} ms  lean {total_lean * 1000:.1f} ms  "
+          f"speedup {total_full / total_lean:.2f}x  recall {overall_recall:.3f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,127 @@
+"""
+Load generator for cross-request micro-batching.
+
+At each concurrency level, that many client threads issue requests back to back for
+--duration seconds, first with micro-batching disabled (each request runs its own model
+calls) and then enabled. Throughput, p50/p99 latency and the average merged batch size are
+reported. A "recognition" request embeds --faces aligned 112x112 crops; a "swapper" request
+swaps --faces aligned 128x128 crops. Only models with a dynamic batch dimension can be
+batched: the stock inswapper_128 has a fixed batch of 1, so pass a batch-capable export with
+--swapper to benchmark the swapper.
+
+Usage:
+    python -m benchmarks.micro_batching --model recognition --concurrency 1 2 4 8 16
+    python -m benchmarks.micro_batching --model swapper --swapper weights/inswapper_128_dynamic.onnx
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+from insightface.model_zoo.arcface_onnx import ArcFaceONNX
+
+import src.components.micro_batcher as micro_batcher
+from src.components.micro_batcher import MicroBatchScheduler
+from src.components.model_initializer import ModelInitializer
+from src.components.onnx_runtime import SessionFactory
+from src.components.swap_engine import SwapEngine
+from src.entity.face_swap_config import ConfigEntity
+
+DEFAULT_RECOGNITION_MODEL = os.path.expanduser("~/.insightface/models/buffalo_l/w600k_r50.onnx")
+
+
+def make_request(args):
+    rng = np.random.default_rng(0)
+    if args.model == "recognition":
+        model = ArcFaceONNX(model_file=args.recognition, session=SessionFactory().create_session(args.recognition))
+        size = model.input_size[0]
+        aimgs = [rng.integers(0, 256, (size, size, 3), dtype=np.uint8) for _ in range(args.faces)]
+
+        def request():
+            scheduler = micro_batcher.get_micro_batch_scheduler()
+            if scheduler.can_batch(model):
+                return scheduler.embed(model, aimgs)
+            return np.concatenate([model.get_feat(aimg) for aimg in aimgs])
+        return request, model
+
+    config = ConfigEntity()
+    if args.swapper:
+        config.swapper_model_dir = args.swapper
+    swapper = ModelInitializer(config).initialize_swapper()
+    swap_engine = SwapEngine(swapper)
+    size = swap_engine.input_size[0]
+    blob = swap_engine._blob([rng.integers(0, 256, (size, size, 3), dtype=np.uint8) for _ in range(args.faces)])
+    embedding = rng.standard_normal(swapper.emap.shape[0]).astype(np.float32)
+    latent = swap_engine.compute_latent(embedding / np.linalg.norm(embedding))
+
+    def request():
+        return swap_engine._run_model(blob, latent)
+    return request, swapper
+
+
+def load_test(request, concurrency: int, duration: float) -> list:
+    latencies = []
+    lock = threading.Lock()
+    stop_at = time.perf_counter() + duration
+
+    def client():
+        while time.perf_counter() < stop_at:
+            start = time.perf_counter()
+            request()
+            elapsed = time.perf_counter() - start
+            with lock:
+                latencies.append(elapsed)
+
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-batching throughput and tail latency.")
+    parser.add_argument("--model", choices=("recognition", "swapper"), default="recognition")
+    parser.add_argument("--recognition", default=DEFAULT_RECOGNITION_MODEL)
+    parser.add_argument("--swapper", default=None, help="Swapper model with a dynamic batch dimension.")
+    parser.add_argument("--faces", type=int, default=1, help="Faces per request.")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    parser.add_argument("--duration", type=float, default=5.0, help="Seconds per measurement.")
+    parser.add_argument("--max-batch-size", type=int, default=16)
+    parser.add_argument("--max-wait-ms", type=float, default=5.0)
+    args = parser.parse_args()
+
+    request, model = make_request(args)
+    batch_dim = model.session.get_inputs()[0].shape[0]
+    if isinstance(batch_dim, int) and batch_dim == 1:
+        print(f"The {args.model} model has a fixed batch size of 1; there is nothing to batch.")
+        return 1
+
+    print(f"{'mode':>8} {'clients':>7} {'req/s':>9} {'p50 ms':>9} {'p99 ms':>9} {'avg batch':>9}")
+    for concurrency in args.concurrency:
+        for enabled in (False, True):
+            config = ConfigEntity()
+            config.micro_batch_enabled = enabled
+            config.micro_batch_max_size = args.max_batch_size
+            config.micro_batch_max_wait_ms = args.max_wait_ms
+            scheduler = MicroBatchScheduler(config)
+            micro_batcher._micro_batch_scheduler = scheduler
+
+            request()
+            latencies = np.array(load_test(request, concurrency, args.duration))
+            batcher = scheduler.recognition if args.model == "recognition" else scheduler.swapper
+            stats = batcher.stats()
+            scheduler.close()
+            print(
+                f"{'batched' if enabled else 'direct':>8} {concurrency:>7} {len(latencies) / args.duration:>9.1f} "
+                f"{np.percentile(latencies, 50) * 1000:>9.2f} {np.percentile(latencies, 99) * 1000:>9.2f} "
+                f"{stats.avg_batch_size if enabled else 1.0:>9.2f}"
+            )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
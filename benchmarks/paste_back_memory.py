@@ -0,0 +1,98 @@
+"""
+Peak-memory and latency comparison of the compositing paths on a large synthetic image.
+
+"full-frame" reproduces the previous path: BGR->RGB conversion for detection and for
+swapping, a copy of the target, a full-frame warp/mask/blend per face and an RGB->BGR
+conversion before writing. Its paste-back already skips INSwapper's unused fake_diff mask,
+so the numbers understate the old path. "roi-inplace" keeps the decoded BGR buffer and
+blends each face inside its own region, in place. No model is needed: the swapped crops are
+synthetic, only compositing is measured.
+
+Usage:
+    python -m benchmarks.paste_back_memory --width 6000 --height 4000 --faces 20
+"""
+import argparse
+import sys
+import time
+import tracemalloc
+
+import cv2
+import numpy as np
+from insightface.utils import face_align
+
+from src.components.swap_engine import SwapEngine
+
+CROP_SIZE = 128
+
+
+def make_inputs(width: int, height: int, num_faces: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    image = rng.integers(0, 256, (height, width, 3), dtype=np.uint8)
+    template = np.array([[-1, -1], [1, -1], [0, 0], [-0.8, 1], [0.8, 1]], dtype=np.float32)
+    cols = int(np.ceil(np.sqrt(num_faces * width / height)))
+    rows = int(np.ceil(num_faces / cols))
+    cell = min(width / cols, height / rows)
+    faces = []
+    for i in range(num_faces):
+        center = np.array([(i % cols + 0.5) * width / cols, (i // cols + 0.5) * height / rows])
+        kps = (template * cell * 0.08 + center).astype(np.float32)
+        M = face_align.estimate_norm(kps, CROP_SIZE)
+        bgr_fake = rng.integers(0, 256, (CROP_SIZE, CROP_SIZE, 3), dtype=np.uint8)
+        faces.append((M, bgr_fake))
+    return image, faces
+
+
+def full_frame(image, faces):
+    image_rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+    image_rgb_swap = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+    del image_rgb
+    result = image_rgb_swap.copy()
+    for M, bgr_fake in faces:
+        # The old path composited in RGB, so the swapped crop is pasted in RGB order too
+        aimg = cv2.warpAffine(result, M, (CROP_SIZE, CROP_SIZE), borderValue=0.0)
+        result = SwapEngine.paste_back(result, aimg, bgr_fake[:, :, ::-1], M)
+    return cv2.cvtColor(result, cv2.COLOR_RGB2BGR)
+
+
+def roi_inplace(image, faces):
+    for M, bgr_fake in faces:
+        aimg = cv2.warpAffine(image, M, (CROP_SIZE, CROP_SIZE), borderValue=0.0)
+        SwapEngine.paste_back_roi(image, aimg, bgr_fake, M)
+    return image
+
+
+def measure(fn, image, faces):
+    working = image.copy()
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = fn(working, faces)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compositing peak memory benchmark.")
+    parser.add_argument("--width", type=int, default=6000)
+    parser.add_argument("--height", type=int, default=4000)
+    parser.add_argument("--faces", type=int, default=20)
+    args = parser.parse_args()
+
+    image, faces = make_inputs(args.width, args.height, args.faces)
+    frame_mb = image.nbytes / 2 ** 20
+    print(f"image: {args.width}x{args.height} ({frame_mb:.1f} MB per BGR frame), faces: {args.faces}")
+
+    results = {}
+    for name, fn in (("full-frame", full_frame), ("roi-inplace", roi_inplace)):
+        result, elapsed, peak = measure(fn, image, faces)
+        results[name] = result
+        print(f"{name:>12}: peak {peak / 2 ** 20:9.1f} MB ({peak / image.nbytes:5.2f} frames)  time {elapsed * 1000:9.1f} ms")
+
+    diff = np.abs(results["full-frame"].astype(np.int16) - results["roi-inplace"].astype(np.int16))
+    print(f"max abs diff: {int(diff.max())}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
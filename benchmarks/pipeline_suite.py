@@ -0,0 +1,360 @@
+"""
+Offline performance regression suite for the face swap pipeline.
+
+Scenarios:
+- pipeline: initiate_face_swapper end to end (detection, face crops, swap, encode)
+- detect: FaceSwap.detect_and_save_faces
+- swap: FaceSwap.perform_face_swapping on previously detected faces
+- api: POST /upload-images/ followed by POST /swap-faces/ through the FastAPI app
+
+Every scenario runs on synthetic images at each --resolutions x --faces combination: face
+patches (the crops in artifacts/detected_faces, or drawn faces when those are missing) are
+laid out on a dark background. The real models are used when the buffalo_l pack and
+inswapper_128.onnx are present; otherwise (or with --stand-in) tiny stand-in ONNX models
+with the same inputs and outputs are built, so the suite runs offline on a CPU. Stand-in
+timings track the pipeline code around the models, not the models' own cost.
+
+The detection cache is cleared before every run. Per-stage timings come from the metrics
+spans (the Server-Timing header for the api scenario). The JSON report holds the median,
+p95 and min of each case, the median of each stage and the process's peak RSS. Given a
+--baseline report, cases whose median is slower by more than --max-slowdown (and by more
+than --min-delta-ms), and a peak RSS that grew by more than --max-rss-growth, are reported
+as regressions and the exit code is 1. A baseline may carry its own "thresholds" object
+with the same keys, used when the options are not given.
+
+Usage:
+    python -m benchmarks.pipeline_suite --output benchmarks/reports/current.json
+    python -m benchmarks.pipeline_suite --baseline benchmarks/reports/baseline.json --max-slowdown 0.15
+"""
+import argparse
+import glob
+import json
+import math
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+import cv2
+import numpy as np
+import onnxruntime
+
+import src.components.metrics as metrics_module
+import src.components.model_registry as model_registry_module
+import src.components.result_store as result_store_module
+from benchmarks.stand_in_models import DEFAULT_DIR, ensure_stand_in_models
+from src.components.detection_cache import get_detection_cache
+from src.components.faceswap import FaceSwap
+from src.components.metrics import Metrics
+from src.components.model_registry import ModelRegistry
+from src.components.result_store import ResultStore
+from src.entity.face_swap_config import ConfigEntity
+from src.pipeline.faceswap_pipeline import initiate_face_swapper
+from src.utils import encode_image
+
+SCENARIOS = ("pipeline", "detect", "swap", "api")
+DEFAULT_THRESHOLDS = {"max_slowdown": 0.25, "min_delta_ms": 5.0, "max_rss_growth": 0.15}
+
+
+def real_models_available(config: ConfigEntity) -> bool:
+    pack_dir = os.path.join(os.path.expanduser(config.model_root), "models", config.model_name)
+    return bool(glob.glob(os.path.join(pack_dir, "*.onnx"))) and os.path.exists(config.swapper_model_dir)
+
+
+def build_config(args) -> tuple:
+    config = ConfigEntity()
+    if not args.stand_in and real_models_available(config):
+        return config, "real"
+    model_root, model_name, swapper_path = ensure_stand_in_models(args.models_dir)
+    config.model_root = model_root
+    config.model_name = model_name
+    config.swapper_model_dir = swapper_path
+    config.ort_optimized_model_dir = os.path.join(model_root, "optimized")
+    config.swapper_int8_model_path = os.path.join(model_root, "inswapper_128.int8.onnx")
+    return config, "stand-in"
+
+
+def load_face_patches(pattern: str) -> list:
+    patches = [image for image in (cv2.imread(path) for path in sorted(glob.glob(pattern))) if image is not None]
+    if patches:
+        return patches
+    # Drawn face: a bright tile with darker eyes and mouth
+    patch = np.full((160, 128, 3), (150, 170, 200), dtype=np.uint8)
+    for x in (44, 84):
+        cv2.circle(patch, (x, 64), 7, (60, 60, 60), -1)
+    cv2.ellipse(patch, (64, 112), (20, 8), 0, 0, 360, (70, 70, 140), -1)
+    return [patch]
+
+
+def make_image(width: int, height: int, faces: int, patches: list, rng: np.random.Generator) -> np.ndarray:
+    """
+    Lays out face patches on a grid over a dark, noisy background, each in a light frame
+    like a print on a table.
+    """
+    image = rng.integers(5, 30, (height, width, 3), dtype=np.uint8)
+    columns = math.ceil(math.sqrt(faces * width / height))
+    rows = math.ceil(faces / columns)
+    cell_width, cell_height = width // columns, height // rows
+    for i in range(faces):
+        patch = patches[i % len(patches)]
+        scale = 0.45 * min(cell_width / patch.shape[1], cell_height / patch.shape[0])
+        patch = cv2.resize(patch, (max(int(patch.shape[1] * scale), 1), max(int(patch.shape[0] * scale), 1)))
+        border = max(patch.shape[0] // 10, 2)
+        patch = cv2.copyMakeBorder(patch, border, border, border, border, cv2.BORDER_CONSTANT, value=(210, 210, 210))
+        row, column = divmod(i, columns)
+        y = row * cell_height + (cell_height - patch.shape[0]) // 2
+        x = column * cell_width + (cell_width - patch.shape[1]) // 2
+        image[y:y + patch.shape[0], x:x + patch.shape[1]] = patch
+    return image
+
+
+def peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def parse_server_timing(header: str) -> list:
+    spans = []
+    for entry in filter(None, (part.strip() for part in (header or "").split(","))):
+        name, _, duration = entry.partition(";dur=")
+        if duration and name != "total":
+            spans.append((name, float(duration) / 1000))
+    return spans
+
+
+def summarize(durations: list, stage_runs: list) -> dict:
+    durations_ms = np.array(durations) * 1000
+    # Stages in order of first appearance; a stage repeated within a run is summed
+    stage_names = dict.fromkeys(stage for spans in stage_runs for stage, _ in spans)
+    stages = {
+        stage: round(float(np.median([
+            sum(seconds for name, seconds in spans if name == stage) * 1000 for spans in stage_runs
+        ])), 3)
+        for stage in stage_names
+    }
+    return {
+        "median_ms": round(float(np.median(durations_ms)), 3),
+        "p95_ms": round(float(np.percentile(durations_ms, 95)), 3),
+        "min_ms": round(float(durations_ms.min()), 3),
+        "stages": stages,
+    }
+
+
+class Suite:
+    def __init__(self, config: ConfigEntity, args):
+        self.args = args
+        self.metrics = metrics_module.get_metrics()
+        self.registry = model_registry_module.get_model_registry()
+        self.app, self.swapper = self.registry.get_models()
+        self.face_swapper = FaceSwap()
+        self.detection_cache = get_detection_cache()
+        self.patches = load_face_patches(args.face_images)
+        self.rng = np.random.default_rng(args.seed)
+        self.source_image = make_image(512, 512, 1, self.patches[-1:], self.rng)
+        self.client = None
+
+    def timed(self, run) -> tuple:
+        durations, stage_runs, faces = [], [], 0
+        for i in range(self.args.warmup + self.args.repeat):
+            self.detection_cache.clear()
+            token = self.metrics.start_trace()
+            start = time.perf_counter()
+            try:
+                faces, extra_spans = run()
+            finally:
+                elapsed = time.perf_counter() - start
+                spans = self.metrics.end_trace(token)
+            if i >= self.args.warmup:
+                durations.append(elapsed)
+                stage_runs.append(spans + extra_spans)
+        return durations, stage_runs, faces
+
+    def run_pipeline(self, image):
+        artifact = initiate_face_swapper(image, self.source_image, model_registry=self.registry)
+        return len(artifact.faces), []
+
+    def run_detect(self, image):
+        faces, _ = self.face_swapper.detect_and_save_faces(self.app, image)
+        return len(faces), []
+
+    def run_swap(self, image, faces):
+        if not faces:
+            return 0, []
+        self.face_swapper.perform_face_swapping(
+            self.app, self.swapper, image, self.source_image, list(range(len(faces))), faces_multi=faces
+        )
+        return len(faces), []
+
+    def run_api(self, image_bytes: bytes, source_bytes: bytes):
+        if self.client is None:
+            from fastapi.testclient import TestClient
+            from app import app
+            self.client = TestClient(app)
+        response = self.client.post("/upload-images/", files={
+            "multi_face_image": ("target.jpg", image_bytes, "image/jpeg"),
+            "single_face_image": ("source.jpg", source_bytes, "image/jpeg"),
+        })
+        response.raise_for_status()
+        body = response.json()
+        spans = parse_server_timing(response.headers.get("server-timing"))
+        if body["detected_faces"]:
+            swap_response = self.client.post("/swap-faces/", params={"session_id": body["session_id"], "indices": "-1"})
+            swap_response.raise_for_status()
+            spans += parse_server_timing(swap_response.headers.get("server-timing"))
+        return len(body["detected_faces"]), spans
+
+    def run_case(self, scenario: str, width: int, height: int, faces: int) -> dict:
+        image = make_image(width, height, faces, self.patches, self.rng)
+        if scenario == "pipeline":
+            run = lambda: self.run_pipeline(image)
+        elif scenario == "detect":
+            run = lambda: self.run_detect(image)
+        elif scenario == "swap":
+            detected = self.face_swapper.detection_cache.detect(self.app, image)
+            run = lambda: self.run_swap(image, detected)
+        else:
+            image_bytes = encode_image(image, "jpeg", 95)[0]
+            source_bytes = encode_image(self.source_image, "jpeg", 95)[0]
+            run = lambda: self.run_api(image_bytes, source_bytes)
+        durations, stage_runs, faces_detected = self.timed(run)
+        return {
+            "scenario": scenario,
+            "resolution": f"{width}x{height}",
+            "faces": faces,
+            "faces_detected": faces_detected,
+            "repeat": self.args.repeat,
+            **summarize(durations, stage_runs),
+            "peak_rss_mb": peak_rss_mb(),
+        }
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+def compare(report: dict, baseline: dict, args) -> list:
+    """
+    Returns:
+        list: One message per regression against the baseline report.
+    """
+    thresholds = {**DEFAULT_THRESHOLDS, **baseline.get("thresholds", {})}
+    for key in DEFAULT_THRESHOLDS:
+        if getattr(args, key) is not None:
+            thresholds[key] = getattr(args, key)
+    report["thresholds"] = thresholds
+    if baseline["meta"].get("models") != report["meta"]["models"]:
+        return [f"Baseline ran on {baseline['meta'].get('models')} models, this run on {report['meta']['models']} models"]
+
+    regressions = []
+    baseline_cases = {(case["scenario"], case["resolution"], case["faces"]): case for case in baseline["results"]}
+    for case in report["results"]:
+        reference = baseline_cases.get((case["scenario"], case["resolution"], case["faces"]))
+        if reference is None:
+            continue
+        delta = case["median_ms"] - reference["median_ms"]
+        if delta > thresholds["min_delta_ms"] and case["median_ms"] > reference["median_ms"] * (1 + thresholds["max_slowdown"]):
+            regressions.append(
+                f"{case['scenario']} {case['resolution']} x{case['faces']}: median {reference['median_ms']:.2f} -> "
+                f"{case['median_ms']:.2f} ms (+{delta / reference['median_ms'] * 100:.1f}%)"
+            )
+    peak, reference_peak = report["meta"]["peak_rss_mb"], baseline["meta"].get("peak_rss_mb")
+    if reference_peak and peak > reference_peak * (1 + thresholds["max_rss_growth"]):
+        regressions.append(f"peak RSS {reference_peak:.1f} -> {peak:.1f} MB")
+    return regressions
+
+
+def parse_resolution(value: str) -> tuple:
+    width, _, height = value.lower().partition("x")
+    return int(width), int(height)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Face swap pipeline performance regression suite.")
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--resolutions", nargs="+", type=parse_resolution, default=["640x480", "1280x720", "1920x1080", "3840x2160"])
+    parser.add_argument("--faces", nargs="+", type=int, default=[1, 4, 16])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--stand-in", action="store_true", help="Use the stand-in models even when the real ones are present.")
+    parser.add_argument("--models-dir", default=DEFAULT_DIR, help="Where the stand-in models are built.")
+    parser.add_argument("--face-images", default="artifacts/detected_faces/*/*.jpg", help="Glob of face crops for the synthetic images.")
+    parser.add_argument("--output", default=None, help="Write the JSON report here.")
+    parser.add_argument("--baseline", default=None, help="Compare against this JSON report.")
+    parser.add_argument("--max-slowdown", type=float, default=None, help="Allowed relative median slowdown (default 0.25).")
+    parser.add_argument("--min-delta-ms", type=float, default=None, help="Ignore slowdowns smaller than this (default 5 ms).")
+    parser.add_argument("--max-rss-growth", type=float, default=None, help="Allowed relative peak RSS growth (default 0.15).")
+    args = parser.parse_args()
+    args.resolutions = [parse_resolution(value) if isinstance(value, str) else value for value in args.resolutions]
+
+    config, models = build_config(args)
+    config.metrics_enabled = True
+    config.metrics_server_timing = True
+    # Every repeat must run the full swap rather than a stored result
+    config.result_store_enabled = False
+    # The suite reads the stage spans, and the API and pipeline pick up these process-wide instances
+    metrics_module._metrics = Metrics(config)
+    model_registry_module._model_registry = ModelRegistry(config)
+    result_store_module._result_store = ResultStore(config)
+    load_start = time.perf_counter()
+    suite = Suite(config, args)
+    load_seconds = time.perf_counter() - load_start
+    print(f"models: {models} ({config.model_name}, {config.swapper_model_dir}) loaded in {load_seconds:.2f} s")
+
+    results = []
+    print(f"{'scenario':>8} {'resolution':>10} {'faces':>5} {'found':>5} {'median ms':>10} {'p95 ms':>9} {'rss MB':>7}  stages (median ms)")
+    for scenario in args.scenarios:
+        for width, height in args.resolutions:
+            for faces in args.faces:
+                case = suite.run_case(scenario, width, height, faces)
+                results.append(case)
+                stages = " ".join(f"{stage}={ms:.1f}" for stage, ms in case["stages"].items())
+                print(f"{scenario:>8} {case['resolution']:>10} {faces:>5} {case['faces_detected']:>5} "
+                      f"{case['median_ms']:>10.2f} {case['p95_ms']:>9.2f} {case['peak_rss_mb']:>7.1f}  {stages}")
+
+    report = {
+        "meta": {
+            "models": models,
+            "model_name": config.model_name,
+            "commit": git_commit(),
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "onnxruntime": onnxruntime.__version__,
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "model_load_seconds": round(load_seconds, 3),
+            "peak_rss_mb": peak_rss_mb(),
+        },
+        "results": results,
+    }
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(report, json.load(f), args)
+        report["regressions"] = regressions
+    if args.output:
+        os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"report written to {args.output}")
+
+    if regressions:
+        print("REGRESSIONS:")
+        for regression in regressions:
+            print(f"  {regression}")
+        return 1
+    if args.baseline:
+        print("OK: no regressions against the baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,105 @@
+"""
+Quality vs speed of the INT8 (dynamically quantized) swapper against FP32.
+
+Both variants are loaded through ModelInitializer with the configured ONNX Runtime session
+options; the INT8 weights are quantized from the FP32 file on first use. Swapped crops of
+the target's faces are compared pixel by pixel (mean/max absolute difference and PSNR in
+8-bit BGR), and the median swapper latency of each variant is reported. Without --target
+and --source the comparison runs on random aligned crops and a random latent, which is
+enough to check the speed and the numerical drift of the quantized graph.
+
+Usage:
+    python -m benchmarks.quantization_compare --target artifacts/multiimages.jpg --source artifacts/single_image.jpg
+"""
+import argparse
+import sys
+import time
+
+import cv2
+import numpy as np
+from insightface.utils import face_align
+
+from src.components.detection_cache import get_detection_cache
+from src.components.model_initializer import ModelInitializer
+from src.components.swap_engine import SwapEngine
+from src.entity.face_swap_config import ConfigEntity
+
+
+def load_swapper(precision: str, args):
+    config = ConfigEntity()
+    config.swapper_precision = precision
+    if args.swapper:
+        config.swapper_model_dir = args.swapper
+    if args.int8_path:
+        config.swapper_int8_model_path = args.int8_path
+    start = time.perf_counter()
+    swapper = ModelInitializer(config).initialize_swapper()
+    return swapper, time.perf_counter() - start
+
+
+def make_inputs(args, swap_engine: SwapEngine):
+    crop_size = swap_engine.input_size[0]
+    if args.target and args.source:
+        face_analysis_app = ModelInitializer(ConfigEntity()).initialize_model()
+        detection_cache = get_detection_cache()
+        img_target = cv2.imread(args.target)
+        target_faces = detection_cache.detect(face_analysis_app, img_target)
+        source_faces = detection_cache.detect(face_analysis_app, cv2.imread(args.source))
+        if not target_faces or not source_faces:
+            raise ValueError("No faces detected in the target or source image.")
+        aimgs = [face_align.norm_crop2(img_target, face.kps, crop_size)[0] for face in target_faces]
+        return aimgs, source_faces[0].normed_embedding
+    rng = np.random.default_rng(0)
+    aimgs = [cv2.GaussianBlur(rng.integers(0, 256, (crop_size, crop_size, 3), dtype=np.uint8), (5, 5), 0) for _ in range(args.faces)]
+    embedding = rng.standard_normal(swap_engine.swapper.emap.shape[0]).astype(np.float32)
+    return aimgs, embedding / np.linalg.norm(embedding)
+
+
+def run(swap_engine: SwapEngine, aimgs: list, latent, repeat: int):
+    blob = swap_engine._blob(aimgs)
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        outputs = swap_engine._run_model(blob, latent)
+        durations.append(time.perf_counter() - start)
+    return np.stack(outputs), float(np.median(durations)) / len(aimgs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="INT8 vs FP32 swapper quality and latency.")
+    parser.add_argument("--target", default=None)
+    parser.add_argument("--source", default=None)
+    parser.add_argument("--swapper", default=None, help="FP32 swapper model (defaults to SWAPPER_MODEL_DIR).")
+    parser.add_argument("--int8-path", default=None, help="Quantized model path (defaults to SWAPPER_INT8_MODEL_PATH).")
+    parser.add_argument("--faces", type=int, default=8, help="Random crops when no images are given.")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--min-psnr", type=float, default=30.0, help="Fail below this PSNR (dB).")
+    args = parser.parse_args()
+
+    fp32_swapper, fp32_load = load_swapper("fp32", args)
+    int8_swapper, int8_load = load_swapper("int8", args)
+    fp32_engine = SwapEngine(fp32_swapper)
+    int8_engine = SwapEngine(int8_swapper)
+
+    aimgs, embedding = make_inputs(args, fp32_engine)
+    latent = fp32_engine.compute_latent(embedding)
+    fp32_out, fp32_seconds = run(fp32_engine, aimgs, latent, args.repeat)
+    int8_out, int8_seconds = run(int8_engine, aimgs, latent, args.repeat)
+
+    diff = np.abs(fp32_out.astype(np.float32) - int8_out.astype(np.float32))
+    mse = float((diff ** 2).mean())
+    psnr = float("inf") if mse == 0 else 10 * np.log10(255.0 ** 2 / mse)
+    print(f"faces: {len(aimgs)}")
+    print(f"fp32: load {fp32_load:6.2f} s  {fp32_seconds * 1000:8.2f} ms/face")
+    print(f"int8: load {int8_load:6.2f} s  {int8_seconds * 1000:8.2f} ms/face  speedup {fp32_seconds / int8_seconds:.2f}x")
+    print(f"mean abs diff: {float(diff.mean()):.3f}  max abs diff: {int(diff.max())}  PSNR: {psnr:.2f} dB")
+
+    if psnr < args.min_psnr:
+        print(f"FAIL: INT8 output is below {args.min_psnr} dB PSNR")
+        return 1
+    print("OK")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
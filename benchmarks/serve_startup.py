@@ -0,0 +1,235 @@
+"""
+Startup time and memory per worker of serve.py, with the models preloaded in the parent
+("preload") and loaded by every worker ("per-worker", --no-preload).
+
+For each mode and worker count the server is started in a subprocess on a free port. The
+benchmark measures the time until every worker is ready and then sends a few detection
+requests (POST /gallery/match) so that each worker has run inference. It then reads RSS,
+PSS and USS (private memory) of the parent and of every worker from /proc. RSS counts
+shared pages in full for every process; PSS splits them between the processes that share
+them, so the total PSS is what the group really costs. Finally one graceful reload (SIGHUP)
+is timed. The import time of the app module is measured once in a fresh interpreter.
+Without the buffalo_l pack and inswapper_128.onnx (or with --stand-in), the stand-in models
+are used; they are far smaller than the real ones, so the memory shared by preloading is
+mostly the imported libraries.
+
+Linux only (fork, /proc).
+
+Usage:
+    python -m benchmarks.serve_startup --workers 1 2 4
+"""
+import argparse
+import json
+import os
+import queue
+import re
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from types import SimpleNamespace
+
+import cv2
+import numpy as np
+import requests
+
+from benchmarks.pipeline_suite import build_config, load_face_patches, make_image
+from benchmarks.stand_in_models import DEFAULT_DIR
+from src.entity.face_swap_config import CONFIG_OVERRIDES, ConfigEntity
+
+READY_PATTERN = re.compile(r"All (\d+) worker\(s\) ready after ([\d.]+) s")
+RELOAD_PATTERN = re.compile(r"Reload complete in ([\d.]+) s")
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def memory_kb(pid: int) -> dict:
+    """
+    Returns:
+        dict: rss, pss and uss (private clean + dirty) of a process in kB, from /proc/<pid>/smaps_rollup.
+    """
+    fields = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 2 and parts[1].isdigit():
+                fields[parts[0].rstrip(":")] = int(parts[1])
+    return {"rss": fields["Rss"], "pss": fields["Pss"],
+            "uss": fields.get("Private_Clean", 0) + fields.get("Private_Dirty", 0)}
+
+
+def children(pid: int) -> list:
+    found = []
+    for name in os.listdir("/proc"):
+        if not name.isdigit():
+            continue
+        try:
+            with open(f"/proc/{name}/stat") as f:
+                # The command name may contain spaces; the parent pid follows the closing parenthesis
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        if ppid == pid:
+            found.append(int(name))
+    return sorted(found)
+
+
+def import_time(python: str) -> tuple:
+    code = ("import sys, time; start = time.perf_counter(); import app; "
+            "print(time.perf_counter() - start, [m for m in ('insightface', 'onnxruntime', 'matplotlib') if m in sys.modules])")
+    output = subprocess.run([python, "-c", code], capture_output=True, text=True, check=True).stdout.strip().splitlines()[-1]
+    seconds, modules = output.split(" ", 1)
+    return float(seconds), modules
+
+
+class ServerProcess:
+    """
+    serve.py in a subprocess, with its log lines collected from stderr.
+    """
+    def __init__(self, args, workers: int, preload: bool, port: int, output_dir: str):
+        command = [sys.executable, "-m", "benchmarks.serve_startup", "--child", "--models-dir", args.models_dir,
+                   "--output-dir", output_dir, "--", "--host", "127.0.0.1", "--port", str(port),
+                   "--workers", str(workers), "--ort-threads", "1"]
+        if args.stand_in:
+            command.insert(3, "--stand-in")
+        if not preload:
+            command.append("--no-preload")
+        self.started_at = time.perf_counter()
+        self.process = subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+        self.lines = queue.Queue()
+        threading.Thread(target=self._drain, daemon=True).start()
+
+    def _drain(self) -> None:
+        for line in self.process.stderr:
+            self.lines.put(line)
+
+    def wait_for(self, pattern: re.Pattern, timeout: float):
+        deadline = time.perf_counter() + timeout
+        while time.perf_counter() < deadline:
+            try:
+                line = self.lines.get(timeout=0.5)
+            except queue.Empty:
+                if self.process.poll() is not None:
+                    raise RuntimeError(f"serve.py exited with {self.process.returncode}")
+                continue
+            match = pattern.search(line)
+            if match:
+                return match
+        raise TimeoutError(f"Timed out waiting for {pattern.pattern!r}")
+
+    def stop(self) -> None:
+        self.process.send_signal(signal.SIGTERM)
+        try:
+            self.process.wait(timeout=60)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+
+
+def run_case(args, workers: int, preload: bool, image_bytes: bytes) -> dict:
+    port = free_port()
+    with tempfile.TemporaryDirectory() as output_dir:
+        server = ServerProcess(args, workers, preload, port, output_dir)
+        try:
+            server.wait_for(READY_PATTERN, args.timeout)
+            ready_seconds = time.perf_counter() - server.started_at
+            url = f"http://127.0.0.1:{port}/gallery/match"
+            latencies = []
+            for _ in range(args.requests_per_worker * workers):
+                # A new connection per request, so the kernel spreads them over the workers
+                start = time.perf_counter()
+                response = requests.post(url, files={"image": ("image.jpg", image_bytes, "image/jpeg")},
+                                         headers={"Connection": "close"}, timeout=120)
+                response.raise_for_status()
+                latencies.append(time.perf_counter() - start)
+
+            parent = memory_kb(server.process.pid)
+            worker_memory = [memory_kb(pid) for pid in children(server.process.pid)]
+            server.process.send_signal(signal.SIGHUP)
+            reload_seconds = float(server.wait_for(RELOAD_PATTERN, args.timeout).group(1))
+        finally:
+            server.stop()
+    mb = 1024
+    return {
+        "mode": "preload" if preload else "per-worker",
+        "workers": workers,
+        "ready_s": round(ready_seconds, 2),
+        "reload_s": round(reload_seconds, 2),
+        "request_p50_ms": round(float(np.median(latencies)) * 1000, 1),
+        "parent_rss_mb": round(parent["rss"] / mb, 1),
+        "worker_rss_mb": round(float(np.mean([m["rss"] for m in worker_memory])) / mb, 1),
+        "worker_pss_mb": round(float(np.mean([m["pss"] for m in worker_memory])) / mb, 1),
+        "worker_uss_mb": round(float(np.mean([m["uss"] for m in worker_memory])) / mb, 1),
+        "total_pss_mb": round((parent["pss"] + sum(m["pss"] for m in worker_memory)) / mb, 1),
+    }
+
+
+def child_main(args, serve_args: list) -> int:
+    """
+    Runs serve.py with the benchmark's model and output settings applied to every configuration.
+    """
+    import serve
+
+    config, _ = build_config(args)
+    default = ConfigEntity()
+    CONFIG_OVERRIDES.update({name: value for name, value in vars(config).items() if getattr(default, name) != value})
+    CONFIG_OVERRIDES["output_dir"] = args.output_dir
+    if args.stand_in:
+        # The stand-in models are not in the model store's manifest
+        CONFIG_OVERRIDES["model_store_prefetch_on_startup"] = False
+    return serve.main(serve_args)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="serve.py startup and memory benchmark.")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--modes", nargs="+", default=["preload", "per-worker"], choices=["preload", "per-worker"])
+    parser.add_argument("--requests-per-worker", type=int, default=4)
+    parser.add_argument("--stand-in", action="store_true", help="Use the stand-in models even if the real ones are installed.")
+    parser.add_argument("--models-dir", default=DEFAULT_DIR, help="Where the stand-in models are built.")
+    parser.add_argument("--timeout", type=float, default=600)
+    parser.add_argument("--output", default=None, help="Write the results as JSON to this file.")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--output-dir", default=None, help=argparse.SUPPRESS)
+    argv = sys.argv[1:]
+    serve_args = []
+    if "--" in argv:
+        argv, serve_args = argv[:argv.index("--")], argv[argv.index("--") + 1:]
+    args = parser.parse_args(argv)
+    if args.child:
+        return child_main(args, serve_args)
+
+    _, models = build_config(SimpleNamespace(stand_in=args.stand_in, models_dir=args.models_dir))
+    if models == "stand-in":
+        args.stand_in = True
+    seconds, modules = import_time(sys.executable)
+    print(f"models: {models}; import app: {seconds * 1000:.0f} ms, heavy modules imported: {modules}")
+
+    rng = np.random.default_rng(0)
+    image = make_image(1280, 720, 4, load_face_patches("artifacts/detected_faces/*/*.jpg"), rng)
+    image_bytes = cv2.imencode(".jpg", image)[1].tobytes()
+
+    results = []
+    header = ("mode", "workers", "ready_s", "reload_s", "request_p50_ms", "parent_rss_mb",
+              "worker_rss_mb", "worker_pss_mb", "worker_uss_mb", "total_pss_mb")
+    print(" ".join(f"{name:>14}" for name in header))
+    for workers in args.workers:
+        for mode in args.modes:
+            result = run_case(args, workers, mode == "preload", image_bytes)
+            results.append(result)
+            print(" ".join(f"{result[name]:>14}" for name in header))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"models": models, "import_app_seconds": seconds, "results": results}, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
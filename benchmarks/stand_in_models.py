@@ -0,0 +1,184 @@
+"""
+Tiny stand-in ONNX models with the same inputs and outputs as the real ones, so the
+benchmark suite runs offline without the buffalo_l pack or inswapper_128.onnx.
+
+- det.onnx: SCRFD-style detector (dynamic input size, 9 outputs: scores, bbox and keypoint
+  distances for strides 8/16/32 with 2 anchors). It "detects" bright patches on a dark
+  background: one stride-32 anchor fires at the top-left corner cell of each patch, with a
+  fixed 5 x 5 cell box and a plausible 5-point keypoint layout.
+- rec.onnx: ArcFace-style recognition model, N x 3 x 112 x 112 -> N x 512.
+- inswapper_128.onnx: N x 3 x 128 x 128 target and N x 512 source -> N x 3 x 128 x 128,
+  with the 512 x 512 emap as the last initializer, as insightface's INSwapper expects.
+
+The models only preserve shapes and the code paths around them (decoding, NMS, alignment,
+paste-back, encoding); their inference cost is far below the real models'.
+
+Usage:
+    python -m benchmarks.stand_in_models --out /tmp/faceswap_stand_in_models
+"""
+import argparse
+import os
+import sys
+import tempfile
+
+import numpy as np
+import onnx
+from onnx import TensorProto, helper, numpy_helper
+
+OPSET = 13
+PACK_NAME = "stand_in"
+DEFAULT_DIR = os.path.join(tempfile.gettempdir(), "faceswap_stand_in_models")
+# Box (left, top, right, bottom) and keypoints (eyes, nose, mouth corners) relative to the firing
+# anchor at a patch's top-left corner cell, in stride units
+BOX_DISTANCES = [0.5, 0.5, 4.5, 4.5]
+KEYPOINT_OFFSETS = [1.0, 1.1, 3.0, 1.1, 2.0, 2.1, 1.2, 3.0, 2.8, 3.0]
+
+
+def _constant(name: str, value) -> onnx.TensorProto:
+    return numpy_helper.from_array(np.asarray(value, dtype=np.float32), name)
+
+
+def _save(graph: onnx.GraphProto, path: str) -> str:
+    model = helper.make_model(graph, opset_imports=[helper.make_opsetid("", OPSET)])
+    model.ir_version = 8
+    onnx.checker.check_model(model)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    onnx.save(model, path)
+    return path
+
+
+def build_detector(path: str) -> str:
+    nodes = [helper.make_node("ReduceMean", ["input.1"], ["gray"], axes=[1], keepdims=1, name="gray")]
+    initializers = [
+        _constant("offset", 0.3), _constant("gain", 40.0), _constant("zero", 0.0), _constant("one", 1.0),
+        _constant("first_anchor", [1.0, 0.0]),
+        _constant("bbox_distance", [BOX_DISTANCES]), _constant("kps_distance", [KEYPOINT_OFFSETS]),
+        numpy_helper.from_array(np.array([-1, 1], dtype=np.int64), "column"),
+        numpy_helper.from_array(np.array([0, 0, 1, 0, 0, 0, 0, 0], dtype=np.int64), "pad_top"),
+        numpy_helper.from_array(np.array([0, 0, 0, 1, 0, 0, 0, 0], dtype=np.int64), "pad_left"),
+        numpy_helper.from_array(np.array([0], dtype=np.int64), "start"),
+        numpy_helper.from_array(np.array([-1], dtype=np.int64), "drop_last"),
+        numpy_helper.from_array(np.array([2], dtype=np.int64), "rows"),
+        numpy_helper.from_array(np.array([3], dtype=np.int64), "columns"),
+    ]
+    scores, bboxes, kpss = [], [], []
+    for stride in (8, 16, 32):
+        pooled = f"pooled_{stride}"
+        nodes.append(helper.make_node("AveragePool", ["gray"], [pooled], kernel_shape=[stride, stride],
+                                      strides=[stride, stride], name=f"pool_{stride}"))
+        score_map = f"score_map_{stride}"
+        if stride == 32:
+            # A cell fires when it is bright and the cells above and to its left are not: one anchor
+            # at the top-left corner of each bright patch, whatever its size
+            nodes += [
+                helper.make_node("Add", ["pooled_32", "offset"], ["shifted"], name="shift"),
+                helper.make_node("Mul", ["shifted", "gain"], ["logits"], name="gain"),
+                helper.make_node("Sigmoid", ["logits"], ["bright"], name="bright"),
+                helper.make_node("Pad", ["bright", "pad_top"], ["bright_padded_top"], name="pad_top"),
+                helper.make_node("Slice", ["bright_padded_top", "start", "drop_last", "rows"], ["bright_above"], name="above"),
+                helper.make_node("Pad", ["bright", "pad_left"], ["bright_padded_left"], name="pad_left"),
+                helper.make_node("Slice", ["bright_padded_left", "start", "drop_last", "columns"], ["bright_left"], name="left"),
+                helper.make_node("Sub", ["one", "bright_above"], ["dark_above"], name="dark_above"),
+                helper.make_node("Sub", ["one", "bright_left"], ["dark_left"], name="dark_left"),
+                helper.make_node("Mul", ["bright", "dark_above"], ["top_edge"], name="top_edge"),
+                helper.make_node("Mul", ["top_edge", "dark_left"], [score_map], name="corner"),
+            ]
+        else:
+            nodes.append(helper.make_node("Mul", [pooled, "zero"], [score_map], name=f"silence_{stride}"))
+        nodes += [
+            helper.make_node("Transpose", [score_map], [f"nhwc_{stride}"], perm=[0, 2, 3, 1], name=f"nhwc_{stride}"),
+            helper.make_node("Mul", [f"nhwc_{stride}", "first_anchor"], [f"anchors_{stride}"], name=f"anchors_{stride}"),
+            helper.make_node("Reshape", [f"anchors_{stride}", "column"], [f"score_{stride}"], name=f"score_{stride}"),
+            helper.make_node("Mul", [f"score_{stride}", "zero"], [f"zeros_{stride}"], name=f"zeros_{stride}"),
+            helper.make_node("Add", [f"zeros_{stride}", "bbox_distance"], [f"bbox_{stride}"], name=f"bbox_{stride}"),
+            helper.make_node("Add", [f"zeros_{stride}", "kps_distance"], [f"kps_{stride}"], name=f"kps_{stride}"),
+        ]
+        scores.append(helper.make_tensor_value_info(f"score_{stride}", TensorProto.FLOAT, [None, 1]))
+        bboxes.append(helper.make_tensor_value_info(f"bbox_{stride}", TensorProto.FLOAT, [None, 4]))
+        kpss.append(helper.make_tensor_value_info(f"kps_{stride}", TensorProto.FLOAT, [None, 10]))
+
+    graph = helper.make_graph(
+        nodes, "stand_in_detector",
+        [helper.make_tensor_value_info("input.1", TensorProto.FLOAT, [1, 3, "height", "width"])],
+        scores + bboxes + kpss, initializer=initializers
+    )
+    return _save(graph, path)
+
+
+def build_recognition(path: str, seed: int = 0) -> str:
+    rng = np.random.default_rng(seed)
+    nodes = [
+        helper.make_node("AveragePool", ["input.1"], ["pooled"], kernel_shape=[8, 8], strides=[8, 8], name="pool"),
+        helper.make_node("Flatten", ["pooled"], ["features"], axis=1, name="flatten"),
+        helper.make_node("Gemm", ["features", "projection"], ["embedding"], name="fc"),
+    ]
+    projection = _constant("projection", rng.standard_normal((3 * 14 * 14, 512)) / np.sqrt(3 * 14 * 14))
+    graph = helper.make_graph(
+        nodes, "stand_in_recognition",
+        [helper.make_tensor_value_info("input.1", TensorProto.FLOAT, ["N", 3, 112, 112])],
+        [helper.make_tensor_value_info("embedding", TensorProto.FLOAT, ["N", 512])],
+        initializer=[projection]
+    )
+    return _save(graph, path)
+
+
+def build_swapper(path: str, seed: int = 0) -> str:
+    rng = np.random.default_rng(seed)
+    nodes = [
+        helper.make_node("Conv", ["target", "conv_weight", "conv_bias"], ["features"], pads=[1, 1, 1, 1], name="conv"),
+        helper.make_node("Gemm", ["source", "style"], ["style_shift"], name="style"),
+        helper.make_node("Reshape", ["style_shift", "style_shape"], ["style_map"], name="style_map"),
+        helper.make_node("Add", ["features", "style_map"], ["styled"], name="add_style"),
+        helper.make_node("Sigmoid", ["styled"], ["output"], name="sigmoid"),
+    ]
+    conv_weight = np.zeros((3, 3, 3, 3), dtype=np.float32)
+    for channel in range(3):
+        conv_weight[channel, channel] = 1.0 / 9
+    initializers = [
+        _constant("conv_weight", conv_weight * 4.0),
+        _constant("conv_bias", [-2.0, -2.0, -2.0]),
+        _constant("style", rng.standard_normal((512, 3)) * 0.05),
+        numpy_helper.from_array(np.array([-1, 3, 1, 1], dtype=np.int64), "style_shape"),
+        # insightface reads the emap from the last initializer
+        _constant("emap", np.eye(512) + rng.standard_normal((512, 512)) * 0.01),
+    ]
+    graph = helper.make_graph(
+        nodes, "stand_in_inswapper",
+        [helper.make_tensor_value_info("target", TensorProto.FLOAT, [1, 3, 128, 128]),
+         helper.make_tensor_value_info("source", TensorProto.FLOAT, [1, 512])],
+        [helper.make_tensor_value_info("output", TensorProto.FLOAT, [1, 3, 128, 128])],
+        initializer=initializers
+    )
+    return _save(graph, path)
+
+
+def ensure_stand_in_models(models_dir: str = DEFAULT_DIR) -> tuple:
+    """
+    Builds the stand-in models under models_dir unless they already exist.
+    Returns:
+        tuple: (model root for FaceAnalysis, model pack name, swapper model path).
+    """
+    pack_dir = os.path.join(models_dir, "models", PACK_NAME)
+    swapper_path = os.path.join(models_dir, "inswapper_128.onnx")
+    builders = [
+        (os.path.join(pack_dir, "det.onnx"), build_detector),
+        (os.path.join(pack_dir, "rec.onnx"), build_recognition),
+        (swapper_path, build_swapper),
+    ]
+    for path, build in builders:
+        if not os.path.exists(path):
+            build(path)
+    return models_dir, PACK_NAME, swapper_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the stand-in ONNX models.")
+    parser.add_argument("--out", default=DEFAULT_DIR)
+    args = parser.parse_args()
+    root, name, swapper_path = ensure_stand_in_models(args.out)
+    print(f"model root: {root}  pack: {name}  swapper: {swapper_path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,68 @@
+"""
+Production entry point: preforked uvicorn workers sharing one listening socket.
+
+The parent process loads and warms up the models once and forks the workers from it, so
+the weights are shared copy-on-write rather than loaded by every worker (see
+WorkerSupervisor). Settings default to the SERVE_* constants in src/constants.
+
+Usage:
+    python serve.py --workers 4 --port 8000
+    kill -HUP <parent pid>     # graceful reload: new workers, then the old ones drain and exit
+    kill -TERM <parent pid>    # graceful stop
+"""
+import argparse
+import sys
+
+from src.entity.face_swap_config import CONFIG_OVERRIDES, ConfigEntity, WorkerSupervisorConfig
+from src.logger import logging
+
+
+def main(argv: list = None, app=None) -> int:
+    """
+    Args:
+        argv (list): Command-line arguments (default: sys.argv[1:]).
+        app: The ASGI app to serve; app.app is imported when not given.
+    """
+    parser = argparse.ArgumentParser(description="Serve the face swap API with preforked workers.")
+    parser.add_argument("--host", default=None)
+    parser.add_argument("--port", type=int, default=None)
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes; 0 starts one per CPU core.")
+    parser.add_argument("--no-preload", action="store_true", help="Load the models in every worker instead of once in the parent.")
+    parser.add_argument("--ort-threads", type=int, default=None,
+                        help="ONNX Runtime intra-op threads per worker; the models are only preloaded with 1.")
+    parser.add_argument("--graceful-timeout", type=float, default=None,
+                        help="Seconds a stopping worker gets to finish its requests.")
+    args = parser.parse_args(argv)
+
+    config = ConfigEntity()
+    overrides = {
+        "serve_host": args.host,
+        "serve_port": args.port,
+        "serve_workers": args.workers,
+        "serve_graceful_timeout_seconds": args.graceful_timeout,
+        "serve_preload_models": False if args.no_preload else None,
+        "ort_intra_op_threads": args.ort_threads if args.ort_threads is not None else config.serve_ort_intra_op_threads,
+    }
+    # Applied to every configuration built from now on, in this process and in the forked workers
+    CONFIG_OVERRIDES.update({name: value for name, value in overrides.items() if value is not None})
+
+    # The log file is per process start; the supervisor's and workers' messages also go to stderr
+    handler = logging.StreamHandler(sys.stderr)
+    handler.setFormatter(logging.Formatter("[ %(asctime)s ] %(process)d %(name)s - %(levelname)s - %(message)s"))
+    logging.getLogger().addHandler(handler)
+
+    # A session created by one worker must be found by the worker that serves the next request
+    config = ConfigEntity()
+    if WorkerSupervisorConfig(config).workers > 1 and config.session_backend == "memory":
+        logging.warning('SESSION_BACKEND "memory" is per process; using "sqlite" to share sessions between the workers.')
+        CONFIG_OVERRIDES["session_backend"] = "sqlite"
+
+    from src.components.worker_supervisor import WorkerSupervisor
+
+    if app is None:
+        from app import app
+    return WorkerSupervisor().run(app)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,84 @@
+from src.entity.face_swap_config import ConfigEntity, ArtifactSinkConfig
+from src.exceptions import CustomException
+from src.logger import logging
+
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+class ArtifactSink:
+    """
+    Optional background writer for request artifacts (uploads, face crops, results).
+    The request path hands over already-encoded bytes and never waits for the disk;
+    each file is written to a temporary name and renamed into place.
+    """
+    def __init__(self, config: ConfigEntity = None):
+        try:
+            logging.info("Creating ArtifactSinkConfig...")
+            self.artifact_sink_config = ArtifactSinkConfig(config=config or ConfigEntity())
+            self._lock = threading.Lock()
+            self._executor = None
+        except Exception as e:
+            logging.error("Failed to initialize ArtifactSinkConfig", exc_info=True)
+            raise CustomException(e, sys) from e
+
+    @property
+    def enabled(self) -> bool:
+        return self.artifact_sink_config.enabled
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.artifact_sink_config.workers,
+                    thread_name_prefix="artifact-sink"
+                )
+            return self._executor
+
+    @staticmethod
+    def _write(path: str, data: bytes) -> None:
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+            logging.info(f"Artifact written to {path}")
+        except Exception:
+            logging.error(f"Failed to write artifact {path}", exc_info=True)
+
+    def submit(self, relative_path: str, data: bytes):
+        """
+        Schedules bytes to be written under the output directory.
+        Returns:
+            str: The path the artifact will be written to, or None when persistence is disabled.
+        """
+        if not self.enabled:
+            return None
+        path = os.path.join(self.artifact_sink_config.output_dir, relative_path)
+        self._get_executor().submit(self._write, path, data)
+        return path
+
+    def shutdown(self, wait: bool = True) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait)
+
+
+_artifact_sink = None
+_artifact_sink_lock = threading.Lock()
+
+
+def get_artifact_sink() -> ArtifactSink:
+    """
+    Returns the process-wide artifact sink, creating it on first use.
+    """
+    global _artifact_sink
+    if _artifact_sink is None:
+        with _artifact_sink_lock:
+            if _artifact_sink is None:
+                _artifact_sink = ArtifactSink()
+    return _artifact_sink
@@ -0,0 +1,438 @@
+from src.entity.face_swap_config import ConfigEntity, BatchJobConfig
+from src.entity.face_swap_artifact import BatchJobArtifact
+from src.components.inference_executor import _init_process_worker
+from src.exceptions import CustomException
+from src.logger import logging
+from src.utils import IMAGE_FORMATS
+
+import os
+import re
+import sys
+import json
+import time
+import uuid
+import shutil
+import zipfile
+import threading
+import multiprocessing
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+JOB_ID_PATTERN = re.compile(r"^[0-9a-f]{32}$")
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp", ".bmp")
+MANIFEST_FILE = "job.json"
+PROGRESS_FILE = "progress.ndjson"
+# Created by cancel() in any process; the process running the job sees it and cancels its images
+CANCEL_FILE = "cancel.requested"
+
+
+def _swap_batch_item(input_path: str, result_path: str, identity_id: str, output_format: str,
+                     mapping: dict = None) -> dict:
+    """
+    Swaps every face of one album image, or with a mapping every face matched to a mapped
+    gallery person, and writes the encoded result next to the job.
+    Top-level so it can be pickled for process workers; only the small summary travels back.
+    """
+    from src.pipeline.faceswap_pipeline import initiate_face_swapper
+
+    started_at = time.time()
+    artifact = initiate_face_swapper(input_path, source_identity_id=identity_id,
+                                     output_format=output_format, save_faces=False, mapping=mapping)
+    result = None
+    if artifact.result_image_bytes is not None:
+        tmp_path = f"{result_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(artifact.result_image_bytes)
+        os.replace(tmp_path, result_path)
+        result = os.path.basename(result_path)
+    summary = {
+        "result": result,
+        "faces": len(artifact.faces or []),
+        "cached": artifact.cached,
+        "elapsed_seconds": round(time.time() - started_at, 4)
+    }
+    if artifact.matches is not None:
+        summary["matched"] = [match.person_id for match in artifact.matches]
+    return summary
+
+
+def _safe_name(name: str) -> str:
+    return re.sub(r"[^A-Za-z0-9._-]", "_", os.path.basename(name or "image")) or "image"
+
+
+class BatchJobManager:
+    """
+    Runs album-sized face swap jobs in a worker pool. A job pairs one registered source
+    identity, whose swap latent is computed once and shared by every worker, with N target images.
+
+    Each job lives in its own directory: job.json holds the manifest and status, progress.ndjson
+    gets one line per finished image and results/ holds the swapped images. Jobs that were still
+    running when the process stopped are picked up again by resume().
+
+    Only the jobs this process runs are kept in memory. Other processes serving the same
+    directory (the workers of serve.py) read those jobs from disk on every call, and cancel
+    them through a marker file in the job directory.
+    """
+    def __init__(self, config: ConfigEntity = None):
+        try:
+            logging.info("Creating BatchJobConfig...")
+            self.batch_job_config = BatchJobConfig(config=config or ConfigEntity())
+            if self.batch_job_config.kind not in ("thread", "process"):
+                raise ValueError(f"Unknown batch executor kind: {self.batch_job_config.kind}")
+            self._lock = threading.RLock()
+            self._executor = None
+            self._jobs = {}
+            self._futures = {}
+            os.makedirs(self.batch_job_config.jobs_dir, exist_ok=True)
+        except Exception as e:
+            logging.error("Failed to initialize BatchJobConfig", exc_info=True)
+            raise CustomException(e, sys) from e
+
+    def _job_dir(self, job_id: str) -> str:
+        if not JOB_ID_PATTERN.match(job_id):
+            raise ValueError(f"Invalid job id: {job_id}")
+        return os.path.join(self.batch_job_config.jobs_dir, job_id)
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                workers = self.batch_job_config.workers
+                logging.info(f"Starting {self.batch_job_config.kind} batch pool with {workers} worker(s).")
+                if self.batch_job_config.kind == "process":
+                    # Spawned workers do not inherit the parent's ONNX Runtime thread pools
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=workers,
+                        mp_context=multiprocessing.get_context("spawn"),
+                        initializer=_init_process_worker
+                    )
+                else:
+                    self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="batch")
+            return self._executor
+
+    def _collect_inputs(self, job_dir: str, files: list, archive, directory: str) -> list:
+        """
+        Copies uploaded files and zip members into the job's inputs/ directory; images of a
+        server-side directory are referenced in place. Returns the item list of the manifest.
+        """
+        inputs_dir = os.path.join(job_dir, "inputs")
+        os.makedirs(inputs_dir, exist_ok=True)
+        max_items = self.batch_job_config.max_items
+        items = []
+
+        def add_item(name: str, source=None, path: str = None):
+            if len(items) >= max_items:
+                raise ValueError(f"A batch job accepts at most {max_items} images")
+            index = len(items)
+            name = _safe_name(name)
+            if path is None:
+                path = os.path.join(inputs_dir, f"{index:05d}_{name}")
+                with open(path, "wb") as f:
+                    shutil.copyfileobj(source, f)
+            items.append({"index": index, "name": name, "input": os.path.abspath(path), "status": "pending"})
+
+        for filename, fileobj in files or []:
+            add_item(filename, source=fileobj)
+
+        if archive is not None:
+            with zipfile.ZipFile(archive) as zf:
+                for member in sorted(zf.infolist(), key=lambda m: m.filename):
+                    if member.is_dir() or not member.filename.lower().endswith(IMAGE_EXTENSIONS):
+                        continue
+                    with zf.open(member) as source:
+                        add_item(member.filename, source=source)
+
+        if directory is not None:
+            input_root = os.path.realpath(self.batch_job_config.input_root)
+            directory = os.path.realpath(directory)
+            if os.path.commonpath([input_root, directory]) != input_root:
+                raise ValueError(f"Directory must be inside {self.batch_job_config.input_root}")
+            if not os.path.isdir(directory):
+                raise ValueError(f"Directory not found: {directory}")
+            for name in sorted(os.listdir(directory)):
+                if name.lower().endswith(IMAGE_EXTENSIONS):
+                    add_item(name, path=os.path.join(directory, name))
+
+        if not items:
+            raise ValueError("The batch job contains no images")
+        return items
+
+    def _write_manifest(self, job: BatchJobArtifact) -> None:
+        job_dir = self._job_dir(job.job_id)
+        manifest = {
+            "job_id": job.job_id,
+            "identity_id": job.identity_id,
+            "mapping": job.mapping,
+            "output_format": job.output_format,
+            "status": job.status,
+            "created_at": job.created_at,
+            "updated_at": job.updated_at,
+            "items": [{key: item[key] for key in ("index", "name", "input")} for item in job.items]
+        }
+        path = os.path.join(job_dir, MANIFEST_FILE)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(manifest, f)
+        os.replace(tmp_path, path)
+
+    def _load_job(self, job_id: str):
+        job_dir = self._job_dir(job_id)
+        path = os.path.join(job_dir, MANIFEST_FILE)
+        if not os.path.exists(path):
+            return None
+        with open(path) as f:
+            manifest = json.load(f)
+        if manifest["status"] == "running" and os.path.exists(os.path.join(job_dir, CANCEL_FILE)):
+            manifest["status"] = "cancelled"
+        items = [dict(item, status="pending") for item in manifest["items"]]
+        job = BatchJobArtifact(
+            job_id=manifest["job_id"],
+            identity_id=manifest["identity_id"],
+            mapping=manifest.get("mapping"),
+            output_format=manifest["output_format"],
+            status=manifest["status"],
+            created_at=manifest["created_at"],
+            updated_at=manifest.get("updated_at"),
+            items=items
+        )
+        progress_path = os.path.join(job_dir, PROGRESS_FILE)
+        if os.path.exists(progress_path):
+            with open(progress_path) as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # A line cut short by a crash; that image is simply run again
+                        continue
+                    items[record["index"]].update(record)
+                    job.finished.append(record)
+        return job
+
+    def _submit_pending(self, job: BatchJobArtifact) -> None:
+        executor = self._get_executor()
+        job_dir = self._job_dir(job.job_id)
+        results_dir = os.path.join(job_dir, "results")
+        os.makedirs(results_dir, exist_ok=True)
+        extension = IMAGE_FORMATS[job.output_format][0]
+        futures = self._futures.setdefault(job.job_id, {})
+        for item in job.items:
+            if item["status"] != "pending":
+                continue
+            stem = os.path.splitext(item["name"])[0]
+            result_path = os.path.join(results_dir, f"{item['index']:05d}_{stem}{extension}")
+            future = executor.submit(_swap_batch_item, item["input"], result_path, job.identity_id, job.output_format,
+                                     job.mapping)
+            futures[item["index"]] = future
+            future.add_done_callback(lambda future, job_id=job.job_id, index=item["index"]: self._on_item_done(job_id, index, future))
+
+    def _on_item_done(self, job_id: str, index: int, future) -> None:
+        record = {"index": index, "finished_at": datetime.now().isoformat(timespec="seconds")}
+        if future.cancelled():
+            with self._lock:
+                if self._jobs[job_id].status == "running":
+                    # Dropped by a pool shutdown, not by the user: stays pending for resume()
+                    self._futures.get(job_id, {}).pop(index, None)
+                    return
+            record["status"] = "cancelled"
+        elif future.exception() is not None:
+            error = future.exception()
+            record.update(status="failed", error=str(error))
+            logging.error(f"Batch job {job_id} item {index} failed: {str(error)}")
+            if isinstance(error, BrokenProcessPool):
+                with self._lock:
+                    self._executor = None
+        else:
+            record.update(status="done", **future.result())
+
+        with self._lock:
+            job = self._jobs[job_id]
+            job.items[index].update(record)
+            job.finished.append(record)
+            self._futures.get(job_id, {}).pop(index, None)
+            with open(os.path.join(self._job_dir(job_id), PROGRESS_FILE), "a") as f:
+                f.write(json.dumps(record) + "\n")
+            if len(job.finished) == len(job.items):
+                if job.status == "running":
+                    job.status = "completed"
+                job.updated_at = datetime.now().isoformat(timespec="seconds")
+                self._write_manifest(job)
+                self._futures.pop(job_id, None)
+                logging.info(f"Batch job {job_id} finished with status {job.status}.")
+            elif job.status == "running" and self._cancel_requested(job_id):
+                self._apply_cancel(job)
+
+    def create_job(self, identity_id: str = None, files: list = None, archive=None, directory: str = None,
+                   output_format: str = None, mapping: dict = None) -> dict:
+        """
+        Creates a job from uploaded files, a zip archive and/or a server-side directory and starts it.
+
+        Args:
+            identity_id (str): Registered source identity used for every face of every image.
+            files (list): (filename, file object) pairs.
+            archive: Path or file object of a zip archive of images.
+            directory (str): Directory of images inside the configured input root.
+            output_format (str): "jpeg" or "webp"; defaults to the configured result format.
+            mapping (dict): {gallery person id: source identity id} instead of identity_id; only
+                faces matched to a mapped person are swapped (see initiate_face_swapper).
+        Returns:
+            dict: The job summary.
+        """
+        if (identity_id is None) == (mapping is None):
+            raise ValueError("Provide exactly one of identity_id or mapping")
+        output_format = output_format or self.batch_job_config.output_format
+        if output_format not in IMAGE_FORMATS:
+            raise ValueError(f"Invalid output_format. Expected one of {sorted(IMAGE_FORMATS)}")
+
+        job_id = uuid.uuid4().hex
+        job_dir = self._job_dir(job_id)
+        os.makedirs(job_dir)
+        try:
+            items = self._collect_inputs(job_dir, files, archive, directory)
+        except Exception:
+            shutil.rmtree(job_dir, ignore_errors=True)
+            raise
+
+        now = datetime.now().isoformat(timespec="seconds")
+        job = BatchJobArtifact(job_id=job_id, identity_id=identity_id, output_format=output_format,
+                               status="running", created_at=now, updated_at=now, items=items, mapping=mapping)
+        with self._lock:
+            self._write_manifest(job)
+            self._jobs[job_id] = job
+            self._submit_pending(job)
+        logging.info(f"Created batch job {job_id} with {len(items)} image(s).")
+        return self.summary(job_id)
+
+    def resume(self) -> list:
+        """
+        Loads the jobs on disk and resubmits the images of jobs that had not finished.
+        Returns:
+            list: Ids of the resumed jobs.
+        """
+        resumed = []
+        for job_id in sorted(os.listdir(self.batch_job_config.jobs_dir)):
+            if not JOB_ID_PATTERN.match(job_id):
+                continue
+            with self._lock:
+                if job_id in self._jobs:
+                    continue
+                job = self._load_job(job_id)
+                if job is not None and job.status == "running" and len(job.finished) < len(job.items):
+                    self._jobs[job_id] = job
+                    self._submit_pending(job)
+                    resumed.append(job_id)
+        if resumed:
+            logging.info(f"Resumed {len(resumed)} batch job(s): {resumed}")
+        return resumed
+
+    def _get_job(self, job_id: str):
+        """
+        Returns the live job if this process runs it; otherwise a fresh snapshot read from disk.
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return self._load_job(job_id)
+            if job.status == "running" and self._cancel_requested(job_id):
+                self._apply_cancel(job)
+            return job
+
+    def _cancel_requested(self, job_id: str) -> bool:
+        return os.path.exists(os.path.join(self._job_dir(job_id), CANCEL_FILE))
+
+    def _apply_cancel(self, job: BatchJobArtifact) -> None:
+        with self._lock:
+            if job.status == "running":
+                job.status = "cancelled"
+                job.updated_at = datetime.now().isoformat(timespec="seconds")
+                self._write_manifest(job)
+            for future in list(self._futures.get(job.job_id, {}).values()):
+                future.cancel()
+
+    def summary(self, job_id: str, include_items: bool = False):
+        """
+        Returns:
+            dict: Status and progress counts of the job, or None if it is unknown.
+        """
+        job = self._get_job(job_id)
+        if job is None:
+            return None
+        with self._lock:
+            counts = {}
+            for item in job.items:
+                counts[item["status"]] = counts.get(item["status"], 0) + 1
+            summary = {
+                "job_id": job.job_id,
+                "status": job.status,
+                "identity_id": job.identity_id,
+                "mapping": job.mapping,
+                "output_format": job.output_format,
+                "created_at": job.created_at,
+                "updated_at": job.updated_at,
+                "total": len(job.items),
+                "finished": len(job.finished),
+                "counts": counts,
+                "progress": round(len(job.finished) / len(job.items), 4) if job.items else 1.0
+            }
+            if include_items:
+                summary["items"] = [dict(item) for item in job.items]
+            return summary
+
+    def list_jobs(self) -> list:
+        job_ids = sorted(name for name in os.listdir(self.batch_job_config.jobs_dir) if JOB_ID_PATTERN.match(name))
+        return [summary for summary in (self.summary(job_id) for job_id in job_ids) if summary is not None]
+
+    def progress_since(self, job_id: str, cursor: int):
+        """
+        Returns the item records finished after the first cursor ones, and whether the job is over.
+        """
+        job = self._get_job(job_id)
+        if job is None:
+            return None, True
+        with self._lock:
+            return [dict(record) for record in job.finished[cursor:]], job.status != "running" or len(job.finished) == len(job.items)
+
+    def result_path(self, job_id: str, index: int):
+        job = self._get_job(job_id)
+        if job is None or not 0 <= index < len(job.items):
+            return None
+        result = job.items[index].get("result")
+        if not result:
+            return None
+        return os.path.join(self._job_dir(job_id), "results", result)
+
+    def cancel(self, job_id: str) -> bool:
+        """
+        Cancels the images of a job that have not started yet; running ones still finish.
+        """
+        job = self._get_job(job_id)
+        if job is None:
+            return False
+        with self._lock:
+            if job.status == "running":
+                open(os.path.join(self._job_dir(job_id), CANCEL_FILE), "w").close()
+            if job_id in self._jobs:
+                self._apply_cancel(job)
+        logging.info(f"Cancelled batch job {job_id}.")
+        return True
+
+    def shutdown(self, wait: bool = True) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait, cancel_futures=True)
+
+
+_batch_job_manager = None
+_batch_job_manager_lock = threading.Lock()
+
+
+def get_batch_job_manager() -> BatchJobManager:
+    """
+    Returns the process-wide batch job manager, creating it on first use.
+    """
+    global _batch_job_manager
+    if _batch_job_manager is None:
+        with _batch_job_manager_lock:
+            if _batch_job_manager is None:
+                _batch_job_manager = BatchJobManager()
+    return _batch_job_manager
@@ -0,0 +1,145 @@
+from src.entity.face_swap_config import ConfigEntity, DetectionCacheConfig
+from src.entity.face_swap_artifact import DetectionCacheArtifact
+from src.components.face_detector import FaceDetector, get_face_detector
+from src.components.metrics import get_metrics
+from src.exceptions import CustomException
+from src.logger import logging
+from src.utils import compute_image_hash
+
+import os
+import sys
+import threading
+import numpy as np
+from collections import OrderedDict
+
+# Rough per-face allocation that is not held in numpy arrays (Face dict, keys, scalars)
+FACE_OVERHEAD_BYTES = 1024
+
+
+class DetectionCache:
+    """
+    LRU cache of detected Face objects keyed by image content hash and detector configuration,
+    bounded by an entry count and a memory budget.
+    Cached Face objects are shared between callers and must be treated as read-only.
+    """
+    def __init__(self, config: ConfigEntity = None, face_detector: FaceDetector = None):
+        try:
+            logging.info("Creating DetectionCacheConfig...")
+            self.detection_cache_config = DetectionCacheConfig(config=config or ConfigEntity())
+            self.face_detector = face_detector or get_face_detector()
+            self._lock = threading.Lock()
+            self._entries = OrderedDict()
+            self._bytes_used = 0
+            self._hits = 0
+            self._misses = 0
+            self._evictions = 0
+        except Exception as e:
+            logging.error("Failed to initialize DetectionCacheConfig", exc_info=True)
+            raise CustomException(e, sys) from e
+
+    @staticmethod
+    def detector_signature(app) -> tuple:
+        """
+        Identifies the detector configuration of a prepared FaceAnalysis app (model pack, det_size, threshold).
+        """
+        return (
+            os.path.basename(os.path.normpath(app.model_dir)),
+            tuple(app.det_size),
+            float(app.det_thresh)
+        )
+
+    @staticmethod
+    def _estimate_size(faces: list) -> int:
+        size = 0
+        for face in faces:
+            size += FACE_OVERHEAD_BYTES
+            for value in face.values():
+                if isinstance(value, np.ndarray):
+                    size += value.nbytes
+        return size
+
+    def get(self, key: tuple):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._misses += 1
+            else:
+                self._entries.move_to_end(key)
+                self._hits += 1
+        get_metrics().count_cache_lookup("detection", entry is not None)
+        return list(entry[0]) if entry is not None else None
+
+    def put(self, key: tuple, faces: list) -> None:
+        size = self._estimate_size(faces)
+        max_bytes = self.detection_cache_config.max_bytes
+        if size > max_bytes:
+            logging.warning(f"Detection result of {size} bytes exceeds cache budget; not caching.")
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes_used -= previous[1]
+            self._entries[key] = (list(faces), size)
+            self._bytes_used += size
+            while self._entries and (
+                self._bytes_used > max_bytes
+                or len(self._entries) > self.detection_cache_config.max_entries
+            ):
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._bytes_used -= evicted_size
+                self._evictions += 1
+
+    def detect(self, app, image, image_hash: str = None) -> list:
+        """
+        Returns the faces detected in an image, running the detector only on a cache miss.
+
+        Args:
+            app (FaceAnalysis): Prepared face analysis app.
+            image (np.ndarray): BGR image as loaded by OpenCV; its content is the cache key.
+            image_hash (str): Optional precomputed content hash of image.
+        Returns:
+            list: Detected Face objects.
+        """
+        key = (image_hash or compute_image_hash(image),) + self.detector_signature(app) + self.face_detector.signature
+        faces = self.get(key)
+        if faces is not None:
+            logging.info(f"Detection cache hit: {len(faces)} face(s).")
+            return faces
+
+        faces = self.face_detector.detect(app, image)
+        self.put(key, faces)
+        return list(faces)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes_used = 0
+
+    def stats(self) -> DetectionCacheArtifact:
+        with self._lock:
+            lookups = self._hits + self._misses
+            return DetectionCacheArtifact(
+                entries=len(self._entries),
+                bytes_used=self._bytes_used,
+                max_bytes=self.detection_cache_config.max_bytes,
+                hits=self._hits,
+                misses=self._misses,
+                evictions=self._evictions,
+                hit_rate=round(self._hits / lookups, 4) if lookups else 0.0
+            )
+
+
+_detection_cache = None
+_detection_cache_lock = threading.Lock()
+
+
+def get_detection_cache() -> DetectionCache:
+    """
+    Returns the process-wide detection cache, creating it on first use.
+    """
+    global _detection_cache
+    if _detection_cache is None:
+        with _detection_cache_lock:
+            if _detection_cache is None:
+                _detection_cache = DetectionCache()
+    return _detection_cache
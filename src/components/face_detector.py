@@ -0,0 +1,147 @@
+from src.entity.face_swap_config import ConfigEntity, FaceDetectorConfig
+from src.components.micro_batcher import MicroBatchScheduler, get_micro_batch_scheduler
+from src.exceptions import CustomException
+from src.logger import logging
+
+import sys
+import threading
+import numpy as np
+
+
+class FaceDetector:
+    """
+    Runs the FaceAnalysis detector with an input size chosen per image.
+
+    In "lean" mode the detector input is the image itself rounded up to the model stride and
+    capped at DET_SIZE, so small images are not upscaled and huge ones are downscaled once.
+    Only when the first pass suggests small faces were missed (tiny faces, or none at all) does
+    a second pass run: at up to DETECTION_MULTISCALE_MAX_SIDE for large images, or upscaled to
+    DET_SIZE as before for small ones. Both passes are merged with the detector's NMS.
+    RetinaFace.detect returns boxes and keypoints in original image coordinates, so faces
+    are always reported at full resolution. "full" mode reproduces FaceAnalysis.get.
+    """
+    def __init__(self, config: ConfigEntity = None, micro_batch_scheduler: MicroBatchScheduler = None):
+        try:
+            logging.info("Creating FaceDetectorConfig...")
+            self.face_detector_config = FaceDetectorConfig(config=config or ConfigEntity())
+            self.micro_batch_scheduler = micro_batch_scheduler or get_micro_batch_scheduler()
+            if self.face_detector_config.mode not in ("lean", "full"):
+                raise ValueError(f"Unknown detection mode: {self.face_detector_config.mode}")
+        except Exception as e:
+            logging.error("Failed to initialize FaceDetectorConfig", exc_info=True)
+            raise CustomException(e, sys) from e
+
+    @property
+    def signature(self) -> tuple:
+        """
+        Identifies the detection behaviour, for cache keys.
+        """
+        config = self.face_detector_config
+        if config.mode == "full":
+            return ("full",)
+        return ("lean", config.size_step, config.multiscale_max_side, config.small_face_px)
+
+    @staticmethod
+    def supports_dynamic_size(det_model) -> bool:
+        input_shape = getattr(det_model, "input_shape", None)
+        return input_shape is not None and not isinstance(input_shape[2], int)
+
+    def input_size(self, image_shape, max_side: int, upscale: bool = False) -> tuple:
+        """
+        Detector input (width, height): the image scaled to fit max_side, rounded up to a
+        multiple of the size step. Images smaller than max_side are only enlarged with upscale.
+        """
+        step = self.face_detector_config.size_step
+        height, width = image_shape[:2]
+        scale = max_side / max(height, width)
+        if not upscale:
+            scale = min(1.0, scale)
+        return (
+            max(int(np.ceil(width * scale / step)) * step, step),
+            max(int(np.ceil(height * scale / step)) * step, step)
+        )
+
+    def _expects_small_faces(self, bboxes, image_shape, input_size) -> bool:
+        config = self.face_detector_config
+        if bboxes.shape[0] == 0:
+            return True
+        det_scale = min(input_size[0] / image_shape[1], input_size[1] / image_shape[0])
+        face_sides = np.minimum(bboxes[:, 2] - bboxes[:, 0], bboxes[:, 3] - bboxes[:, 1]) * det_scale
+        return float(face_sides.min()) < config.small_face_px
+
+    def detect_boxes(self, app, image) -> tuple:
+        """
+        Returns:
+            tuple: (bboxes, kpss) as returned by RetinaFace.detect, in image coordinates and sorted by score.
+        """
+        det_model = app.det_model
+        config = self.face_detector_config
+        if config.mode == "full" or not self.supports_dynamic_size(det_model):
+            return det_model.detect(image, max_num=0, metric="default")
+
+        det_side = max(config.det_size)
+        input_size = self.input_size(image.shape, det_side)
+        bboxes, kpss = det_model.detect(image, input_size=input_size, max_num=0, metric="default")
+        if not config.multiscale_max_side or not self._expects_small_faces(bboxes, image.shape, input_size):
+            return bboxes, kpss
+
+        if max(image.shape[:2]) > det_side:
+            high_input_size = self.input_size(image.shape, config.multiscale_max_side)
+        else:
+            high_input_size = self.input_size(image.shape, det_side, upscale=True)
+        if max(high_input_size) <= max(input_size):
+            return bboxes, kpss
+        logging.info(f"Small faces expected; second detection pass at {high_input_size}.")
+        high_bboxes, high_kpss = det_model.detect(image, input_size=high_input_size, max_num=0, metric="default")
+        bboxes = np.vstack([bboxes, high_bboxes])
+        kpss = np.concatenate([kpss, high_kpss]) if kpss is not None and high_kpss is not None else None
+        order = bboxes[:, 4].argsort()[::-1]
+        bboxes = bboxes[order]
+        keep = det_model.nms(bboxes)
+        return bboxes[keep], (kpss[order][keep] if kpss is not None else None)
+
+    def detect(self, app, image) -> list:
+        """
+        Equivalent to FaceAnalysis.get: detects faces, then runs every other loaded model
+        (only recognition in lean mode) on each face. With micro-batching enabled, the
+        recognition crops are embedded in batches shared with other requests.
+        Returns:
+            list: Detected Face objects.
+        """
+        from insightface.app.common import Face
+        from insightface.utils import face_align
+
+        bboxes, kpss = self.detect_boxes(app, image)
+        faces = [
+            Face(bbox=bboxes[i, 0:4], kps=kpss[i] if kpss is not None else None, det_score=bboxes[i, 4])
+            for i in range(bboxes.shape[0])
+        ]
+        if not faces:
+            return faces
+        for taskname, model in app.models.items():
+            if taskname == "detection":
+                continue
+            if taskname == "recognition" and kpss is not None and self.micro_batch_scheduler.can_batch(model):
+                aimgs = [face_align.norm_crop(image, landmark=face.kps, image_size=model.input_size[0]) for face in faces]
+                for face, embedding in zip(faces, self.micro_batch_scheduler.embed(model, aimgs)):
+                    face.embedding = embedding.flatten()
+                continue
+            for face in faces:
+                model.get(image, face)
+        return faces
+
+
+_face_detector = None
+_face_detector_lock = threading.Lock()
+
+
+def get_face_detector() -> FaceDetector:
+    """
+    Returns the process-wide face detector, creating it on first use.
+    """
+    global _face_detector
+    if _face_detector is None:
+        with _face_detector_lock:
+            if _face_detector is None:
+                _face_detector = FaceDetector()
+    return _face_detector
@@ -1,125 +1,158 @@
 from src.exceptions import CustomException
 from src.logger import logging
 from src.entity.face_swap_config import ConfigEntity, SwapperModelConfig
-from src.entity.face_swap_artifact import SwapperModelArtifact
-from src.utils import download_weights_from_google_drive
+from src.entity.face_swap_artifact import SwapperModelArtifact, SourceIdentityArtifact
+from src.components.detection_cache import DetectionCache, get_detection_cache
+from src.components.swap_engine import SwapEngine
+from src.components.artifact_sink import ArtifactSink, get_artifact_sink
+from src.components.thumbnailer import Thumbnailer, get_thumbnailer
+from src.components.result_store import ResultStore, get_result_store
+from src.components.metrics import Metrics, get_metrics
+from src.utils import encode_image
 
-import insightface
 import sys
-import cv2
 import os
-import matplotlib.pyplot as plt
+import uuid
+import numpy as np
 from datetime import datetime
-import base64
-import io
 
 
 class FaceSwap:
-    def __init__(self):
+    def __init__(self, detection_cache: DetectionCache = None, artifact_sink: ArtifactSink = None, metrics: Metrics = None,
+                 thumbnailer: Thumbnailer = None, result_store: ResultStore = None):
         try:
             logging.info("Creating SwapperModelConfig...")
             self.swapper_model_config = SwapperModelConfig(config=ConfigEntity())
+            self.detection_cache = detection_cache or get_detection_cache()
+            self.artifact_sink = artifact_sink or get_artifact_sink()
+            self.metrics = metrics or get_metrics()
+            self.thumbnailer = thumbnailer or get_thumbnailer()
+            self.result_store = result_store or get_result_store()
             logging.info(f"SwapperModelConfig initialized with model path: {self.swapper_model_config.swapper_model_dir}")
         except Exception as e:
             logging.error("Failed to initialize SwapperModelConfig", exc_info=True)
             raise CustomException(e, sys) from e
 
-    def detect_and_save_faces(self, app, img_multi_faces) -> tuple[list, list, list]:
+    def detect_and_save_faces(self, app, img_multi_faces, image_hash: str = None, name_prefix: str = None,
+                              thumbnail_mode: str = None) -> tuple[list, list]:
+        """
+        Detects the faces and builds their thumbnails (see Thumbnailer.make).
+        Returns:
+            tuple: (faces, thumbnails) with one ThumbnailArtifact per face inside the image.
+        """
         try:
             if img_multi_faces is None:
                 logging.error("Multi-face image is None")
                 raise ValueError("Multi-face image is None")
-            logging.info("Converting multi-face image to RGB format...")
-            img_multi_faces_rgb = cv2.cvtColor(img_multi_faces, cv2.COLOR_BGR2RGB)
             logging.info("Detecting faces in multi-face image...")
-            faces = app.get(img_multi_faces_rgb)
+            with self.metrics.span("detect"):
+                faces = self.detection_cache.detect(app, img_multi_faces, image_hash=image_hash)
             if not faces:
                 logging.info("No faces detected in the multi-face image.")
-                return [], [], []
+                return [], []
 
             logging.info(f"{len(faces)} face(s) detected in multi-face image.")
-            detected_faces_dir = os.path.join(self.swapper_model_config.output_dir, self.swapper_model_config.detected_faces_dir)
-            os.makedirs(detected_faces_dir, exist_ok=True)
 
-            face_paths = []
-            base64_faces = []
-            for i, face in enumerate(faces):
-                bbox = face['bbox']
-                bbox = [int(b) for b in bbox]
-                if bbox[2] <= bbox[0] or bbox[3] <= bbox[1]:
-                    logging.warning(f"Invalid bounding box for face {i+1}: {bbox}. Skipping.")
-                    continue
-                face_img = img_multi_faces_rgb[bbox[1]:bbox[3], bbox[0]:bbox[2]]
-                if face_img.size == 0:
-                    logging.warning(f"Empty face image for face {i+1}. Skipping.")
-                    continue
-                face_path = os.path.join(detected_faces_dir, f"face_{i+1}.jpg")
-                plt.imsave(face_path, face_img)
-                logging.info(f"Saved face {i+1} to {face_path}")
+            with self.metrics.span("face_crops"):
+                thumbnails = self.thumbnailer.make(img_multi_faces, faces, name_prefix=name_prefix, mode=thumbnail_mode)
 
-                success, buffer = cv2.imencode('.jpg', cv2.cvtColor(face_img, cv2.COLOR_RGB2BGR), [int(cv2.IMWRITE_JPEG_QUALITY), 100])
-                if not success:
-                    logging.warning(f"Failed to encode face {i+1} to JPEG. Skipping base64 conversion.")
-                    continue
-                base64_face = base64.b64encode(buffer).decode('utf-8')
-                base64_faces.append(base64_face)
-                face_paths.append(face_path)
-
-            return faces, face_paths, base64_faces
+            return faces, thumbnails
         except Exception as e:
             logging.error("Error during face detection and saving", exc_info=True)
             raise CustomException(e, sys) from e
 
-    def perform_face_swapping(self, app, img_multi_faces, img_single_face, selected_indices: list) -> SwapperModelArtifact:
+    def perform_face_swapping(self, app, swapper, img_multi_faces, img_single_face, selected_indices: list,
+                              multi_face_hash: str = None, single_face_hash: str = None,
+                              source_identity: SourceIdentityArtifact = None, inplace: bool = False,
+                              output_format: str = None, faces_multi: list = None, result_key: str = None,
+                              face_latents: dict = None) -> SwapperModelArtifact:
+        """
+        Swaps the source face onto the selected faces. The BGR image is used as-is end to end;
+        with inplace=True the swapped faces are written directly into img_multi_faces instead of a copy.
+        The result is encoded once in memory; it is written to disk only when the artifact sink is enabled.
+        Detections from an earlier upload can be passed as faces_multi to skip detection.
+        With a result_key the encoded result is kept in the result store instead of the artifact sink.
+        face_latents maps face indices to their own source latents (see GalleryIndex.match); only
+        those faces are swapped and no source image or identity is needed.
+        """
         try:
-            model_path = self.swapper_model_config.swapper_model_dir
-            if not os.path.exists(model_path):
-                logging.info("Downloading face swapper model weights...")
-                download_weights_from_google_drive()
-            
-            logging.info(f"Loading face swapper model from: {model_path}")
-            swapper = insightface.model_zoo.get_model(model_path, download=False)
-            logging.info("Face swapper model loaded successfully.")
-
-            logging.info("Converting images to RGB format...")
-            img_multi_faces_rgb = cv2.cvtColor(img_multi_faces, cv2.COLOR_BGR2RGB)
-            img_single_face_rgb = cv2.cvtColor(img_single_face, cv2.COLOR_BGR2RGB)
-
-            logging.info("Detecting faces in multi-face image...")
-            faces_multi = app.get(img_multi_faces_rgb)
-            logging.info("Detecting face in single-face image...")
-            faces_single = app.get(img_single_face_rgb)
-
+            swap_engine = SwapEngine(swapper)
+            if faces_multi is None:
+                logging.info("Detecting faces in multi-face image...")
+                with self.metrics.span("detect"):
+                    faces_multi = self.detection_cache.detect(app, img_multi_faces, image_hash=multi_face_hash)
             if not faces_multi:
                 logging.warning("No faces detected in the multi-face image.")
                 raise ValueError("No faces detected in the multi-face image!")
-            if not faces_single:
-                logging.warning("No faces detected in the single-face image.")
-                raise ValueError("No faces detected in the single-face image!")
-
             logging.info(f"{len(faces_multi)} face(s) detected in multi-face image.")
-            logging.info(f"{len(faces_single)} face(s) detected in single-face image.")
 
-            source_face = faces_single[0]
-            result_image = img_multi_faces_rgb.copy()
+            if face_latents is not None:
+                logging.info(f"Using per-face source latents for {len(face_latents)} face(s).")
+                source_latent = None
+            elif source_identity is not None:
+                logging.info(f"Using precomputed latent of source identity {source_identity.identity_id}.")
+                source_latent = source_identity.latent
+            else:
+                logging.info("Detecting face in single-face image...")
+                with self.metrics.span("detect_source"):
+                    faces_single = self.detection_cache.detect(app, img_single_face, image_hash=single_face_hash)
+                if not faces_single:
+                    logging.warning("No faces detected in the single-face image.")
+                    raise ValueError("No faces detected in the single-face image!")
+                logging.info(f"{len(faces_single)} face(s) detected in single-face image.")
+                with self.metrics.span("latent"):
+                    source_latent = swap_engine.compute_latent(faces_single[0].normed_embedding)
+
             logging.info(f"Performing face swap for indices: {selected_indices}")
+            target_indices = []
             for idx in selected_indices:
                 if idx < len(faces_multi):
-                    logging.info(f"Swapping face {idx + 1}...")
-                    result_image = swapper.get(result_image, faces_multi[idx], source_face, paste_back=True)
+                    target_indices.append(idx)
                 else:
                     logging.warning(f"Index {idx} is out of range. Skipping.")
 
-            result_dir = os.path.join(self.swapper_model_config.output_dir, self.swapper_model_config.result_image_dir)
-            os.makedirs(result_dir, exist_ok=True)
-
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            result_image_path = os.path.join(result_dir, f"swapped_face_{timestamp}.jpg")
-            result_bgr = cv2.cvtColor(result_image, cv2.COLOR_RGB2BGR)
-            cv2.imwrite(result_image_path, result_bgr, [int(cv2.IMWRITE_JPEG_QUALITY), 100])
-            logging.info(f"Swapped image saved to: {result_image_path}")
-
-            return SwapperModelArtifact(result_image_path=result_image_path, detected_face_paths=[], base64_faces=[])
+            if face_latents is not None:
+                target_indices = [idx for idx in target_indices if idx in face_latents]
+
+            with self.metrics.span("swap"):
+                result_image = img_multi_faces if inplace else img_multi_faces.copy()
+                if not target_indices:
+                    logging.info("No faces to swap; returning the image unchanged.")
+                elif self.swapper_model_config.swap_mode == "batched":
+                    logging.info(f"Swapping {len(target_indices)} face(s) in batched mode...")
+                    latent = source_latent if face_latents is None else np.concatenate(
+                        [face_latents[idx].reshape((1, -1)) for idx in target_indices])
+                    swap_engine.swap_batch(result_image, [faces_multi[idx] for idx in target_indices], latent, inplace=True)
+                else:
+                    for idx in target_indices:
+                        logging.info(f"Swapping face {idx + 1}...")
+                        latent = source_latent if face_latents is None else face_latents[idx]
+                        swap_engine.swap_batch(result_image, [faces_multi[idx]], latent, inplace=True)
+
+            image_format = output_format or self.swapper_model_config.result_image_format
+            with self.metrics.span("encode"):
+                result_bytes, extension, media_type = encode_image(result_image, image_format, self.swapper_model_config.result_image_quality)
+            if result_key is not None and self.result_store.enabled:
+                with self.metrics.span("result_store"):
+                    result_image_path = self.result_store.put(result_key, result_bytes, extension)
+                logging.info(f"Swapped image stored at: {result_image_path}")
+            else:
+                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+                result_image_path = self.artifact_sink.submit(
+                    os.path.join(self.swapper_model_config.result_image_dir, f"swapped_face_{timestamp}_{uuid.uuid4().hex[:8]}{extension}"),
+                    result_bytes
+                )
+                if result_image_path:
+                    logging.info(f"Swapped image queued for saving to: {result_image_path}")
+
+            return SwapperModelArtifact(
+                result_image_path=result_image_path or "",
+                detected_face_paths=[],
+                thumbnails=[],
+                result_image=result_image,
+                result_image_bytes=result_bytes,
+                result_media_type=media_type
+            )
         except Exception as e:
             logging.error("Error during顔 swapping operation", exc_info=True)
             raise CustomException(e, sys) from e
\ No newline at end of file
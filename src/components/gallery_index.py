@@ -0,0 +1,278 @@
+from src.entity.face_swap_config import ConfigEntity, GalleryIndexConfig
+from src.entity.face_swap_artifact import GalleryPersonArtifact, GalleryMatchArtifact
+from src.exceptions import CustomException
+from src.logger import logging
+
+import os
+import re
+import sys
+import json
+import uuid
+import threading
+import numpy as np
+from contextlib import contextmanager
+from datetime import datetime
+
+try:
+    import fcntl
+except ImportError:  # Windows: only the in-process lock applies
+    fcntl = None
+
+PERSON_ID_PATTERN = re.compile(r"^[A-Za-z0-9_.-]{1,64}$")
+ENTRIES_FILE = "entries.json"
+
+
+def _normalize(embeddings) -> np.ndarray:
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    embeddings = embeddings.reshape((-1, embeddings.shape[-1]))
+    norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+    return embeddings / np.maximum(norms, 1e-12)
+
+
+class GalleryIndex:
+    """
+    Index of known people for selecting swap targets by who they are rather than by position.
+
+    Every enrolled face adds one normed recognition embedding as a float32 row to a
+    contiguous matrix on disk, which is memory-mapped rather than read into memory; a person
+    may have several rows (photos). entries.json maps rows to people and names the current
+    matrix file. Matching a whole image is one matrix product of its face embeddings with
+    the gallery, reduced to the best row per person. Rows are only ever appended to the
+    current matrix; removing a person writes a new matrix file, so a reader in another
+    worker process never sees a matrix shorter than the entries it loaded.
+    """
+    def __init__(self, config: ConfigEntity = None):
+        try:
+            logging.info("Creating GalleryIndexConfig...")
+            self.gallery_index_config = GalleryIndexConfig(config=config or ConfigEntity())
+            self._lock = threading.RLock()
+            self._loaded_stat = None
+            self._entries = {"generation": 0, "rows": []}
+            self._matrix = np.zeros((0, self.gallery_index_config.embedding_dim), dtype=np.float32)
+            self._people = {}
+            self._person_ids = []
+            self._order = np.zeros(0, dtype=np.int64)
+            self._starts = np.zeros(0, dtype=np.int64)
+            os.makedirs(self.gallery_index_config.gallery_dir, exist_ok=True)
+        except Exception as e:
+            logging.error("Failed to initialize GalleryIndexConfig", exc_info=True)
+            raise CustomException(e, sys) from e
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.gallery_index_config.gallery_dir, name)
+
+    @staticmethod
+    def _matrix_name(generation: int) -> str:
+        return f"embeddings.{generation}.f32"
+
+    @contextmanager
+    def _write_lock(self):
+        """
+        Serialises writers within the process and across worker processes.
+        """
+        with self._lock, open(self._path(".lock"), "a") as f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _refresh(self) -> None:
+        """
+        Reloads the entries and re-maps the matrix when another writer (or process) changed them.
+        """
+        try:
+            # Every write replaces the file, so the inode changes even within the mtime granularity
+            stat = os.stat(self._path(ENTRIES_FILE))
+            file_stat = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        except FileNotFoundError:
+            file_stat = None
+        if file_stat == self._loaded_stat:
+            return
+        with self._lock:
+            entries = {"generation": 0, "rows": []}
+            if file_stat is not None:
+                with open(self._path(ENTRIES_FILE)) as f:
+                    entries = json.load(f)
+            rows = entries["rows"]
+            dim = self.gallery_index_config.embedding_dim
+            matrix = np.zeros((0, dim), dtype=np.float32)
+            if rows:
+                matrix = np.memmap(self._path(self._matrix_name(entries["generation"])), dtype=np.float32,
+                                   mode="r", shape=(len(rows), dim))
+            people = {}
+            for row in rows:
+                person = people.get(row["person_id"])
+                if person is None:
+                    people[row["person_id"]] = GalleryPersonArtifact(
+                        person_id=row["person_id"], label=row["label"], entries=1, created_at=row["created_at"]
+                    )
+                else:
+                    person.entries += 1
+            person_ids = list(people)
+            person_index = {person_id: i for i, person_id in enumerate(person_ids)}
+            row_person = np.array([person_index[row["person_id"]] for row in rows], dtype=np.int64)
+            # Columns ordered by person, so the best row of each person is one reduceat over its slice
+            order = np.argsort(row_person, kind="stable")
+            starts = np.flatnonzero(np.r_[True, np.diff(row_person[order]) != 0]) if rows else np.zeros(0, dtype=np.int64)
+            self._entries, self._matrix, self._people, self._person_ids = entries, matrix, people, person_ids
+            self._order, self._starts = order, starts
+            self._loaded_stat = file_stat
+
+    def _write_entries(self, entries: dict) -> None:
+        path = self._path(ENTRIES_FILE)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(entries, f)
+        os.replace(tmp_path, path)
+        self._loaded_stat = None
+        self._refresh()
+
+    @property
+    def version(self) -> str:
+        """
+        Changes whenever people are enrolled or removed, for keying results that depend on matches.
+        """
+        self._refresh()
+        return f"{self._entries['generation']}.{len(self._entries['rows'])}"
+
+    def __len__(self) -> int:
+        self._refresh()
+        return len(self._person_ids)
+
+    def add(self, embedding, person_id: str = None, label: str = None) -> GalleryPersonArtifact:
+        """
+        Enrolls one face. A new person is created unless person_id names an existing one.
+        Returns:
+            GalleryPersonArtifact: The person the face was added to.
+        """
+        person_id = person_id or uuid.uuid4().hex[:16]
+        if not PERSON_ID_PATTERN.match(person_id):
+            raise ValueError(f"Invalid person id: {person_id}")
+        row = _normalize(embedding)
+        if row.shape != (1, self.gallery_index_config.embedding_dim):
+            raise ValueError(f"Expected one {self.gallery_index_config.embedding_dim}-d embedding, got {row.shape}")
+
+        with self._write_lock():
+            self._loaded_stat = None
+            self._refresh()
+            entries = {"generation": self._entries["generation"], "rows": [dict(entry) for entry in self._entries["rows"]]}
+            row_bytes = row.shape[1] * 4
+            matrix_path = self._path(self._matrix_name(entries["generation"]))
+            with open(matrix_path, "ab") as f:
+                # Drop a row appended by a writer that died before updating the entries
+                if f.tell() > len(entries["rows"]) * row_bytes:
+                    f.truncate(len(entries["rows"]) * row_bytes)
+                f.write(row.tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+            previous = [entry for entry in entries["rows"] if entry["person_id"] == person_id]
+            entries["rows"].append({
+                "person_id": person_id,
+                "label": label if label is not None else (previous[0]["label"] if previous else None),
+                "created_at": previous[0]["created_at"] if previous else datetime.now().isoformat(timespec="seconds")
+            })
+            if label is not None:
+                for entry in entries["rows"]:
+                    if entry["person_id"] == person_id:
+                        entry["label"] = label
+            self._write_entries(entries)
+        logging.info(f"Enrolled a face for gallery person {person_id}.")
+        return self.get(person_id)
+
+    def remove(self, person_id: str) -> bool:
+        with self._write_lock():
+            self._loaded_stat = None
+            self._refresh()
+            rows = self._entries["rows"]
+            keep = [i for i, entry in enumerate(rows) if entry["person_id"] != person_id]
+            if len(keep) == len(rows):
+                return False
+            old_generation = self._entries["generation"]
+            generation = old_generation + 1
+            new_path = self._path(self._matrix_name(generation))
+            tmp_path = f"{new_path}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(np.ascontiguousarray(self._matrix[keep], dtype=np.float32).tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, new_path)
+            self._write_entries({"generation": generation, "rows": [rows[i] for i in keep]})
+            # Readers that still map the old file keep it alive until they reload
+            os.remove(self._path(self._matrix_name(old_generation)))
+        logging.info(f"Removed gallery person {person_id}.")
+        return True
+
+    def get(self, person_id: str):
+        """
+        Returns:
+            GalleryPersonArtifact: The person, or None if unknown.
+        """
+        self._refresh()
+        person = self._people.get(person_id)
+        return GalleryPersonArtifact(**vars(person)) if person is not None else None
+
+    def list_people(self) -> list:
+        self._refresh()
+        return [GalleryPersonArtifact(**vars(person)) for person in self._people.values()]
+
+    def similarities(self, embeddings) -> tuple:
+        """
+        Cosine similarity of each face to each person (the best of the person's rows).
+        Returns:
+            tuple: (GalleryPersonArtifact per person id in column order, F x P similarity matrix).
+        """
+        self._refresh()
+        with self._lock:
+            matrix, people, person_ids = self._matrix, self._people, self._person_ids
+            order, starts = self._order, self._starts
+        faces = _normalize(embeddings)
+        if not person_ids or faces.shape[0] == 0:
+            return people, np.zeros((faces.shape[0], len(person_ids)), dtype=np.float32)
+        scores = faces @ matrix.T
+        return people, np.maximum.reduceat(scores[:, order], starts, axis=1)
+
+    def match(self, embeddings, threshold: float = None) -> list:
+        """
+        Assigns faces to people: the most similar (face, person) pairs above the threshold are
+        taken first and each face and each person is used at most once.
+        Returns:
+            list: One GalleryMatchArtifact per face, with person_id None when no person matched.
+        """
+        threshold = self.gallery_index_config.match_threshold if threshold is None else threshold
+        people, scores = self.similarities(embeddings)
+        person_ids = list(people)
+        best = scores.max(axis=1) if scores.shape[1] else np.zeros(scores.shape[0], dtype=np.float32)
+        matches = [GalleryMatchArtifact(face_index=i, person_id=None, label=None, similarity=round(float(best[i]), 4))
+                   for i in range(scores.shape[0])]
+        candidates = np.argwhere(scores >= threshold)
+        used_faces, used_people = set(), set()
+        for face, person in candidates[np.argsort(-scores[candidates[:, 0], candidates[:, 1]], kind="stable")]:
+            if face in used_faces or person in used_people:
+                continue
+            used_faces.add(face)
+            used_people.add(person)
+            person_id = person_ids[person]
+            matches[face] = GalleryMatchArtifact(
+                face_index=int(face), person_id=person_id, label=people[person_id].label,
+                similarity=round(float(scores[face, person]), 4)
+            )
+        return matches
+
+
+_gallery_index = None
+_gallery_index_lock = threading.Lock()
+
+
+def get_gallery_index() -> GalleryIndex:
+    """
+    Returns the process-wide gallery index, creating it on first use.
+    """
+    global _gallery_index
+    if _gallery_index is None:
+        with _gallery_index_lock:
+            if _gallery_index is None:
+                _gallery_index = GalleryIndex()
+    return _gallery_index
@@ -0,0 +1,169 @@
+from src.entity.face_swap_config import ConfigEntity, IdentityRegistryConfig
+from src.entity.face_swap_artifact import SourceIdentityArtifact
+from src.components.detection_cache import DetectionCache, get_detection_cache
+from src.components.swap_engine import SwapEngine
+from src.exceptions import CustomException
+from src.logger import logging
+from src.utils import compute_image_hash
+
+import os
+import re
+import sys
+import threading
+import numpy as np
+from datetime import datetime
+
+IDENTITY_ID_PATTERN = re.compile(r"^[0-9a-f]{16}$")
+
+
+class IdentityRegistry:
+    """
+    Registry of reusable source identities. Each identity keeps the normed
+    embedding of its source face and the latent precomputed for the current
+    swapper, in memory and as an .npz file so that it survives restarts.
+    """
+    def __init__(self, config: ConfigEntity = None, detection_cache: DetectionCache = None):
+        try:
+            logging.info("Creating IdentityRegistryConfig...")
+            self.identity_registry_config = IdentityRegistryConfig(config=config or ConfigEntity())
+            self.detection_cache = detection_cache or get_detection_cache()
+            self._lock = threading.Lock()
+            self._identities = {}
+            os.makedirs(self.identity_registry_config.identity_store_dir, exist_ok=True)
+        except Exception as e:
+            logging.error("Failed to initialize IdentityRegistryConfig", exc_info=True)
+            raise CustomException(e, sys) from e
+
+    def _identity_path(self, identity_id: str) -> str:
+        if not IDENTITY_ID_PATTERN.match(identity_id):
+            raise ValueError(f"Invalid identity id: {identity_id}")
+        return os.path.join(self.identity_registry_config.identity_store_dir, f"{identity_id}.npz")
+
+    def _save(self, identity: SourceIdentityArtifact) -> None:
+        path = self._identity_path(identity.identity_id)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez(
+                f,
+                embedding=identity.embedding,
+                latent=identity.latent,
+                latent_model=np.array(identity.latent_model),
+                det_score=np.array(identity.det_score, dtype=np.float32),
+                created_at=np.array(identity.created_at)
+            )
+        os.replace(tmp_path, path)
+
+    def _load(self, identity_id: str):
+        path = self._identity_path(identity_id)
+        if not os.path.exists(path):
+            return None
+        with np.load(path) as data:
+            return SourceIdentityArtifact(
+                identity_id=identity_id,
+                embedding=data["embedding"],
+                latent=data["latent"],
+                latent_model=str(data["latent_model"]),
+                det_score=float(data["det_score"]),
+                created_at=str(data["created_at"])
+            )
+
+    def register(self, app, swapper, img_single_face, image_hash: str = None) -> SourceIdentityArtifact:
+        """
+        Detects the source face once and stores its embedding and swap latent.
+        The identity id is derived from the image content, so re-registering the same image is idempotent.
+        Returns:
+            SourceIdentityArtifact: The registered identity.
+        """
+        try:
+            if img_single_face is None:
+                raise ValueError("Single-face image is None")
+            image_hash = image_hash or compute_image_hash(img_single_face)
+            identity_id = image_hash[:16]
+            swap_engine = SwapEngine(swapper)
+
+            identity = self.get(identity_id, swapper)
+            if identity is not None:
+                logging.info(f"Source identity {identity_id} already registered.")
+                return identity
+
+            logging.info("Detecting face in single-face image...")
+            faces_single = self.detection_cache.detect(app, img_single_face, image_hash=image_hash)
+            if not faces_single:
+                logging.warning("No faces detected in the single-face image.")
+                raise ValueError("No faces detected in the single-face image!")
+
+            source_face = faces_single[0]
+            identity = SourceIdentityArtifact(
+                identity_id=identity_id,
+                embedding=source_face.normed_embedding.astype(np.float32),
+                latent=swap_engine.compute_latent(source_face.normed_embedding),
+                latent_model=swap_engine.latent_model,
+                det_score=float(source_face.det_score),
+                created_at=datetime.now().isoformat(timespec="seconds")
+            )
+            self._save(identity)
+            with self._lock:
+                self._identities[identity_id] = identity
+            logging.info(f"Registered source identity {identity_id}.")
+            return identity
+        except Exception as e:
+            logging.error("Error registering source identity", exc_info=True)
+            raise CustomException(e, sys) from e
+
+    def get(self, identity_id: str, swapper=None):
+        """
+        Looks up an identity in memory, then on disk. When a swapper is given and the
+        stored latent was computed for a different model, the latent is recomputed.
+        Returns:
+            SourceIdentityArtifact: The identity, or None if it is unknown.
+        """
+        with self._lock:
+            identity = self._identities.get(identity_id)
+        if identity is None:
+            identity = self._load(identity_id)
+            if identity is None:
+                return None
+
+        if swapper is not None:
+            swap_engine = SwapEngine(swapper)
+            if identity.latent_model != swap_engine.latent_model:
+                logging.info(f"Recomputing latent of identity {identity_id} for the current swapper model.")
+                identity.latent = swap_engine.compute_latent(identity.embedding)
+                identity.latent_model = swap_engine.latent_model
+                self._save(identity)
+
+        with self._lock:
+            self._identities[identity_id] = identity
+        return identity
+
+    def list_identities(self) -> list:
+        store_dir = self.identity_registry_config.identity_store_dir
+        return sorted(
+            name[:-len(".npz")] for name in os.listdir(store_dir)
+            if name.endswith(".npz") and IDENTITY_ID_PATTERN.match(name[:-len(".npz")])
+        )
+
+    def delete(self, identity_id: str) -> bool:
+        path = self._identity_path(identity_id)
+        with self._lock:
+            removed = self._identities.pop(identity_id, None) is not None
+        if os.path.exists(path):
+            os.remove(path)
+            removed = True
+        return removed
+
+
+_identity_registry = None
+_identity_registry_lock = threading.Lock()
+
+
+def get_identity_registry() -> IdentityRegistry:
+    """
+    Returns the process-wide identity registry, creating it on first use.
+    """
+    global _identity_registry
+    if _identity_registry is None:
+        with _identity_registry_lock:
+            if _identity_registry is None:
+                _identity_registry = IdentityRegistry()
+    return _identity_registry
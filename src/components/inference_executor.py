@@ -0,0 +1,180 @@
+from src.entity.face_swap_config import ConfigEntity, InferenceExecutorConfig
+from src.entity.face_swap_artifact import InferenceExecutorArtifact
+from src.exceptions import CustomException, InferenceQueueFullError, InferenceTimeoutError
+from src.components.metrics import get_metrics
+from src.logger import logging
+
+import sys
+import time
+import asyncio
+import threading
+import numpy as np
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+# Number of recent queue waits kept for the wait-time percentiles
+WAIT_SAMPLES = 1024
+
+
+def _timed_call(fn, args: tuple, kwargs: dict):
+    """
+    Runs fn in a worker and reports when it started, so the caller can measure queue wait,
+    along with the metric spans fn recorded, so they reach the caller's request trace.
+    Top-level so it can be pickled for process workers.
+    """
+    metrics = get_metrics()
+    started_at = time.time()
+    token = metrics.start_trace()
+    try:
+        result = fn(*args, **kwargs)
+    finally:
+        spans = metrics.end_trace(token)
+    return started_at, spans, result
+
+
+def _init_process_worker():
+    # Each process worker loads and warms its own models once
+    from src.components.model_registry import get_model_registry
+    get_model_registry().load()
+
+
+class InferenceExecutor:
+    """
+    Runs blocking detection and swap work in a dedicated thread or process pool so that
+    the event loop stays free. Admission is bounded: when every worker is busy and the
+    queue is full, requests are rejected immediately instead of piling up.
+    """
+    def __init__(self, config: ConfigEntity = None):
+        try:
+            logging.info("Creating InferenceExecutorConfig...")
+            self.inference_executor_config = InferenceExecutorConfig(config=config or ConfigEntity())
+            if self.inference_executor_config.kind not in ("thread", "process"):
+                raise ValueError(f"Unknown inference executor kind: {self.inference_executor_config.kind}")
+            self._lock = threading.Lock()
+            self._executor = None
+            self._in_flight = 0
+            self._completed = 0
+            self._failed = 0
+            self._rejected = 0
+            self._timed_out = 0
+            self._cancelled = 0
+            self._waits = deque(maxlen=WAIT_SAMPLES)
+            self._max_wait = 0.0
+        except Exception as e:
+            logging.error("Failed to initialize InferenceExecutorConfig", exc_info=True)
+            raise CustomException(e, sys) from e
+
+    @property
+    def capacity(self) -> int:
+        return self.inference_executor_config.workers + self.inference_executor_config.queue_size
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                workers = self.inference_executor_config.workers
+                logging.info(f"Starting {self.inference_executor_config.kind} inference pool with {workers} worker(s).")
+                if self.inference_executor_config.kind == "process":
+                    self._executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_process_worker)
+                else:
+                    self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="inference")
+            return self._executor
+
+    def _admit(self) -> None:
+        with self._lock:
+            if self._in_flight >= self.capacity:
+                self._rejected += 1
+                raise InferenceQueueFullError(
+                    f"Inference queue is full ({self._in_flight} requests in flight)",
+                    retry_after=self.inference_executor_config.retry_after_seconds
+                )
+            self._in_flight += 1
+
+    def _release(self, future) -> None:
+        with self._lock:
+            self._in_flight -= 1
+            if future.cancelled():
+                self._cancelled += 1
+            elif future.exception() is not None:
+                self._failed += 1
+            else:
+                self._completed += 1
+
+    async def run(self, fn, *args, timeout: float = None, **kwargs):
+        """
+        Runs fn(*args, **kwargs) in the worker pool and awaits its result.
+
+        Raises:
+            InferenceQueueFullError: The admission queue is full; retry after the given delay.
+            InferenceTimeoutError: The call did not finish within timeout seconds. A call still
+                waiting in the queue is cancelled; one already running finishes in the background.
+        """
+        self._admit()
+        submitted_at = time.time()
+        try:
+            future = self._get_executor().submit(_timed_call, fn, args, kwargs)
+        except Exception:
+            with self._lock:
+                self._in_flight -= 1
+            raise
+        future.add_done_callback(self._release)
+
+        timeout = timeout or self.inference_executor_config.timeout_seconds
+        try:
+            started_at, spans, result = await asyncio.wait_for(asyncio.wrap_future(future), timeout=timeout)
+        except asyncio.TimeoutError:
+            future.cancel()
+            with self._lock:
+                self._timed_out += 1
+            raise InferenceTimeoutError(f"Inference did not finish within {timeout} seconds")
+
+        wait = max(started_at - submitted_at, 0.0)
+        with self._lock:
+            self._waits.append(wait)
+            self._max_wait = max(self._max_wait, wait)
+        metrics = get_metrics()
+        metrics.observe_queue_wait(wait)
+        # Spans of process workers were observed in the worker process, which /metrics does not read
+        metrics.merge_spans(spans, observe=self.inference_executor_config.kind == "process")
+        return result
+
+    def stats(self) -> InferenceExecutorArtifact:
+        with self._lock:
+            waits = np.array(self._waits, dtype=np.float64)
+            workers = self.inference_executor_config.workers
+            return InferenceExecutorArtifact(
+                kind=self.inference_executor_config.kind,
+                workers=workers,
+                queue_size=self.inference_executor_config.queue_size,
+                in_flight=self._in_flight,
+                queue_depth=max(self._in_flight - workers, 0),
+                completed=self._completed,
+                failed=self._failed,
+                rejected=self._rejected,
+                timed_out=self._timed_out,
+                cancelled=self._cancelled,
+                avg_wait_seconds=round(float(waits.mean()), 4) if waits.size else 0.0,
+                p95_wait_seconds=round(float(np.percentile(waits, 95)), 4) if waits.size else 0.0,
+                max_wait_seconds=round(self._max_wait, 4)
+            )
+
+    def shutdown(self, wait: bool = True) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait, cancel_futures=True)
+
+
+_inference_executor = None
+_inference_executor_lock = threading.Lock()
+
+
+def get_inference_executor() -> InferenceExecutor:
+    """
+    Returns the process-wide inference executor, creating it on first use.
+    """
+    global _inference_executor
+    if _inference_executor is None:
+        with _inference_executor_lock:
+            if _inference_executor is None:
+                _inference_executor = InferenceExecutor()
+    return _inference_executor
@@ -0,0 +1,289 @@
+from src.entity.face_swap_config import ConfigEntity, MetricsConfig
+from src.exceptions import CustomException
+from src.logger import logging
+
+import sys
+import time
+import bisect
+import threading
+from contextlib import nullcontext
+from contextvars import ContextVar
+
+# (stage, seconds) spans recorded while serving the current request, for the Server-Timing header
+_request_spans = ContextVar("request_spans", default=None)
+# Shared no-op context manager returned by span() when metrics are disabled
+_NOOP_SPAN = nullcontext()
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """
+    Monotonic counter with labels, exported as <name>_total.
+    """
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def inc(self, *labelvalues, amount: float = 1) -> None:
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+    def samples(self) -> list:
+        with self._lock:
+            return [
+                (f"{self.name}_total", dict(zip(self.labelnames, labelvalues)), value)
+                for labelvalues, value in sorted(self._values.items())
+            ]
+
+
+class Histogram:
+    """
+    Cumulative histogram with labels, exported as <name>_bucket, <name>_sum and <name>_count.
+    """
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, buckets: tuple, labelnames: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(sorted(float(bucket) for bucket in buckets))
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def observe(self, value: float, *labelvalues) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(labelvalues)
+            if entry is None:
+                entry = self._values[labelvalues] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def samples(self) -> list:
+        samples = []
+        with self._lock:
+            for labelvalues, (counts, total, count) in sorted(self._values.items()):
+                labels = dict(zip(self.labelnames, labelvalues))
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                    cumulative += bucket_count
+                    samples.append((f"{self.name}_bucket", {**labels, "le": _format_value(bound)}, cumulative))
+                samples.append((f"{self.name}_sum", labels, total))
+                samples.append((f"{self.name}_count", labels, count))
+        return samples
+
+
+class _Span:
+    __slots__ = ("metrics", "stage", "started_at")
+
+    def __init__(self, metrics, stage: str):
+        self.metrics = metrics
+        self.stage = stage
+
+    def __enter__(self):
+        self.started_at = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.metrics.record_span(self.stage, time.perf_counter() - self.started_at)
+        return False
+
+
+class Metrics:
+    """
+    Process-wide metrics: per-stage latency spans, faces per image, queue waits, cache
+    lookups, model load times and HTTP request latencies, rendered in the Prometheus text
+    format. Spans recorded while a request trace is active are also collected for the
+    request's Server-Timing header. When metrics are disabled every call returns
+    immediately and span() hands out a shared no-op context manager.
+    """
+    def __init__(self, config: ConfigEntity = None):
+        try:
+            logging.info("Creating MetricsConfig...")
+            self.metrics_config = MetricsConfig(config=config or ConfigEntity())
+            latency_buckets = self.metrics_config.latency_buckets
+            self.stage_seconds = Histogram(
+                "faceswap_stage_seconds", "Time spent in each pipeline stage.", latency_buckets, ("stage",)
+            )
+            self.faces_per_image = Histogram(
+                "faceswap_faces_per_image", "Faces detected per target image.", self.metrics_config.face_count_buckets
+            )
+            self.queue_wait_seconds = Histogram(
+                "faceswap_queue_wait_seconds", "Time requests waited for a free inference worker.", latency_buckets
+            )
+            self.model_load_seconds = Histogram(
+                "faceswap_model_load_seconds", "Model load and warmup times.", latency_buckets, ("phase",)
+            )
+            self.request_seconds = Histogram(
+                "faceswap_request_seconds", "HTTP request latency until the response starts.", latency_buckets,
+                ("method", "route", "status")
+            )
+            self.cache_lookups = Counter(
+                "faceswap_cache_lookups", "Cache lookups by cache and result.", ("cache", "result")
+            )
+            self._metrics = [
+                self.stage_seconds, self.faces_per_image, self.queue_wait_seconds,
+                self.model_load_seconds, self.request_seconds, self.cache_lookups
+            ]
+            self._collectors = []
+        except Exception as e:
+            logging.error("Failed to initialize MetricsConfig", exc_info=True)
+            raise CustomException(e, sys) from e
+
+    @property
+    def enabled(self) -> bool:
+        return self.metrics_config.enabled
+
+    @property
+    def server_timing(self) -> bool:
+        return self.metrics_config.enabled and self.metrics_config.server_timing
+
+    def span(self, stage: str):
+        """
+        Context manager timing one pipeline stage.
+        """
+        if not self.metrics_config.enabled:
+            return _NOOP_SPAN
+        return _Span(self, stage)
+
+    def record_span(self, stage: str, seconds: float, observe: bool = True) -> None:
+        if not self.metrics_config.enabled:
+            return
+        if observe:
+            self.stage_seconds.observe(seconds, stage)
+        spans = _request_spans.get()
+        if spans is not None:
+            spans.append((stage, seconds))
+
+    def observe_faces(self, count: int) -> None:
+        if self.metrics_config.enabled:
+            self.faces_per_image.observe(count)
+
+    def observe_queue_wait(self, seconds: float) -> None:
+        if self.metrics_config.enabled:
+            self.queue_wait_seconds.observe(seconds)
+            spans = _request_spans.get()
+            if spans is not None:
+                spans.append(("queue_wait", seconds))
+
+    def observe_model_load(self, phase: str, seconds: float) -> None:
+        if self.metrics_config.enabled:
+            self.model_load_seconds.observe(seconds, phase)
+
+    def observe_request(self, method: str, route: str, status: int, seconds: float) -> None:
+        if self.metrics_config.enabled:
+            self.request_seconds.observe(seconds, method, route, str(status))
+
+    def count_cache_lookup(self, cache: str, hit: bool) -> None:
+        if self.metrics_config.enabled:
+            self.cache_lookups.inc(cache, "hit" if hit else "miss")
+
+    def start_trace(self):
+        """
+        Starts collecting the spans of the current request (or worker call).
+        Returns:
+            The token to pass to end_trace, or None when metrics are disabled.
+        """
+        if not self.metrics_config.enabled:
+            return None
+        return _request_spans.set([])
+
+    def end_trace(self, token) -> list:
+        """
+        Returns:
+            list: The (stage, seconds) spans recorded since start_trace.
+        """
+        if token is None:
+            return []
+        spans = _request_spans.get()
+        _request_spans.reset(token)
+        return spans or []
+
+    def merge_spans(self, spans: list, observe: bool) -> None:
+        """
+        Adds spans recorded in an inference worker to the current request. Spans from a
+        process worker were observed in that process, so observe them again here.
+        """
+        for stage, seconds in spans:
+            self.record_span(stage, seconds, observe=observe)
+
+    @staticmethod
+    def server_timing_header(spans: list, total_seconds: float) -> str:
+        """
+        Formats spans as a Server-Timing header value; repeated stages are summed.
+        """
+        durations = {}
+        for stage, seconds in spans:
+            durations[stage] = durations.get(stage, 0.0) + seconds
+        durations["total"] = total_seconds
+        return ", ".join(f"{stage};dur={seconds * 1000:.2f}" for stage, seconds in durations.items())
+
+    def add_collector(self, collector) -> None:
+        """
+        Registers a callable returning (name, documentation, value, labels) gauge samples
+        that are read at scrape time, for state that other components already track.
+        """
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        """
+        Returns:
+            str: Every metric in the Prometheus text exposition format (version 0.0.4).
+        """
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+
+        gauges = {}
+        for collector in self._collectors:
+            try:
+                for name, documentation, value, labels in collector():
+                    gauges.setdefault(name, (documentation, []))[1].append((labels, value))
+            except Exception:
+                logging.warning("Metrics collector failed", exc_info=True)
+        for name, (documentation, samples) in gauges.items():
+            lines.append(f"# HELP {name} {documentation}")
+            lines.append(f"# TYPE {name} gauge")
+            for labels, value in samples:
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+_metrics = None
+_metrics_lock = threading.Lock()
+
+
+def get_metrics() -> Metrics:
+    """
+    Returns the process-wide metrics, creating them on first use.
+    """
+    global _metrics
+    if _metrics is None:
+        with _metrics_lock:
+            if _metrics is None:
+                _metrics = Metrics()
+    return _metrics
@@ -0,0 +1,210 @@
+from src.entity.face_swap_config import ConfigEntity, MicroBatchConfig
+from src.entity.face_swap_artifact import MicroBatchArtifact
+from src.exceptions import CustomException
+from src.logger import logging
+
+import sys
+import time
+import threading
+import numpy as np
+from collections import OrderedDict
+from concurrent.futures import Future
+
+
+class MicroBatcher:
+    """
+    Merges single-item model calls from concurrent requests into batches.
+
+    Callers submit items and block on their own result; a dispatcher thread takes the
+    oldest pending item, waits up to max_wait_ms for more items with the same key (items of
+    different models or shapes never share a batch), runs run_batch once on up to
+    max_batch_size items and scatters the results back to the waiting callers.
+    """
+    def __init__(self, name: str, run_batch, max_batch_size: int, max_wait_ms: float):
+        self.name = name
+        self.run_batch = run_batch
+        self.max_batch_size = max(int(max_batch_size), 1)
+        self.max_wait = max_wait_ms / 1000.0
+        self._cond = threading.Condition()
+        self._pending = OrderedDict()
+        self._closed = False
+        self._thread = None
+        self._batches = 0
+        self._items = 0
+        self._largest_batch = 0
+        self._queue_wait = 0.0
+        self._failed_batches = 0
+
+    def _ensure_thread(self) -> None:
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._dispatch, name=f"micro-batch-{self.name}", daemon=True)
+            self._thread.start()
+
+    def submit(self, items: list, key=None) -> list:
+        """
+        Queues items under key at once, so one caller's items are never split by a concurrent dispatch.
+        Returns:
+            list: One Future per item.
+        """
+        futures = [Future() for _ in items]
+        with self._cond:
+            if self._closed:
+                raise RuntimeError(f"Micro-batcher {self.name} is closed")
+            self._ensure_thread()
+            enqueued_at = time.monotonic()
+            self._pending.setdefault(key, []).extend(
+                (item, future, enqueued_at) for item, future in zip(items, futures)
+            )
+            self._cond.notify()
+        return futures
+
+    def run(self, items: list, key=None) -> list:
+        """
+        Submits items and waits for all of their results, in order.
+        """
+        return [future.result() for future in self.submit(items, key=key)]
+
+    def _next_batch(self):
+        with self._cond:
+            while not self._pending and not self._closed:
+                self._cond.wait()
+            if not self._pending:
+                return None
+            # The oldest key goes first; wait for its batch to fill up or its first item to time out
+            key = next(iter(self._pending))
+            deadline = self._pending[key][0][2] + self.max_wait
+            while len(self._pending[key]) < self.max_batch_size and not self._closed:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            entries = self._pending[key]
+            batch, rest = entries[:self.max_batch_size], entries[self.max_batch_size:]
+            if rest:
+                self._pending[key] = rest
+            else:
+                del self._pending[key]
+            return batch
+
+    def _dispatch(self) -> None:
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            started_at = time.monotonic()
+            items = [item for item, _, _ in batch]
+            try:
+                results = self.run_batch(items)
+                for (_, future, _), result in zip(batch, results):
+                    future.set_result(result)
+            except Exception as e:
+                logging.error(f"Micro-batch {self.name} of {len(batch)} item(s) failed", exc_info=True)
+                with self._cond:
+                    self._failed_batches += 1
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+            with self._cond:
+                self._batches += 1
+                self._items += len(batch)
+                self._largest_batch = max(self._largest_batch, len(batch))
+                self._queue_wait += sum(started_at - enqueued_at for _, _, enqueued_at in batch)
+
+    def stats(self) -> MicroBatchArtifact:
+        with self._cond:
+            return MicroBatchArtifact(
+                name=self.name,
+                batches=self._batches,
+                items=self._items,
+                avg_batch_size=round(self._items / self._batches, 3) if self._batches else 0.0,
+                max_batch_size=self._largest_batch,
+                avg_queue_wait_ms=round(self._queue_wait / self._items * 1000, 3) if self._items else 0.0,
+                failed_batches=self._failed_batches
+            )
+
+    def close(self) -> None:
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+
+
+def _has_dynamic_batch(model) -> bool:
+    batch_dim = model.session.get_inputs()[0].shape[0]
+    return not isinstance(batch_dim, int) or batch_dim != 1
+
+
+class MicroBatchScheduler:
+    """
+    Micro-batchers in front of the recognition model and the swapper. Only models with a
+    dynamic batch dimension are batched; the stock inswapper_128 has a fixed batch of 1 and
+    the detector's outputs have no batch axis, so those keep running per call.
+    """
+    def __init__(self, config: ConfigEntity = None):
+        try:
+            logging.info("Creating MicroBatchConfig...")
+            self.micro_batch_config = MicroBatchConfig(config=config or ConfigEntity())
+            max_size = self.micro_batch_config.max_size
+            max_wait_ms = self.micro_batch_config.max_wait_ms
+            self.recognition = MicroBatcher("recognition", self._run_recognition, max_size, max_wait_ms)
+            self.swapper = MicroBatcher("swapper", self._run_swapper, max_size, max_wait_ms)
+        except Exception as e:
+            logging.error("Failed to initialize MicroBatchConfig", exc_info=True)
+            raise CustomException(e, sys) from e
+
+    @property
+    def enabled(self) -> bool:
+        return self.micro_batch_config.enabled
+
+    def can_batch(self, model) -> bool:
+        return self.enabled and _has_dynamic_batch(model)
+
+    @staticmethod
+    def _run_recognition(items: list) -> list:
+        model = items[0][0]
+        return list(model.get_feat([aimg for _, aimg in items]))
+
+    @staticmethod
+    def _run_swapper(items: list) -> list:
+        swapper = items[0][0]
+        blob = np.stack([blob for _, blob, _ in items])
+        latents = np.stack([latent for _, _, latent in items])
+        return list(swapper.session.run(swapper.output_names, {swapper.input_names[0]: blob, swapper.input_names[1]: latents})[0])
+
+    def embed(self, model, aimgs: list) -> np.ndarray:
+        """
+        Recognition embeddings of aligned face crops, batched with other requests' crops.
+        Returns:
+            np.ndarray: (N, D) raw embeddings, as ArcFaceONNX.get_feat.
+        """
+        return np.stack(self.recognition.run([(model, aimg) for aimg in aimgs], key=id(model)))
+
+    def swap(self, swapper, blob: np.ndarray, latents: np.ndarray) -> np.ndarray:
+        """
+        Swapper output for an N x 3 x H x W blob and N latents, batched with other requests' faces.
+        """
+        return np.stack(self.swapper.run([(swapper, blob[i], latents[i]) for i in range(blob.shape[0])], key=id(swapper)))
+
+    def stats(self) -> list:
+        return [self.recognition.stats(), self.swapper.stats()]
+
+    def close(self) -> None:
+        self.recognition.close()
+        self.swapper.close()
+
+
+_micro_batch_scheduler = None
+_micro_batch_scheduler_lock = threading.Lock()
+
+
+def get_micro_batch_scheduler() -> MicroBatchScheduler:
+    """
+    Returns the process-wide micro-batch scheduler, creating it on first use.
+    """
+    global _micro_batch_scheduler
+    if _micro_batch_scheduler is None:
+        with _micro_batch_scheduler_lock:
+            if _micro_batch_scheduler is None:
+                _micro_batch_scheduler = MicroBatchScheduler()
+    return _micro_batch_scheduler
@@ -2,18 +2,24 @@ from src.entity.face_swap_config import ConfigEntity, ModelInitializerConfig
 from src.entity.face_swap_artifact import ModelInitializationArtifact
 from src.exceptions import CustomException
 from src.logger import logging
+from src.components.onnx_runtime import SessionFactory, TunedFaceAnalysis, ensure_quantized_swapper
+from src.components.model_store import get_model_store
 
+import os
 import sys
 from insightface.app import FaceAnalysis
+from insightface.model_zoo.inswapper import INSwapper
 
 class ModelInitializer:
     """
-    Initializes the FaceAnalysis model using configuration.
+    Initializes the FaceAnalysis and face swapper models using configuration.
     """
-    def __init__(self):
+    def __init__(self, config: ConfigEntity = None):
         try:
             logging.info("Creating ModelInitializerConfig...")
-            self.model_initializer_config = ModelInitializerConfig(config=ConfigEntity())
+            config = config or ConfigEntity()
+            self.model_initializer_config = ModelInitializerConfig(config=config)
+            self.session_factory = SessionFactory(config=config)
             logging.info(f"ModelInitializerConfig initialized with model name: {self.model_initializer_config.model_name}")
         except Exception as e:
             logging.error("Failed to initialize ModelInitializerConfig", exc_info=True)
@@ -27,7 +33,20 @@ class ModelInitializer:
         """
         try:
             logging.info(f"Starting FaceAnalysis model initialization with model: {self.model_initializer_config.model_name}...")
-            app = FaceAnalysis(name=self.model_initializer_config.model_name)
+            # Lean mode loads only the models the swap needs instead of every model in the pack
+            allowed_modules = None
+            if self.model_initializer_config.detection_mode == "lean":
+                allowed_modules = list(self.model_initializer_config.detection_modules)
+            # Fetch (or verify) the model pack through the model store when it is in the manifest
+            get_model_store().ensure_path(os.path.join(
+                self.model_initializer_config.model_root, "models", self.model_initializer_config.model_name
+            ))
+            app = TunedFaceAnalysis(
+                name=self.model_initializer_config.model_name,
+                root=self.model_initializer_config.model_root,
+                allowed_modules=allowed_modules,
+                session_factory=self.session_factory
+            )
             app.prepare(
                 ctx_id=self.model_initializer_config.ctx_id,
                 det_size=self.model_initializer_config.det_size
@@ -44,4 +63,33 @@ class ModelInitializer:
 
         except Exception as e:
             logging.error("Error during model initialization", exc_info=True)
-            raise CustomException(e, sys) from e
\ No newline at end of file
+            raise CustomException(e, sys) from e
+
+    def initialize_swapper(self):
+        """
+        Loads the inswapper model, downloading (or verifying) the weights through the model store first.
+        With SWAPPER_PRECISION = "int8" the session runs a dynamically quantized copy of the
+        weights, created on first use and again whenever the FP32 weights change; the emap is
+        always read from the FP32 file.
+        Returns:
+            INSwapper: The loaded face swapper model.
+        """
+        try:
+            model_path = self.model_initializer_config.swapper_model_dir
+            get_model_store().ensure_path(model_path)
+
+            session_path = model_path
+            if self.model_initializer_config.swapper_precision == "int8":
+                session_path = ensure_quantized_swapper(model_path, self.model_initializer_config.swapper_int8_model_path)
+            elif self.model_initializer_config.swapper_precision != "fp32":
+                raise ValueError(f"Unknown swapper precision: {self.model_initializer_config.swapper_precision}")
+
+            logging.info(f"Loading face swapper model from: {session_path}")
+            swapper = INSwapper(model_file=model_path, session=self.session_factory.create_session(session_path))
+            logging.info("Face swapper model loaded successfully.")
+
+            return swapper
+
+        except Exception as e:
+            logging.error("Error during face swapper initialization", exc_info=True)
+            raise CustomException(e, sys) from e
@@ -0,0 +1,201 @@
+from src.entity.face_swap_config import ConfigEntity, ModelRegistryConfig
+from src.entity.face_swap_artifact import ModelRegistryArtifact
+from src.components.metrics import get_metrics
+from src.exceptions import CustomException
+from src.logger import logging
+
+import os
+import sys
+import time
+import hashlib
+import threading
+import numpy as np
+from datetime import datetime
+
+
+class ModelRegistry:
+    """
+    Owns the FaceAnalysis and inswapper models for the whole process.
+    Models are loaded and warmed up once, shared by every request and
+    swapped atomically when a reload picks up a changed configuration.
+    """
+    def __init__(self, config: ConfigEntity = None):
+        try:
+            logging.info("Creating ModelRegistryConfig...")
+            self.config = config or ConfigEntity()
+            self.model_registry_config = ModelRegistryConfig(config=self.config)
+            self._lock = threading.RLock()
+            self._load_lock = threading.Lock()
+            self._face_analysis = None
+            self._swapper = None
+            self._fingerprint = None
+            self._artifact = ModelRegistryArtifact(
+                status="not_loaded",
+                model_name=self.model_registry_config.model_name,
+                swapper_model_path=self.model_registry_config.swapper_model_dir
+            )
+        except Exception as e:
+            logging.error("Failed to initialize ModelRegistryConfig", exc_info=True)
+            raise CustomException(e, sys) from e
+
+    @property
+    def is_ready(self) -> bool:
+        return self._face_analysis is not None and self._swapper is not None
+
+    @property
+    def version(self) -> str:
+        """
+        Short hash of the loaded models' configuration and swapper weights file, for keying cached results.
+        """
+        self.ensure_loaded()
+        with self._lock:
+            fingerprint = self._fingerprint
+        return hashlib.blake2b(repr(fingerprint).encode("utf-8"), digest_size=8).hexdigest()
+
+    def _config_fingerprint(self, registry_config: ModelRegistryConfig) -> tuple:
+        swapper_path = registry_config.swapper_model_dir
+        swapper_mtime = os.path.getmtime(swapper_path) if os.path.exists(swapper_path) else None
+        return (
+            registry_config.model_name,
+            registry_config.model_root,
+            registry_config.ctx_id,
+            tuple(registry_config.det_size),
+            registry_config.detection_mode,
+            tuple(registry_config.detection_modules),
+            swapper_path,
+            swapper_mtime,
+            registry_config.swapper_precision,
+            tuple(sorted(vars(registry_config.onnx_runtime_config).items()))
+        )
+
+    def _warm_up(self, face_analysis, swapper, registry_config: ModelRegistryConfig) -> float:
+        """
+        Runs one dummy inference through the detector and the swapper so that
+        ONNX Runtime allocates its buffers before the first real request.
+        """
+        start = time.perf_counter()
+        width, height = registry_config.warmup_image_size
+        face_analysis.get(np.zeros((height, width, 3), dtype=np.uint8))
+
+        input_width, input_height = swapper.input_size
+        blob = np.zeros((1, 3, input_height, input_width), dtype=np.float32)
+        latent = np.zeros((1, swapper.emap.shape[0]), dtype=np.float32)
+        swapper.session.run(swapper.output_names, {swapper.input_names[0]: blob, swapper.input_names[1]: latent})
+        return time.perf_counter() - start
+
+    def load(self, config: ConfigEntity = None, force: bool = False) -> ModelRegistryArtifact:
+        """
+        Loads (or reloads) the models. Nothing is rebuilt when the configuration
+        fingerprint is unchanged, unless force is set. In-flight requests keep
+        using the previous models until the new ones are ready.
+        Returns:
+            ModelRegistryArtifact: The registry status after loading.
+        """
+        with self._load_lock:
+            try:
+                new_config = config or self.config
+                registry_config = ModelRegistryConfig(config=new_config)
+                fingerprint = self._config_fingerprint(registry_config)
+                if self.is_ready and not force and fingerprint == self._fingerprint:
+                    logging.info("Model configuration unchanged; skipping reload.")
+                    return self.status()
+
+                reload_count = self._artifact.reload_count + (1 if self.is_ready else 0)
+                self._artifact.status = "reloading" if self.is_ready else "loading"
+                logging.info(f"Loading models into registry: {fingerprint}")
+
+                # insightface and ONNX Runtime are imported here, not with the module, so that
+                # importing the app (or serve.py's parent before it decides what to load) stays cheap
+                from src.components.model_initializer import ModelInitializer
+
+                start = time.perf_counter()
+                model_initializer = ModelInitializer(config=new_config)
+                face_analysis = model_initializer.initialize_model()
+                swapper = model_initializer.initialize_swapper()
+                load_time = time.perf_counter() - start
+                get_metrics().observe_model_load("load", load_time)
+
+                warmup_time = None
+                if registry_config.warmup_enabled:
+                    logging.info("Warming up models with a dummy inference...")
+                    warmup_time = self._warm_up(face_analysis, swapper, registry_config)
+                    get_metrics().observe_model_load("warmup", warmup_time)
+
+                with self._lock:
+                    self._face_analysis = face_analysis
+                    self._swapper = swapper
+                    self.config = new_config
+                    self.model_registry_config = registry_config
+                    # Weights may have been downloaded during load; fingerprint the file on disk now
+                    self._fingerprint = self._config_fingerprint(registry_config)
+                    self._artifact = ModelRegistryArtifact(
+                        status="ready",
+                        model_name=registry_config.model_name,
+                        swapper_model_path=registry_config.swapper_model_dir,
+                        load_time_seconds=round(load_time, 3),
+                        warmup_time_seconds=round(warmup_time, 3) if warmup_time is not None else None,
+                        loaded_at=datetime.now().isoformat(timespec="seconds"),
+                        reload_count=reload_count
+                    )
+                logging.info(f"Model registry ready: {self._artifact}")
+                return self.status()
+
+            except Exception as e:
+                logging.error("Error while loading models into registry", exc_info=True)
+                # Keep serving with the previous models if a reload fails
+                self._artifact.status = "ready" if self.is_ready else "failed"
+                self._artifact.error = str(e)
+                raise CustomException(e, sys) from e
+
+    def reload(self, config: ConfigEntity = None, force: bool = False) -> ModelRegistryArtifact:
+        """
+        Hot reload: re-reads the configuration and rebuilds the models if it changed.
+        """
+        return self.load(config=config or ConfigEntity(), force=force)
+
+    def unload(self) -> None:
+        """
+        Drops the loaded models; the next use loads them again.
+        """
+        with self._load_lock, self._lock:
+            self._face_analysis = None
+            self._swapper = None
+            self._fingerprint = None
+            self._artifact = ModelRegistryArtifact(
+                status="not_loaded",
+                model_name=self.model_registry_config.model_name,
+                swapper_model_path=self.model_registry_config.swapper_model_dir
+            )
+
+    def ensure_loaded(self) -> None:
+        if not self.is_ready:
+            self.load()
+
+    def get_models(self) -> tuple:
+        """
+        Returns:
+            tuple: A consistent (face_analysis, swapper) snapshot.
+        """
+        self.ensure_loaded()
+        with self._lock:
+            return self._face_analysis, self._swapper
+
+    def status(self) -> ModelRegistryArtifact:
+        with self._lock:
+            return ModelRegistryArtifact(**vars(self._artifact))
+
+
+_model_registry = None
+_model_registry_lock = threading.Lock()
+
+
+def get_model_registry() -> ModelRegistry:
+    """
+    Returns the process-wide model registry, creating it on first use.
+    """
+    global _model_registry
+    if _model_registry is None:
+        with _model_registry_lock:
+            if _model_registry is None:
+                _model_registry = ModelRegistry()
+    return _model_registry
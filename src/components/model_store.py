@@ -0,0 +1,457 @@
+from src.entity.face_swap_config import ConfigEntity, ModelStoreConfig
+from src.entity.face_swap_artifact import ModelStoreArtifact
+from src.exceptions import CustomException, ModelIntegrityError
+from src.logger import logging
+
+import os
+import re
+import sys
+import json
+import time
+import shutil
+import hashlib
+import zipfile
+import argparse
+import threading
+import requests
+from contextlib import contextmanager
+from datetime import datetime
+from urllib.parse import urlencode, urlsplit, parse_qs
+from tqdm import tqdm
+
+try:
+    import fcntl
+except ImportError:  # Windows: only the in-process lock applies
+    fcntl = None
+
+GOOGLE_DRIVE_DOWNLOAD_URL = "https://drive.usercontent.google.com/download"
+# Hidden inputs of Google Drive's "file too large to scan for viruses" confirmation form
+GOOGLE_DRIVE_FORM_FIELDS = ("id", "export", "authuser", "confirm", "uuid")
+
+# No tqdm monitor thread: downloads also run in serve.py's parent before it forks the workers,
+# which only works while that process has no threads besides the main one
+tqdm.monitor_interval = 0
+
+
+class _IncompleteDownload(Exception):
+    """
+    The connection ended before the whole file arrived; the .part file is kept for a resumed attempt.
+    """
+
+
+def _sha256_file(path: str, chunk_size: int, digest=None):
+    digest = digest or hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest
+
+
+def _google_drive_confirm_url(html: str, url: str):
+    """
+    Returns the download URL behind Google Drive's virus scan warning page, or None if html is not that page.
+    """
+    if "Virus scan warning" not in html and "Download anyway" not in html:
+        return None
+    fields = {}
+    for name in GOOGLE_DRIVE_FORM_FIELDS:
+        match = re.search(rf'<input type="hidden" name="{name}" value="([^"]+)"', html)
+        if match:
+            fields[name] = match.group(1)
+    if "confirm" not in fields or "uuid" not in fields:
+        return None
+    query = parse_qs(urlsplit(url).query)
+    fields.setdefault("id", query.get("id", [""])[0])
+    fields.setdefault("export", "download")
+    return f"{GOOGLE_DRIVE_DOWNLOAD_URL}?{urlencode(fields)}"
+
+
+@contextmanager
+def _file_lock(path: str):
+    """
+    Exclusive lock shared by every process on the host (workers prefetching the same model at startup).
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "a") as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+class ModelStore:
+    """
+    Downloads, verifies and installs the model weights listed in the manifest.
+
+    Downloads stream in chunks to "<path>.part", so memory stays flat whatever the file
+    size. An interrupted download resumes from the bytes already on disk with an HTTP Range
+    request. The file is hashed while it is written, and only a file whose SHA-256 matches
+    is moved into place with an atomic rename. When the manifest has no sha256 for an entry,
+    the hash of its first download is pinned in the lock file and checked from then on.
+    Installed files are re-hashed only when their size or modification time changed.
+    """
+    def __init__(self, config: ConfigEntity = None):
+        try:
+            logging.info("Creating ModelStoreConfig...")
+            self.model_store_config = ModelStoreConfig(config=config or ConfigEntity())
+            self._lock = threading.RLock()
+        except Exception as e:
+            logging.error("Failed to initialize ModelStoreConfig", exc_info=True)
+            raise CustomException(e, sys) from e
+
+    @property
+    def names(self) -> list:
+        return list(self.model_store_config.manifest)
+
+    def entry(self, name: str) -> dict:
+        if name not in self.model_store_config.manifest:
+            raise ValueError(f"Unknown model: {name}. Expected one of {self.names}")
+        return self.model_store_config.manifest[name]
+
+    def path(self, name: str) -> str:
+        return os.path.abspath(os.path.expanduser(self.entry(name)["path"]))
+
+    def find(self, path: str):
+        """
+        Returns:
+            str: The name of the manifest entry installed at path, or None.
+        """
+        path = os.path.abspath(os.path.expanduser(path))
+        return next((name for name in self.names if self.path(name) == path), None)
+
+    def _read_lock(self) -> dict:
+        lock_path = self.model_store_config.lock_path
+        if not os.path.exists(lock_path):
+            return {}
+        with open(lock_path) as f:
+            return json.load(f)
+
+    def _write_record(self, name: str, record) -> None:
+        records = self._read_lock()
+        if record is None:
+            records.pop(name, None)
+        else:
+            records[name] = record
+        lock_path = self.model_store_config.lock_path
+        os.makedirs(os.path.dirname(lock_path) or ".", exist_ok=True)
+        tmp_path = f"{lock_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(records, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, lock_path)
+
+    def _expected_sha256(self, name: str, record: dict):
+        entry = self.entry(name)
+        if entry.get("sha256"):
+            return entry["sha256"].lower()
+        if record and record.get("version") == entry["version"]:
+            return record.get("sha256")
+        return None
+
+    def _installed(self, name: str, record: dict) -> bool:
+        """
+        Checks the installed copy against its lock record: file size and, when the file was
+        touched since, its SHA-256; for archives, every extracted file and its size.
+        """
+        entry, path = self.entry(name), self.path(name)
+        if not os.path.exists(path) or not record or record.get("version") != entry["version"]:
+            return False
+        expected = self._expected_sha256(name, record)
+        if expected and record.get("sha256") and record["sha256"] != expected:
+            return False
+        if entry.get("archive"):
+            return bool(record.get("files")) and all(
+                os.path.isfile(os.path.join(path, relative)) and os.path.getsize(os.path.join(path, relative)) == size
+                for relative, size in record.get("files", {}).items()
+            )
+        stat = os.stat(path)
+        if stat.st_size != record.get("size_bytes"):
+            return False
+        if stat.st_mtime_ns == record.get("mtime_ns"):
+            return True
+        logging.info(f"{path} changed since it was verified; re-hashing...")
+        if _sha256_file(path, self.model_store_config.chunk_size).hexdigest() != record.get("sha256"):
+            return False
+        self._write_record(name, {**record, "mtime_ns": stat.st_mtime_ns})
+        return True
+
+    def _quarantine(self, path: str) -> None:
+        corrupt_path = f"{path}.corrupt-{int(time.time())}"
+        logging.error(f"Moving unverifiable model {path} aside to {corrupt_path}")
+        os.replace(path, corrupt_path)
+
+    def _adopt(self, name: str) -> dict:
+        """
+        Records a model that was installed before the store tracked it (trust on first use,
+        unless the manifest pins its SHA-256).
+        """
+        entry, path = self.entry(name), self.path(name)
+        record = {"version": entry["version"], "url": entry["url"], "fetched_at": None}
+        if entry.get("archive"):
+            record["sha256"] = None
+            record["files"] = self._list_files(path)
+            if not record["files"]:
+                raise ModelIntegrityError(f"{path} is empty")
+        else:
+            sha256 = _sha256_file(path, self.model_store_config.chunk_size).hexdigest()
+            if entry.get("sha256") and sha256 != entry["sha256"].lower():
+                raise ModelIntegrityError(f"{path} has SHA-256 {sha256}, expected {entry['sha256']}")
+            stat = os.stat(path)
+            record.update(sha256=sha256, size_bytes=stat.st_size, mtime_ns=stat.st_mtime_ns)
+        logging.info(f"Adopted existing model {name} at {path}")
+        self._write_record(name, record)
+        return record
+
+    @staticmethod
+    def _list_files(directory: str) -> dict:
+        files = {}
+        for root, _, filenames in os.walk(directory):
+            for filename in filenames:
+                full_path = os.path.join(root, filename)
+                files[os.path.relpath(full_path, directory)] = os.path.getsize(full_path)
+        return files
+
+    def _extract(self, archive_path: str, path: str) -> dict:
+        """
+        Extracts a zip archive next to path and renames it into place. An archive whose files
+        all sit in a single top-level directory is flattened.
+        Returns:
+            dict: Relative path -> size of every extracted file.
+        """
+        tmp_dir = f"{path}.{os.getpid()}.extract"
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        with zipfile.ZipFile(archive_path) as archive:
+            archive.extractall(tmp_dir)
+        content_dir = tmp_dir
+        children = os.listdir(tmp_dir)
+        if len(children) == 1 and os.path.isdir(os.path.join(tmp_dir, children[0])):
+            content_dir = os.path.join(tmp_dir, children[0])
+        files = self._list_files(content_dir)
+        if os.path.exists(path):
+            shutil.rmtree(path)
+        os.replace(content_dir, path)
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        return files
+
+    def download(self, url: str, dest: str, expected_sha256: str = None) -> tuple:
+        """
+        Streams url to dest through dest + ".part", resuming a previous partial download and
+        retrying dropped connections. dest only ever holds a complete, verified file.
+        Returns:
+            tuple: (sha256 hex digest, size in bytes).
+        Raises:
+            ModelIntegrityError: The downloaded file does not match expected_sha256.
+        """
+        retries = self.model_store_config.retries
+        part_path = f"{dest}.part"
+        os.makedirs(os.path.dirname(os.path.abspath(dest)), exist_ok=True)
+        with requests.Session() as session:
+            for attempt in range(1, retries + 1):
+                resumed = os.path.exists(part_path) and os.path.getsize(part_path) > 0
+                try:
+                    return self._download_once(session, url, dest, part_path, expected_sha256)
+                except ModelIntegrityError:
+                    # A resumed download may have been appended to a stale partial file; start over once
+                    if not resumed or attempt == retries:
+                        raise
+                    logging.warning(f"Checksum mismatch after resuming {url}; downloading from scratch.")
+                except (requests.RequestException, _IncompleteDownload) as e:
+                    if attempt == retries:
+                        raise
+                    delay = min(2 ** attempt, 30)
+                    logging.warning(f"Download of {url} interrupted ({str(e)}); retrying in {delay} s ({attempt}/{retries})")
+                    time.sleep(delay)
+
+    def _download_once(self, session: requests.Session, url: str, dest: str, part_path: str, expected_sha256: str) -> tuple:
+        chunk_size = self.model_store_config.chunk_size
+        timeout = self.model_store_config.timeout_seconds
+        offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+        headers = {"Range": f"bytes={offset}-"} if offset else {}
+
+        response = session.get(url, headers=headers, stream=True, allow_redirects=True, timeout=timeout)
+        if response.headers.get("Content-Type", "").startswith("text/html"):
+            # Large Google Drive files answer with a small confirmation page first
+            html = response.text
+            response.close()
+            confirm_url = _google_drive_confirm_url(html, url)
+            if confirm_url is None:
+                raise ValueError(f"{url} returned an HTML page instead of the model file: {html[:200]}")
+            response = session.get(confirm_url, headers=headers, stream=True, allow_redirects=True, timeout=timeout)
+
+        with response:
+            if response.status_code == 416:
+                # The server has nothing past offset: the partial file is stale or complete; start over
+                os.remove(part_path)
+                raise _IncompleteDownload(f"range {offset}- not satisfiable")
+            response.raise_for_status()
+            digest = hashlib.sha256()
+            if response.status_code == 206 and offset:
+                logging.info(f"Resuming download of {url} at byte {offset}")
+                _sha256_file(part_path, chunk_size, digest)
+                mode = "ab"
+            else:
+                offset, mode = 0, "wb"
+            length = response.headers.get("Content-Length")
+            total = offset + int(length) if length is not None else None
+
+            with open(part_path, mode) as f, tqdm(
+                desc=f"Downloading {os.path.basename(dest)}", total=total, initial=offset,
+                unit="B", unit_scale=True, unit_divisor=1024, disable=None
+            ) as progress_bar:
+                for chunk in response.iter_content(chunk_size=chunk_size):
+                    if chunk:
+                        f.write(chunk)
+                        digest.update(chunk)
+                        progress_bar.update(len(chunk))
+                f.flush()
+                os.fsync(f.fileno())
+
+        size = os.path.getsize(part_path)
+        if total is not None and size < total:
+            raise _IncompleteDownload(f"received {size} of {total} bytes")
+        sha256 = digest.hexdigest()
+        if expected_sha256 and sha256 != expected_sha256.lower():
+            os.remove(part_path)
+            raise ModelIntegrityError(f"{url} has SHA-256 {sha256}, expected {expected_sha256}")
+        os.replace(part_path, dest)
+        logging.info(f"Downloaded {url} to {dest} ({size} bytes, sha256 {sha256})")
+        return sha256, size
+
+    def ensure(self, name: str) -> str:
+        """
+        Returns the path of an installed and verified copy of a manifest model, downloading it
+        first when it is missing, outdated or corrupt.
+        """
+        entry, path = self.entry(name), self.path(name)
+        with self._lock, _file_lock(f"{self.model_store_config.lock_path}.lock"):
+            record = self._read_lock().get(name)
+            if self._installed(name, record):
+                return path
+            if os.path.exists(path) and record is None:
+                try:
+                    self._adopt(name)
+                    return path
+                except ModelIntegrityError:
+                    logging.error(f"Installed model {name} failed verification", exc_info=True)
+            if os.path.exists(path):
+                if record is not None and record.get("version") != entry["version"]:
+                    logging.info(f"Updating model {name} from version {record.get('version')} to {entry['version']}")
+                else:
+                    self._quarantine(path)
+
+            logging.info(f"Fetching model {name} (version {entry['version']}) from {entry['url']}")
+            expected_sha256 = self._expected_sha256(name, record)
+            download_path = f"{path}.zip" if entry.get("archive") else path
+            sha256, size = self.download(entry["url"], download_path, expected_sha256=expected_sha256)
+            new_record = {
+                "version": entry["version"],
+                "url": entry["url"],
+                "sha256": sha256,
+                "size_bytes": size,
+                "fetched_at": datetime.now().isoformat(timespec="seconds"),
+            }
+            if entry.get("archive"):
+                new_record["files"] = self._extract(download_path, path)
+                os.remove(download_path)
+            else:
+                new_record["mtime_ns"] = os.stat(path).st_mtime_ns
+            if not expected_sha256:
+                logging.warning(f"No SHA-256 pinned for {name}; trusting this download ({sha256}) from now on.")
+            self._write_record(name, new_record)
+            return path
+
+    def ensure_path(self, path: str) -> str:
+        """
+        Makes sure the model at path is installed when it belongs to the manifest; other paths are
+        returned untouched.
+        """
+        name = self.find(path)
+        return self.ensure(name) if name is not None else path
+
+    def status(self, name: str) -> ModelStoreArtifact:
+        entry, path = self.entry(name), self.path(name)
+        record = self._read_lock().get(name) or {}
+        return ModelStoreArtifact(
+            name=name,
+            version=entry["version"],
+            path=path,
+            installed=self._installed(name, record),
+            sha256=record.get("sha256"),
+            size_bytes=record.get("size_bytes"),
+            fetched_at=record.get("fetched_at")
+        )
+
+    def prefetch(self, names: list = None) -> list:
+        """
+        Installs the given (by default all) manifest models. Failures are reported per model.
+        Returns:
+            list: ModelStoreArtifact per model.
+        """
+        results = []
+        for name in names or self.names:
+            try:
+                self.ensure(name)
+                results.append(self.status(name))
+            except Exception as e:
+                logging.error(f"Failed to fetch model {name}", exc_info=True)
+                artifact = self.status(name)
+                artifact.error = str(e)
+                results.append(artifact)
+        return results
+
+    def verify(self, name: str) -> bool:
+        """
+        Re-hashes an installed single-file model against its pinned SHA-256, whatever its modification time.
+        """
+        record = self._read_lock().get(name)
+        path = self.path(name)
+        if self.entry(name).get("archive"):
+            return self._installed(name, record)
+        if not record or not os.path.exists(path):
+            return False
+        return _sha256_file(path, self.model_store_config.chunk_size).hexdigest() == self._expected_sha256(name, record)
+
+
+_model_store = None
+_model_store_lock = threading.Lock()
+
+
+def get_model_store() -> ModelStore:
+    """
+    Returns the process-wide model store, creating it on first use.
+    """
+    global _model_store
+    if _model_store is None:
+        with _model_store_lock:
+            if _model_store is None:
+                _model_store = ModelStore()
+    return _model_store
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fetch and verify the model weights in the manifest.")
+    parser.add_argument("command", choices=("prefetch", "verify", "status"))
+    parser.add_argument("names", nargs="*", help="Manifest entries (default: all).")
+    args = parser.parse_args()
+
+    model_store = get_model_store()
+    names = args.names or model_store.names
+    if args.command == "prefetch":
+        results = model_store.prefetch(names)
+    else:
+        results = [model_store.status(name) for name in names]
+    failed = False
+    for artifact in results:
+        state = "installed" if artifact.installed else "missing"
+        if args.command == "verify" and artifact.installed:
+            state = "verified" if model_store.verify(artifact.name) else "CORRUPT"
+        failed = failed or state in ("missing", "CORRUPT") or artifact.error is not None
+        print(f"{artifact.name:>16} v{artifact.version:<6} {state:<9} {artifact.path}  {artifact.sha256 or ''}"
+              f"{'  error: ' + artifact.error if artifact.error else ''}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
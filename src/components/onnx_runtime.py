@@ -0,0 +1,260 @@
+from src.entity.face_swap_config import ConfigEntity, OnnxRuntimeConfig
+from src.exceptions import CustomException
+from src.logger import logging
+
+import os
+import sys
+import glob
+import json
+import hashlib
+import platform
+import onnx
+import onnxruntime
+from insightface.app import FaceAnalysis
+from insightface.model_zoo.arcface_onnx import ArcFaceONNX
+from insightface.model_zoo.attribute import Attribute
+from insightface.model_zoo.inswapper import INSwapper
+from insightface.model_zoo.landmark import Landmark
+from insightface.model_zoo.retinaface import RetinaFace
+from insightface.utils import ensure_available
+
+GRAPH_OPTIMIZATION_LEVELS = {
+    "disabled": onnxruntime.GraphOptimizationLevel.ORT_DISABLE_ALL,
+    "basic": onnxruntime.GraphOptimizationLevel.ORT_ENABLE_BASIC,
+    "extended": onnxruntime.GraphOptimizationLevel.ORT_ENABLE_EXTENDED,
+    "all": onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL,
+}
+EXECUTION_MODES = {
+    "sequential": onnxruntime.ExecutionMode.ORT_SEQUENTIAL,
+    "parallel": onnxruntime.ExecutionMode.ORT_PARALLEL,
+}
+# Task names each insightface model class can report, used to skip models before creating a session
+MODEL_TASKS = {
+    RetinaFace: ("detection",),
+    Landmark: ("landmark_3d_68", "landmark_2d_106"),
+    Attribute: ("genderage",),
+    INSwapper: ("inswapper",),
+    ArcFaceONNX: ("recognition",),
+}
+
+
+class SessionFactory:
+    """
+    Creates ONNX Runtime sessions with the configured providers, thread counts, graph
+    optimization level and memory arena settings.
+
+    The optimized graph is saved next to the weights the first time a model is loaded and
+    reused on later cold starts with graph optimizations disabled, so the optimization
+    passes run once per host. The cache key covers the weights file, the ONNX Runtime
+    version, the optimization level, the providers and the CPU architecture.
+    """
+    def __init__(self, config: ConfigEntity = None):
+        try:
+            logging.info("Creating OnnxRuntimeConfig...")
+            self.onnx_runtime_config = OnnxRuntimeConfig(config=config or ConfigEntity())
+            if self.onnx_runtime_config.graph_optimization_level not in GRAPH_OPTIMIZATION_LEVELS:
+                raise ValueError(f"Unknown graph optimization level: {self.onnx_runtime_config.graph_optimization_level}")
+            if self.onnx_runtime_config.execution_mode not in EXECUTION_MODES:
+                raise ValueError(f"Unknown execution mode: {self.onnx_runtime_config.execution_mode}")
+        except Exception as e:
+            logging.error("Failed to initialize OnnxRuntimeConfig", exc_info=True)
+            raise CustomException(e, sys) from e
+
+    @property
+    def providers(self) -> list:
+        return list(self.onnx_runtime_config.providers)
+
+    def session_options(self) -> onnxruntime.SessionOptions:
+        config = self.onnx_runtime_config
+        options = onnxruntime.SessionOptions()
+        options.intra_op_num_threads = config.intra_op_threads
+        options.inter_op_num_threads = config.inter_op_threads
+        options.execution_mode = EXECUTION_MODES[config.execution_mode]
+        options.graph_optimization_level = GRAPH_OPTIMIZATION_LEVELS[config.graph_optimization_level]
+        options.enable_cpu_mem_arena = config.enable_cpu_mem_arena
+        options.enable_mem_pattern = config.enable_mem_pattern
+        options.add_session_config_entry("session.intra_op.allow_spinning", "1" if config.allow_spinning else "0")
+        return options
+
+    def optimized_model_path(self, model_path: str):
+        """
+        Returns:
+            str: Where the optimized graph of model_path is cached, or None when caching is disabled.
+        """
+        config = self.onnx_runtime_config
+        if not config.optimized_model_dir or config.graph_optimization_level == "disabled":
+            return None
+        stat = os.stat(model_path)
+        key = "|".join(str(part) for part in (
+            os.path.abspath(model_path), stat.st_size, stat.st_mtime_ns, onnxruntime.__version__,
+            config.graph_optimization_level, ",".join(config.providers), platform.machine()
+        ))
+        digest = hashlib.blake2b(key.encode(), digest_size=8).hexdigest()
+        stem = os.path.splitext(os.path.basename(model_path))[0]
+        return os.path.join(config.optimized_model_dir, f"{stem}.{digest}.onnx")
+
+    def create_session(self, model_path: str) -> onnxruntime.InferenceSession:
+        """
+        Creates a session for model_path, from its cached optimized graph when there is one.
+        """
+        cache_path = self.optimized_model_path(model_path)
+        if cache_path is not None and os.path.exists(cache_path):
+            options = self.session_options()
+            options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_DISABLE_ALL
+            try:
+                session = onnxruntime.InferenceSession(cache_path, sess_options=options, providers=self.providers)
+                logging.info(f"Loaded optimized graph of {model_path} from {cache_path}")
+                return session
+            except Exception:
+                logging.warning(f"Discarding unreadable optimized graph {cache_path}", exc_info=True)
+                os.remove(cache_path)
+
+        options = self.session_options()
+        tmp_path = None
+        if cache_path is not None:
+            os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+            tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+            options.optimized_model_filepath = tmp_path
+        session = onnxruntime.InferenceSession(model_path, sess_options=options, providers=self.providers)
+        if tmp_path is not None and os.path.exists(tmp_path):
+            os.replace(tmp_path, cache_path)
+            logging.info(f"Saved optimized graph of {model_path} to {cache_path}")
+        return session
+
+
+def _dim(dim):
+    return dim.dim_value if dim.HasField("dim_value") else dim.dim_param
+
+
+def route_model_class(model_file: str):
+    """
+    Picks the insightface model class for an ONNX file from its graph inputs and outputs,
+    with the same rules as insightface's ModelRouter but without creating a session.
+    """
+    graph = onnx.load(model_file, load_external_data=False).graph
+    initializers = {initializer.name for initializer in graph.initializer}
+    inputs = [graph_input for graph_input in graph.input if graph_input.name not in initializers]
+    input_shape = [_dim(dim) for dim in inputs[0].type.tensor_type.shape.dim]
+    if len(graph.output) >= 5:
+        return RetinaFace
+    if input_shape[2] == 192 and input_shape[3] == 192:
+        return Landmark
+    if input_shape[2] == 96 and input_shape[3] == 96:
+        return Attribute
+    if len(inputs) == 2 and input_shape[2] == 128 and input_shape[3] == 128:
+        return INSwapper
+    if isinstance(input_shape[2], int) and input_shape[2] == input_shape[3] and input_shape[2] >= 112 and input_shape[2] % 16 == 0:
+        return ArcFaceONNX
+    return None
+
+
+class TunedFaceAnalysis(FaceAnalysis):
+    """
+    FaceAnalysis whose model sessions come from a SessionFactory. Models outside
+    allowed_modules are skipped before any session is created for them.
+    """
+    def __init__(self, name: str, root: str = "~/.insightface", allowed_modules: list = None,
+                 session_factory: SessionFactory = None):
+        onnxruntime.set_default_logger_severity(3)
+        session_factory = session_factory or SessionFactory()
+        self.models = {}
+        self.model_dir = ensure_available("models", name, root=root)
+        for onnx_file in sorted(glob.glob(os.path.join(self.model_dir, "*.onnx"))):
+            model_class = route_model_class(onnx_file)
+            if model_class is None:
+                logging.warning(f"Model not recognized: {onnx_file}")
+                continue
+            tasks = MODEL_TASKS[model_class]
+            if allowed_modules is not None and not any(task in allowed_modules for task in tasks):
+                logging.info(f"Skipping model {onnx_file} ({model_class.__name__})")
+                continue
+            if all(task in self.models for task in tasks):
+                logging.info(f"Duplicated model task type, ignoring {onnx_file}")
+                continue
+            # model_file stays the original file: some models read their normalization or emap from it
+            model = model_class(model_file=onnx_file, session=session_factory.create_session(onnx_file))
+            if (allowed_modules is not None and model.taskname not in allowed_modules) or model.taskname in self.models:
+                continue
+            logging.info(f"Loaded model {onnx_file}: {model.taskname} {model.input_shape}")
+            self.models[model.taskname] = model
+        if "detection" not in self.models:
+            raise ValueError(f"No detection model found in {self.model_dir}")
+        self.det_model = self.models["detection"]
+
+
+def _sha256_file(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _quantized_source_path(int8_path: str) -> str:
+    return f"{int8_path}.source.json"
+
+
+def quantize_swapper(fp32_path: str, int8_path: str) -> str:
+    """
+    Writes a dynamically quantized (INT8 weights) copy of the swapper model, and next to it a
+    record of the FP32 file it was made from (see quantized_swapper_is_current).
+    ONNX Runtime's CPU ConvInteger kernel needs unsigned 8-bit weights, hence QUInt8.
+    Returns:
+        str: int8_path.
+    """
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    logging.info(f"Quantizing {fp32_path} to {int8_path}...")
+    os.makedirs(os.path.dirname(int8_path) or ".", exist_ok=True)
+    tmp_path = f"{int8_path}.{os.getpid()}.tmp"
+    quantize_dynamic(fp32_path, tmp_path, weight_type=QuantType.QUInt8)
+    os.replace(tmp_path, int8_path)
+    stat = os.stat(fp32_path)
+    source = {"path": os.path.abspath(fp32_path), "size_bytes": stat.st_size, "mtime_ns": stat.st_mtime_ns,
+              "sha256": _sha256_file(fp32_path)}
+    # Written after the model, so a crash in between leaves a copy that is quantized again
+    source_path = _quantized_source_path(int8_path)
+    with open(f"{source_path}.{os.getpid()}.tmp", "w") as f:
+        json.dump(source, f)
+    os.replace(f"{source_path}.{os.getpid()}.tmp", source_path)
+    logging.info("Swapper quantization finished.")
+    return int8_path
+
+
+def quantized_swapper_is_current(fp32_path: str, int8_path: str) -> bool:
+    """
+    Checks that int8_path was quantized from the FP32 weights now at fp32_path: same size and
+    modification time or, when only the modification time changed, the same SHA-256.
+    """
+    source_path = _quantized_source_path(int8_path)
+    if not os.path.exists(int8_path) or not os.path.exists(source_path):
+        return False
+    try:
+        with open(source_path) as f:
+            source = json.load(f)
+    except ValueError:
+        return False
+    stat = os.stat(fp32_path)
+    if stat.st_size != source.get("size_bytes"):
+        return False
+    if stat.st_mtime_ns == source.get("mtime_ns"):
+        return True
+    if _sha256_file(fp32_path) != source.get("sha256"):
+        return False
+    source["mtime_ns"] = stat.st_mtime_ns
+    with open(f"{source_path}.{os.getpid()}.tmp", "w") as f:
+        json.dump(source, f)
+    os.replace(f"{source_path}.{os.getpid()}.tmp", source_path)
+    return True
+
+
+def ensure_quantized_swapper(fp32_path: str, int8_path: str) -> str:
+    """
+    Returns int8_path, quantizing the FP32 weights first when there is no INT8 copy yet or it
+    was made from other weights.
+    """
+    if not quantized_swapper_is_current(fp32_path, int8_path):
+        if os.path.exists(int8_path):
+            logging.warning(f"{int8_path} was not quantized from the current {fp32_path}; quantizing again.")
+        quantize_swapper(fp32_path, int8_path)
+    return int8_path
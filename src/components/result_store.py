@@ -0,0 +1,271 @@
+from src.entity.face_swap_config import ConfigEntity, ResultStoreConfig
+from src.entity.face_swap_artifact import StoredResultArtifact, ResultStoreArtifact
+from src.components.metrics import Metrics, get_metrics
+from src.exceptions import CustomException
+from src.logger import logging
+from src.utils import IMAGE_FORMATS
+
+import os
+import sys
+import time
+import hashlib
+import sqlite3
+import threading
+
+# File extension -> media type of the encoded results the store accepts
+RESULT_MEDIA_TYPES = {extension: media_type for extension, media_type, _ in IMAGE_FORMATS.values()}
+
+
+class ResultStore:
+    """
+    Content-addressed store of encoded swap results under artifacts/result_store/.
+
+    A result's key hashes everything that determines its bytes: the target image content,
+    the source image content or identity, the selected face indices, the model version and
+    the output format, quality and swap mode. An identical repeat request is answered
+    from disk without detection or inference. Files are written to a temporary name and
+    renamed into place; a SQLite index (shared by every worker process on the host) maps
+    keys to files, so lookups never scan the directory. Entries older than max_age_seconds
+    are dropped and the least recently used ones are evicted beyond max_bytes.
+    """
+    def __init__(self, config: ConfigEntity = None, metrics: Metrics = None):
+        try:
+            logging.info("Creating ResultStoreConfig...")
+            self.result_store_config = ResultStoreConfig(config=config or ConfigEntity())
+            self.metrics = metrics or get_metrics()
+            self._local = threading.local()
+            self._lock = threading.Lock()
+            self._hits = 0
+            self._misses = 0
+            self._evictions = 0
+            if self.enabled:
+                os.makedirs(self.result_store_config.store_dir, exist_ok=True)
+                os.makedirs(os.path.dirname(self.result_store_config.index_path) or ".", exist_ok=True)
+                new_index = not os.path.exists(self.result_store_config.index_path)
+                with self._connection() as connection:
+                    connection.execute(
+                        "CREATE TABLE IF NOT EXISTS results ("
+                        "key TEXT PRIMARY KEY, path TEXT NOT NULL, media_type TEXT NOT NULL, "
+                        "size_bytes INTEGER NOT NULL, created_at REAL NOT NULL, last_access REAL NOT NULL)"
+                    )
+                    connection.execute("CREATE INDEX IF NOT EXISTS results_last_access ON results (last_access)")
+                    connection.execute("CREATE INDEX IF NOT EXISTS results_created_at ON results (created_at)")
+                if new_index:
+                    self._reindex()
+        except Exception as e:
+            logging.error("Failed to initialize ResultStoreConfig", exc_info=True)
+            raise CustomException(e, sys) from e
+
+    @property
+    def enabled(self) -> bool:
+        return self.result_store_config.enabled
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.result_store_config.index_path, timeout=30)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def _full_path(self, relative_path: str) -> str:
+        return os.path.join(self.result_store_config.store_dir, relative_path)
+
+    def _remove_file(self, relative_path: str) -> None:
+        try:
+            os.remove(self._full_path(relative_path))
+        except FileNotFoundError:
+            pass
+
+    def _reindex(self) -> None:
+        """
+        Indexes result files left by a store whose index was deleted, so they are evicted like any other entry.
+        """
+        rows = []
+        for root, _, filenames in os.walk(self.result_store_config.store_dir):
+            for filename in filenames:
+                full_path = os.path.join(root, filename)
+                key, extension = os.path.splitext(filename)
+                if filename.endswith(".tmp"):
+                    os.remove(full_path)
+                elif extension in RESULT_MEDIA_TYPES:
+                    stat = os.stat(full_path)
+                    rows.append((key, os.path.relpath(full_path, self.result_store_config.store_dir),
+                                 RESULT_MEDIA_TYPES[extension], stat.st_size, stat.st_mtime, stat.st_mtime))
+        if rows:
+            logging.info(f"Re-indexing {len(rows)} stored result(s).")
+            with self._connection() as connection:
+                connection.executemany("INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?)", rows)
+            self._evict(time.time())
+
+    def key(self, target_hash: str, source: str, selected_indices, model_version: str, output_format: str):
+        """
+        Args:
+            target_hash (str): Content hash of the target image.
+            source (str): "image:<content hash>" or "identity:<identity id>".
+            selected_indices (list): 0-based face indices, or None for every face.
+            model_version (str): ModelRegistry.version.
+            output_format (str): "jpeg" or "webp".
+        Returns:
+            str: The result key, or None when the store is disabled.
+        """
+        if not self.enabled:
+            return None
+        indices = "all" if selected_indices is None else ",".join(str(i) for i in sorted(set(selected_indices)))
+        material = "|".join([
+            target_hash, source, indices, model_version, output_format,
+            str(self.result_store_config.result_image_quality), self.result_store_config.swap_mode
+        ])
+        return hashlib.blake2b(material.encode("utf-8"), digest_size=20).hexdigest()
+
+    def _count(self, hit: bool) -> None:
+        with self._lock:
+            if hit:
+                self._hits += 1
+            else:
+                self._misses += 1
+        self.metrics.count_cache_lookup("result", hit)
+
+    def get(self, key: str):
+        """
+        Returns:
+            StoredResultArtifact: The stored result with its bytes, or None on a miss.
+        """
+        if not self.enabled or key is None:
+            return None
+        now = time.time()
+        connection = self._connection()
+        row = connection.execute(
+            "SELECT path, media_type, size_bytes, created_at FROM results WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            self._count(False)
+            return None
+        relative_path, media_type, size_bytes, created_at = row
+        data = None
+        if created_at > now - self.result_store_config.max_age_seconds:
+            try:
+                with open(self._full_path(relative_path), "rb") as f:
+                    data = f.read()
+            except FileNotFoundError:
+                pass
+        if data is None or len(data) != size_bytes:
+            # Expired, or the file was removed or truncated behind the index's back
+            self._delete(key, relative_path)
+            self._count(False)
+            return None
+        with connection:
+            connection.execute("UPDATE results SET last_access = ? WHERE key = ?", (now, key))
+        self._count(True)
+        return StoredResultArtifact(
+            key=key,
+            path=self._full_path(relative_path),
+            media_type=media_type,
+            size_bytes=size_bytes,
+            created_at=created_at,
+            data=data
+        )
+
+    def put(self, key: str, data: bytes, extension: str):
+        """
+        Stores an encoded result atomically and evicts old entries.
+        Returns:
+            str: The path of the stored file, or None when the store is disabled.
+        """
+        if not self.enabled or key is None:
+            return None
+        if extension not in RESULT_MEDIA_TYPES:
+            raise ValueError(f"Unsupported result extension: {extension}. Expected one of {sorted(RESULT_MEDIA_TYPES)}")
+        relative_path = os.path.join(key[:2], f"{key}{extension}")
+        path = self._full_path(relative_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        now = time.time()
+        with self._connection() as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO results (key, path, media_type, size_bytes, created_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, relative_path, RESULT_MEDIA_TYPES[extension], len(data), now, now)
+            )
+        self._evict(now)
+        return path
+
+    def _delete(self, key: str, relative_path: str) -> None:
+        with self._connection() as connection:
+            connection.execute("DELETE FROM results WHERE key = ?", (key,))
+        self._remove_file(relative_path)
+
+    def _evict(self, now: float) -> None:
+        """
+        Drops expired entries, then the least recently used ones until the store fits in max_bytes.
+        """
+        evicted = []
+        with self._connection() as connection:
+            evicted += connection.execute(
+                "SELECT key, path FROM results WHERE created_at <= ?", (now - self.result_store_config.max_age_seconds,)
+            ).fetchall()
+            connection.execute("DELETE FROM results WHERE created_at <= ?", (now - self.result_store_config.max_age_seconds,))
+            bytes_used = connection.execute("SELECT COALESCE(SUM(size_bytes), 0) FROM results").fetchone()[0]
+            if bytes_used > self.result_store_config.max_bytes:
+                for key, relative_path, size_bytes in connection.execute(
+                    "SELECT key, path, size_bytes FROM results ORDER BY last_access"
+                ).fetchall():
+                    if bytes_used <= self.result_store_config.max_bytes:
+                        break
+                    connection.execute("DELETE FROM results WHERE key = ?", (key,))
+                    evicted.append((key, relative_path))
+                    bytes_used -= size_bytes
+        for _, relative_path in evicted:
+            self._remove_file(relative_path)
+        if evicted:
+            with self._lock:
+                self._evictions += len(evicted)
+            logging.info(f"Evicted {len(evicted)} stored result(s).")
+
+    def clear(self) -> None:
+        if not self.enabled:
+            return
+        with self._connection() as connection:
+            rows = connection.execute("SELECT path FROM results").fetchall()
+            connection.execute("DELETE FROM results")
+        for (relative_path,) in rows:
+            self._remove_file(relative_path)
+
+    def stats(self) -> ResultStoreArtifact:
+        entries, bytes_used = 0, 0
+        if self.enabled:
+            entries, bytes_used = self._connection().execute(
+                "SELECT COUNT(*), COALESCE(SUM(size_bytes), 0) FROM results"
+            ).fetchone()
+        with self._lock:
+            lookups = self._hits + self._misses
+            return ResultStoreArtifact(
+                enabled=self.enabled,
+                entries=entries,
+                bytes_used=bytes_used,
+                max_bytes=self.result_store_config.max_bytes,
+                hits=self._hits,
+                misses=self._misses,
+                evictions=self._evictions,
+                hit_rate=round(self._hits / lookups, 4) if lookups else 0.0
+            )
+
+
+_result_store = None
+_result_store_lock = threading.Lock()
+
+
+def get_result_store() -> ResultStore:
+    """
+    Returns the process-wide result store, creating it on first use.
+    """
+    global _result_store
+    if _result_store is None:
+        with _result_store_lock:
+            if _result_store is None:
+                _result_store = ResultStore()
+    return _result_store
@@ -0,0 +1,212 @@
+from src.entity.face_swap_config import ConfigEntity, SessionStoreConfig
+from src.entity.face_swap_artifact import SessionArtifact
+from src.exceptions import CustomException
+from src.logger import logging
+from src.utils import decode_image_bytes
+
+import os
+import sys
+import time
+import uuid
+import pickle
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from dataclasses import replace
+
+
+class SessionStore(ABC):
+    """
+    Stores per-client upload sessions (decoded images, detections, thumbnails) under a session id.
+    Sessions expire after a TTL and the least recently used ones are evicted beyond max_entries.
+    """
+    def __init__(self, config: ConfigEntity = None):
+        try:
+            logging.info("Creating SessionStoreConfig...")
+            self.session_store_config = SessionStoreConfig(config=config or ConfigEntity())
+        except Exception as e:
+            logging.error("Failed to initialize SessionStoreConfig", exc_info=True)
+            raise CustomException(e, sys) from e
+
+    def _new_session(self, session: SessionArtifact) -> SessionArtifact:
+        now = time.time()
+        return replace(
+            session,
+            session_id=session.session_id or uuid.uuid4().hex,
+            created_at=now,
+            expires_at=now + self.session_store_config.ttl_seconds
+        )
+
+    @abstractmethod
+    def create(self, session: SessionArtifact) -> str:
+        """
+        Stores a new session.
+        Returns:
+            str: Its session id.
+        """
+
+    @abstractmethod
+    def get(self, session_id: str):
+        """
+        Returns:
+            SessionArtifact: The session, refreshed to a new TTL, or None if it is unknown or expired.
+        """
+
+    @abstractmethod
+    def delete(self, session_id: str) -> bool:
+        """
+        Returns:
+            bool: True if the session existed.
+        """
+
+    @abstractmethod
+    def __len__(self) -> int:
+        """
+        Returns:
+            int: Number of stored sessions.
+        """
+
+
+class MemorySessionStore(SessionStore):
+    """
+    In-process session store; sessions are only visible to the worker that created them.
+    """
+    def __init__(self, config: ConfigEntity = None):
+        super().__init__(config)
+        self._lock = threading.Lock()
+        self._sessions = OrderedDict()
+
+    def _evict(self, now: float) -> None:
+        expired = [session_id for session_id, session in self._sessions.items() if session.expires_at <= now]
+        for session_id in expired:
+            del self._sessions[session_id]
+        while len(self._sessions) > self.session_store_config.max_entries:
+            self._sessions.popitem(last=False)
+
+    def create(self, session: SessionArtifact) -> str:
+        # Decoded images are kept, so the encoded upload bytes are not needed any more
+        session = self._new_session(replace(session, multi_face_bytes=None, single_face_bytes=None))
+        with self._lock:
+            self._sessions[session.session_id] = session
+            self._evict(time.time())
+        return session.session_id
+
+    def get(self, session_id: str):
+        now = time.time()
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                return None
+            if session.expires_at <= now:
+                del self._sessions[session_id]
+                return None
+            session.expires_at = now + self.session_store_config.ttl_seconds
+            self._sessions.move_to_end(session_id)
+            return session
+
+    def delete(self, session_id: str) -> bool:
+        with self._lock:
+            return self._sessions.pop(session_id, None) is not None
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._sessions)
+
+
+class SqliteSessionStore(SessionStore):
+    """
+    Session store in a local SQLite file, shared by every worker process on the host.
+    The encoded uploads are stored rather than the decoded arrays; images are decoded on read.
+    """
+    def __init__(self, config: ConfigEntity = None):
+        super().__init__(config)
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(self.session_store_config.db_path) or ".", exist_ok=True)
+        with self._connection() as connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS sessions ("
+                "session_id TEXT PRIMARY KEY, payload BLOB NOT NULL, "
+                "expires_at REAL NOT NULL, last_access REAL NOT NULL)"
+            )
+            connection.execute("CREATE INDEX IF NOT EXISTS sessions_last_access ON sessions (last_access)")
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.session_store_config.db_path, timeout=30)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def create(self, session: SessionArtifact) -> str:
+        if session.multi_face_bytes is None:
+            raise ValueError("SqliteSessionStore needs the encoded upload bytes")
+        session = self._new_session(session)
+        payload = pickle.dumps(replace(session, img_multi_faces=None, img_single_face=None), protocol=pickle.HIGHEST_PROTOCOL)
+        now = time.time()
+        with self._connection() as connection:
+            connection.execute(
+                "INSERT INTO sessions (session_id, payload, expires_at, last_access) VALUES (?, ?, ?, ?)",
+                (session.session_id, payload, session.expires_at, now)
+            )
+            connection.execute("DELETE FROM sessions WHERE expires_at <= ?", (now,))
+            connection.execute(
+                "DELETE FROM sessions WHERE session_id IN ("
+                "SELECT session_id FROM sessions ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+                (self.session_store_config.max_entries,)
+            )
+        return session.session_id
+
+    def get(self, session_id: str):
+        now = time.time()
+        with self._connection() as connection:
+            row = connection.execute(
+                "SELECT payload FROM sessions WHERE session_id = ? AND expires_at > ?", (session_id, now)
+            ).fetchone()
+            if row is None:
+                return None
+            expires_at = now + self.session_store_config.ttl_seconds
+            connection.execute(
+                "UPDATE sessions SET expires_at = ?, last_access = ? WHERE session_id = ?", (expires_at, now, session_id)
+            )
+        session = pickle.loads(row[0])
+        return replace(
+            session,
+            expires_at=expires_at,
+            img_multi_faces=decode_image_bytes(session.multi_face_bytes),
+            img_single_face=decode_image_bytes(session.single_face_bytes)
+        )
+
+    def delete(self, session_id: str) -> bool:
+        with self._connection() as connection:
+            return connection.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,)).rowcount > 0
+
+    def __len__(self) -> int:
+        with self._connection() as connection:
+            return connection.execute("SELECT COUNT(*) FROM sessions WHERE expires_at > ?", (time.time(),)).fetchone()[0]
+
+
+SESSION_BACKENDS = {
+    "memory": MemorySessionStore,
+    "sqlite": SqliteSessionStore,
+}
+
+_session_store = None
+_session_store_lock = threading.Lock()
+
+
+def get_session_store() -> SessionStore:
+    """
+    Returns the process-wide session store for the configured backend, creating it on first use.
+    """
+    global _session_store
+    if _session_store is None:
+        with _session_store_lock:
+            if _session_store is None:
+                backend = SessionStoreConfig(config=ConfigEntity()).backend
+                if backend not in SESSION_BACKENDS:
+                    raise ValueError(f"Unknown session backend: {backend}. Expected one of {sorted(SESSION_BACKENDS)}")
+                _session_store = SESSION_BACKENDS[backend]()
+    return _session_store
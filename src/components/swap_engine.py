@@ -0,0 +1,212 @@
+from src.components.micro_batcher import get_micro_batch_scheduler
+from src.exceptions import CustomException
+from src.logger import logging
+
+import sys
+import cv2
+import hashlib
+import numpy as np
+
+
+class SwapEngine:
+    """
+    Runs the inswapper model with a precomputed source latent, so a source
+    identity is projected through the model's emap once instead of on every swap.
+    """
+    def __init__(self, swapper):
+        self.swapper = swapper
+        self.input_size = swapper.input_size
+        # A symbolic batch dimension lets one session.run process every face of a wave
+        batch_dim = swapper.session.get_inputs()[0].shape[0]
+        self.supports_batching = not isinstance(batch_dim, int) or batch_dim != 1
+
+    @property
+    def latent_model(self) -> str:
+        """
+        Fingerprint of the swapper's emap; latents are only valid for the model they were computed with.
+        """
+        latent_model = getattr(self.swapper, "_latent_model", None)
+        if latent_model is None:
+            emap = np.ascontiguousarray(self.swapper.emap)
+            latent_model = hashlib.blake2b(emap.tobytes(), digest_size=8).hexdigest()
+            self.swapper._latent_model = latent_model
+        return latent_model
+
+    def compute_latent(self, normed_embedding) -> np.ndarray:
+        """
+        Projects a normed recognition embedding into the swapper's latent space.
+        Returns:
+            np.ndarray: Unit-norm latent of shape (1, D).
+        """
+        latent = np.asarray(normed_embedding, dtype=np.float32).reshape((1, -1))
+        latent = np.dot(latent, self.swapper.emap)
+        latent /= np.linalg.norm(latent)
+        return latent
+
+    def _blob(self, aimgs: list) -> np.ndarray:
+        swapper = self.swapper
+        return cv2.dnn.blobFromImages(aimgs, 1.0 / swapper.input_std, self.input_size,
+                                      (swapper.input_mean, swapper.input_mean, swapper.input_mean), swapRB=True)
+
+    def _run_model(self, blob: np.ndarray, latent: np.ndarray) -> list:
+        """
+        Runs the swapper on an N x 3 x H x W blob and returns N swapped BGR crops. latent is
+        either one (1, D) latent for every face or an (N, D) array with one row per face.
+        With micro-batching enabled, the faces are merged with other requests' faces into
+        shared model calls. Falls back to one call per face when the model has a fixed batch size of 1.
+        """
+        swapper = self.swapper
+        latent = latent.reshape((-1, latent.shape[-1]))
+        latents = latent if latent.shape[0] == blob.shape[0] else np.repeat(latent, blob.shape[0], axis=0)
+        micro_batch_scheduler = get_micro_batch_scheduler()
+        if self.supports_batching and micro_batch_scheduler.enabled:
+            pred = micro_batch_scheduler.swap(swapper, blob, latents)
+        elif self.supports_batching or blob.shape[0] == 1:
+            pred = swapper.session.run(swapper.output_names, {swapper.input_names[0]: blob, swapper.input_names[1]: latents})[0]
+        else:
+            pred = np.concatenate([
+                swapper.session.run(swapper.output_names, {swapper.input_names[0]: blob[i:i + 1], swapper.input_names[1]: latents[i:i + 1]})[0]
+                for i in range(blob.shape[0])
+            ])
+        img_fake = pred.transpose((0, 2, 3, 1))
+        return list(np.clip(255 * img_fake, 0, 255).astype(np.uint8)[:, :, :, ::-1])
+
+    def swap(self, img, target_face, latent, paste_back: bool = True):
+        """
+        Equivalent to INSwapper.get, with the source latent supplied by the caller.
+        """
+        from insightface.utils import face_align
+
+        try:
+            aimg, M = face_align.norm_crop2(img, target_face.kps, self.input_size[0])
+            bgr_fake = self._run_model(self._blob([aimg]), latent)[0]
+            if not paste_back:
+                return bgr_fake, M
+            return self.paste_back(img, aimg, bgr_fake, M)
+        except Exception as e:
+            logging.error("Error during face swap inference", exc_info=True)
+            raise CustomException(e, sys) from e
+
+    def swap_batch(self, img, target_faces: list, latent, inplace: bool = False):
+        """
+        Swaps several faces with one model call per wave and ROI-local paste-back.
+
+        Faces are grouped into waves so that no face is cropped from a region an earlier
+        face pastes into, and overlapping paste regions are composited in the original
+        order. The result therefore matches calling swap() face by face, up to OpenCV's
+        fixed-point rounding of the ROI-shifted warps (at most a couple of intensity levels).
+        With inplace=True the faces are composited directly into img and no frame-sized
+        temporaries are allocated. latent is one (1, D) source latent for every face, or an
+        (N, D) array with one row per target face to swap several identities in one pass.
+        Returns:
+            np.ndarray: The image with all target faces swapped (img itself when inplace).
+        """
+        from insightface.utils import face_align
+
+        try:
+            result_image = img if inplace else img.copy()
+            latent = np.asarray(latent, dtype=np.float32)
+            latent = latent.reshape((-1, latent.shape[-1]))
+            per_face = latent.shape[0] > 1
+            if per_face and latent.shape[0] != len(target_faces):
+                raise ValueError(f"Got {latent.shape[0]} latents for {len(target_faces)} faces")
+            crop_size = self.input_size[0]
+            matrices = [face_align.estimate_norm(face.kps, crop_size) for face in target_faces]
+            crop_regions = [self._region(result_image.shape, M, crop_size, 1) for M in matrices]
+            paste_regions = [self._region(result_image.shape, M, crop_size, self._paste_margin(M, crop_size)) for M in matrices]
+
+            waves = []
+            for i in range(len(target_faces)):
+                wave = 0
+                for j in range(i):
+                    if self._overlaps(paste_regions[j], crop_regions[i]):
+                        wave = max(wave, waves[j] + 1)
+                    elif self._overlaps(paste_regions[j], paste_regions[i]):
+                        wave = max(wave, waves[j])
+                waves.append(wave)
+
+            for wave in range(max(waves, default=-1) + 1):
+                members = [i for i in range(len(target_faces)) if waves[i] == wave]
+                aimgs = [cv2.warpAffine(result_image, matrices[i], (crop_size, crop_size), borderValue=0.0) for i in members]
+                bgr_fakes = self._run_model(self._blob(aimgs), latent[members] if per_face else latent)
+                logging.info(f"Swapped {len(members)} face(s) in wave {wave + 1}.")
+                for i, aimg, bgr_fake in zip(members, aimgs, bgr_fakes):
+                    self.paste_back_roi(result_image, aimg, bgr_fake, matrices[i], paste_regions[i])
+            return result_image
+        except Exception as e:
+            logging.error("Error during batched face swap", exc_info=True)
+            raise CustomException(e, sys) from e
+
+    @classmethod
+    def paste_back(cls, target_img, aimg, bgr_fake, M):
+        """
+        Blends a swapped face crop back into the target image (same mask as INSwapper.get).
+        """
+        return cls._blend(target_img, aimg, bgr_fake, cv2.invertAffineTransform(M))
+
+    @staticmethod
+    def _blend(target_img, aimg, bgr_fake, IM):
+        img_white = np.full((aimg.shape[0], aimg.shape[1]), 255, dtype=np.float32)
+        bgr_fake = cv2.warpAffine(bgr_fake, IM, (target_img.shape[1], target_img.shape[0]), borderValue=0.0)
+        img_white = cv2.warpAffine(img_white, IM, (target_img.shape[1], target_img.shape[0]), borderValue=0.0)
+        img_white[img_white > 20] = 255
+        img_mask = img_white
+        mask_h_inds, mask_w_inds = np.where(img_mask == 255)
+        mask_h = np.max(mask_h_inds) - np.min(mask_h_inds)
+        mask_w = np.max(mask_w_inds) - np.min(mask_w_inds)
+        mask_size = int(np.sqrt(mask_h * mask_w))
+        k = max(mask_size // 10, 10)
+        kernel = np.ones((k, k), np.uint8)
+        img_mask = cv2.erode(img_mask, kernel, iterations=1)
+        k = max(mask_size // 20, 5)
+        blur_size = (2 * k + 1, 2 * k + 1)
+        img_mask = cv2.GaussianBlur(img_mask, blur_size, 0)
+        img_mask /= 255
+        img_mask = np.reshape(img_mask, [img_mask.shape[0], img_mask.shape[1], 1])
+        fake_merged = img_mask * bgr_fake + (1 - img_mask) * target_img.astype(np.float32)
+        return fake_merged.astype(np.uint8)
+
+    @staticmethod
+    def _paste_margin(M, crop_size: int) -> int:
+        # Paste-back blurs the eroded mask with a (2k+1) kernel, k = max(mask_size // 20, 5);
+        # 2k + 4 pixels of zero mask around the warped crop make the ROI blur match a full-frame blur.
+        # mask_size is at most the diagonal of the crop square mapped back into the image.
+        mask_size = np.sqrt(2) * crop_size / np.sqrt(abs(np.linalg.det(M[:, :2])))
+        return 2 * max(int(mask_size) // 20, 5) + 4
+
+    @staticmethod
+    def _region(image_shape, M, crop_size: int, margin: int) -> tuple:
+        """
+        Bounding box (x0, y0, x1, y1) in the image of the aligned crop square, grown by margin and clipped.
+        """
+        IM = cv2.invertAffineTransform(M)
+        corners = np.array([[0, 0, 1], [crop_size, 0, 1], [0, crop_size, 1], [crop_size, crop_size, 1]], dtype=np.float64)
+        points = corners @ IM.T
+        x0 = max(int(np.floor(points[:, 0].min())) - margin, 0)
+        y0 = max(int(np.floor(points[:, 1].min())) - margin, 0)
+        x1 = min(int(np.ceil(points[:, 0].max())) + margin, image_shape[1])
+        y1 = min(int(np.ceil(points[:, 1].max())) + margin, image_shape[0])
+        return x0, y0, x1, y1
+
+    @staticmethod
+    def _overlaps(a: tuple, b: tuple) -> bool:
+        return a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]
+
+    @classmethod
+    def paste_back_roi(cls, target_img, aimg, bgr_fake, M, region: tuple = None):
+        """
+        In-place paste-back restricted to the face's region: masks and warps are only built for
+        the pixels that can change instead of for the whole frame.
+        """
+        if region is None:
+            region = cls._region(target_img.shape, M, aimg.shape[0], cls._paste_margin(M, aimg.shape[0]))
+        x0, y0, x1, y1 = region
+        if x1 <= x0 or y1 <= y0:
+            return target_img
+        IM_roi = cv2.invertAffineTransform(M)
+        IM_roi[0, 2] -= x0
+        IM_roi[1, 2] -= y0
+        roi = target_img[y0:y1, x0:x1]
+        roi[...] = cls._blend(roi, aimg, bgr_fake, IM_roi)
+        return target_img
+
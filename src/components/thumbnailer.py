@@ -0,0 +1,141 @@
+from src.entity.face_swap_config import ConfigEntity, ThumbnailConfig
+from src.entity.face_swap_artifact import ThumbnailArtifact
+from src.components.artifact_sink import ArtifactSink, get_artifact_sink
+from src.exceptions import CustomException
+from src.logger import logging
+from src.utils import IMAGE_FORMATS, encode_image
+
+import os
+import sys
+import uuid
+import threading
+import cv2
+from concurrent.futures import ThreadPoolExecutor
+
+THUMBNAIL_MODES = ("inline", "coords")
+
+
+def clip_bbox(bbox, width: int, height: int):
+    """
+    Rounds a detector box to pixels and clips it to the image.
+    Returns:
+        list: [x1, y1, x2, y2], or None when nothing of the box is inside the image.
+    """
+    x1, y1, x2, y2 = (int(round(float(value))) for value in bbox[:4])
+    x1, y1 = max(x1, 0), max(y1, 0)
+    x2, y2 = min(x2, width), min(y2, height)
+    if x2 <= x1 or y2 <= y1:
+        return None
+    return [x1, y1, x2, y2]
+
+
+class Thumbnailer:
+    """
+    Builds the face thumbnails returned after detection. Each crop is downscaled so its
+    longer edge is at most max_edge and encoded exactly once; the same bytes go to the
+    response and, when artifacts are persisted, to disk under a per-session directory.
+    Encoding runs in a small thread pool when an image has many faces (OpenCV releases the
+    GIL while resizing and encoding). In "coords" mode only the boxes are returned.
+    """
+    def __init__(self, config: ConfigEntity = None, artifact_sink: ArtifactSink = None):
+        try:
+            logging.info("Creating ThumbnailConfig...")
+            self.thumbnail_config = ThumbnailConfig(config=config or ConfigEntity())
+            if self.thumbnail_config.mode not in THUMBNAIL_MODES:
+                raise ValueError(f"Unknown thumbnail mode: {self.thumbnail_config.mode}. Expected one of {THUMBNAIL_MODES}")
+            if self.thumbnail_config.image_format not in IMAGE_FORMATS:
+                raise ValueError(f"Unsupported thumbnail format: {self.thumbnail_config.image_format}. Expected one of {sorted(IMAGE_FORMATS)}")
+            self.artifact_sink = artifact_sink or get_artifact_sink()
+            self._executor = None
+            self._lock = threading.Lock()
+        except Exception as e:
+            logging.error("Failed to initialize ThumbnailConfig", exc_info=True)
+            raise CustomException(e, sys) from e
+
+    @property
+    def mode(self) -> str:
+        return self.thumbnail_config.mode
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.thumbnail_config.workers, thread_name_prefix="thumbnailer"
+                    )
+        return self._executor
+
+    def _encode(self, image, index: int, bbox: list, image_format: str, directory: str) -> ThumbnailArtifact:
+        crop = image[bbox[1]:bbox[3], bbox[0]:bbox[2]]
+        height, width = crop.shape[:2]
+        scale = self.thumbnail_config.max_edge / max(height, width)
+        if scale < 1:
+            # INTER_AREA is only fast for integer factors: box-filter by the integer part, then interpolate the rest
+            factor = int(1 / scale)
+            if factor >= 2:
+                crop = cv2.resize(crop, (max(width // factor, 1), max(height // factor, 1)), interpolation=cv2.INTER_AREA)
+            width, height = max(int(round(width * scale)), 1), max(int(round(height * scale)), 1)
+            crop = cv2.resize(crop, (width, height), interpolation=cv2.INTER_LINEAR)
+        data, extension, media_type = encode_image(crop, image_format, self.thumbnail_config.quality)
+        path = self.artifact_sink.submit(os.path.join(directory, f"face_{index}{extension}"), data)
+        return ThumbnailArtifact(index=index, bbox=bbox, width=width, height=height,
+                                 media_type=media_type, data=data, path=path)
+
+    def make(self, image, faces: list, name_prefix: str = None, mode: str = None,
+             image_format: str = None) -> list:
+        """
+        Args:
+            image (np.ndarray): The BGR image the faces were detected in.
+            faces (list): Detected faces; thumbnail i + 1 belongs to faces[i].
+            name_prefix (str): Directory name for the persisted crops, e.g. the session id.
+            mode (str): "inline" or "coords" (default: THUMBNAIL_MODE).
+            image_format (str): "jpeg" or "webp" (default: THUMBNAIL_FORMAT).
+        Returns:
+            list: One ThumbnailArtifact per face whose box lies inside the image.
+        """
+        mode = mode or self.thumbnail_config.mode
+        if mode not in THUMBNAIL_MODES:
+            raise ValueError(f"Unknown thumbnail mode: {mode}. Expected one of {THUMBNAIL_MODES}")
+        image_format = image_format or self.thumbnail_config.image_format
+        if image_format not in IMAGE_FORMATS:
+            raise ValueError(f"Unsupported thumbnail format: {image_format}. Expected one of {sorted(IMAGE_FORMATS)}")
+
+        height, width = image.shape[:2]
+        boxes = []
+        for i, face in enumerate(faces):
+            bbox = clip_bbox(face["bbox"], width, height)
+            if bbox is None:
+                logging.warning(f"Bounding box of face {i+1} lies outside the image: {face['bbox']}. Skipping.")
+                continue
+            boxes.append((i + 1, bbox))
+        if mode == "coords":
+            return [ThumbnailArtifact(index=index, bbox=bbox) for index, bbox in boxes]
+
+        directory = os.path.join(self.thumbnail_config.detected_faces_dir, name_prefix or uuid.uuid4().hex)
+        if len(boxes) < max(self.thumbnail_config.parallel_min_faces, 2) or self.thumbnail_config.workers <= 1:
+            return [self._encode(image, index, bbox, image_format, directory) for index, bbox in boxes]
+        executor = self._get_executor()
+        futures = [executor.submit(self._encode, image, index, bbox, image_format, directory) for index, bbox in boxes]
+        return [future.result() for future in futures]
+
+    def shutdown(self, wait: bool = True) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait)
+
+
+_thumbnailer = None
+_thumbnailer_lock = threading.Lock()
+
+
+def get_thumbnailer() -> Thumbnailer:
+    """
+    Returns the process-wide thumbnailer, creating it on first use.
+    """
+    global _thumbnailer
+    if _thumbnailer is None:
+        with _thumbnailer_lock:
+            if _thumbnailer is None:
+                _thumbnailer = Thumbnailer()
+    return _thumbnailer
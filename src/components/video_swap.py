@@ -0,0 +1,286 @@
+from src.entity.face_swap_config import ConfigEntity, VideoSwapConfig
+from src.entity.face_swap_artifact import VideoSwapArtifact
+from src.components.swap_engine import SwapEngine
+from src.components.face_detector import FaceDetector, get_face_detector
+from src.exceptions import CustomException
+from src.logger import logging
+
+import sys
+import time
+import queue
+import threading
+import cv2
+import numpy as np
+
+# Marks the end of the stream on every stage queue
+_END = object()
+SCENE_THUMBNAIL_SIZE = (64, 36)
+LK_PARAMS = dict(winSize=(21, 21), maxLevel=3, criteria=(cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT, 20, 0.03))
+
+
+class FaceTracker:
+    """
+    Follows the target faces of a video. The detector runs every detect_every frames, on a
+    scene change, or when tracking fails; in between, the five keypoints of each face are
+    tracked with pyramidal Lucas-Kanade optical flow and the box follows the keypoints.
+    Only detection and keypoints are needed to swap a target face, so the landmark,
+    attribute and recognition models of the pack are never run on video frames.
+    """
+    def __init__(self, app, detect_every: int, scene_change_threshold: float, max_track_error: float,
+                 face_detector: FaceDetector = None):
+        self.app = app
+        self.face_detector = face_detector or get_face_detector()
+        self.detect_every = max(int(detect_every), 1)
+        self.scene_change_threshold = scene_change_threshold
+        self.max_track_error = max_track_error
+        self.detections = 0
+        self.tracked_frames = 0
+        self.scene_changes = 0
+        self._faces = []
+        self._prev_gray = None
+        self._prev_thumbnail = None
+        self._since_detection = 0
+
+    def _detect(self, frame) -> list:
+        from insightface.app.common import Face
+
+        self.detections += 1
+        bboxes, kpss = self.face_detector.detect_boxes(self.app, frame)
+        if kpss is None:
+            return []
+        return [Face(bbox=bboxes[i, 0:4], kps=kpss[i], det_score=bboxes[i, 4]) for i in range(bboxes.shape[0])]
+
+    def _track(self, gray):
+        """
+        Moves each face along the optical flow of its keypoints. Returns None when any face is lost.
+        """
+        if not self._faces:
+            return []
+        points = np.concatenate([face.kps for face in self._faces]).astype(np.float32).reshape(-1, 1, 2)
+        moved, status, _ = cv2.calcOpticalFlowPyrLK(self._prev_gray, gray, points, None, **LK_PARAMS)
+        if moved is None:
+            return None
+        back, back_status, _ = cv2.calcOpticalFlowPyrLK(gray, self._prev_gray, moved, None, **LK_PARAMS)
+        error = np.linalg.norm((back - points).reshape(-1, 2), axis=1)
+        if not (status.all() and back_status.all()) or error.max() > self.max_track_error:
+            return None
+
+        from insightface.app.common import Face
+
+        tracked = []
+        moved = moved.reshape(len(self._faces), -1, 2)
+        for face, kps in zip(self._faces, moved):
+            M, _ = cv2.estimateAffinePartial2D(face.kps.astype(np.float32), kps)
+            if M is None:
+                return None
+            x0, y0, x1, y1 = face.bbox
+            corners = np.array([[x0, y0, 1], [x1, y1, 1]], dtype=np.float32) @ M.T
+            tracked.append(Face(bbox=corners.reshape(-1).astype(np.float32), kps=kps, det_score=face.det_score))
+        return tracked
+
+    def update(self, frame) -> list:
+        """
+        Returns:
+            list: Face objects (bbox, kps, det_score) of the target faces in frame.
+        """
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        thumbnail = cv2.resize(gray, SCENE_THUMBNAIL_SIZE, interpolation=cv2.INTER_AREA).astype(np.float32)
+
+        faces = None
+        scene_change = (
+            self._prev_thumbnail is not None
+            and float(np.abs(thumbnail - self._prev_thumbnail).mean()) > self.scene_change_threshold
+        )
+        if scene_change:
+            self.scene_changes += 1
+        elif self._prev_gray is not None and self._since_detection < self.detect_every:
+            faces = self._track(gray)
+            if faces is not None:
+                self.tracked_frames += 1
+                self._since_detection += 1
+        if faces is None:
+            faces = self._detect(frame)
+            self._since_detection = 1
+
+        self._faces = faces
+        self._prev_gray = gray
+        self._prev_thumbnail = thumbnail
+        return faces
+
+
+class VideoFaceSwap:
+    """
+    Streams a video through decode -> detect/track -> swap stages, each on its own thread and
+    connected by bounded queues, so memory stays flat however long the clip is. The consumer
+    of frames() (the encoder in swap_video) is the last stage.
+    """
+    def __init__(self, config: ConfigEntity = None):
+        try:
+            logging.info("Creating VideoSwapConfig...")
+            self.video_swap_config = VideoSwapConfig(config=config or ConfigEntity())
+        except Exception as e:
+            logging.error("Failed to initialize VideoSwapConfig", exc_info=True)
+            raise CustomException(e, sys) from e
+
+    @staticmethod
+    def probe(video_path: str) -> tuple:
+        """
+        Returns:
+            tuple: (fps, width, height, frame_count) of the video.
+        """
+        capture = cv2.VideoCapture(video_path)
+        try:
+            if not capture.isOpened():
+                raise ValueError(f"Could not open video: {video_path}")
+            fps = capture.get(cv2.CAP_PROP_FPS) or 25.0
+            return (
+                fps,
+                int(capture.get(cv2.CAP_PROP_FRAME_WIDTH)),
+                int(capture.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+                int(capture.get(cv2.CAP_PROP_FRAME_COUNT))
+            )
+        finally:
+            capture.release()
+
+    @staticmethod
+    def _put(q: queue.Queue, item, stop: threading.Event) -> bool:
+        while not stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    @staticmethod
+    def _get(q: queue.Queue, stop: threading.Event):
+        while not stop.is_set():
+            try:
+                return q.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        return _END
+
+    def _run_stage(self, name: str, work, inbox, outbox, stop: threading.Event, errors: list) -> None:
+        try:
+            if inbox is None:
+                for item in work():
+                    if not self._put(outbox, item, stop):
+                        return
+            else:
+                while True:
+                    item = self._get(inbox, stop)
+                    if item is _END:
+                        break
+                    if not self._put(outbox, work(item), stop):
+                        return
+        except Exception as e:
+            logging.error(f"Video {name} stage failed", exc_info=True)
+            errors.append(e)
+            stop.set()
+        finally:
+            self._put(outbox, _END, stop)
+
+    def frames(self, app, swapper, video_path: str, latent, tracker: FaceTracker = None):
+        """
+        Yields the swapped BGR frames of a video in order.
+
+        Args:
+            app (FaceAnalysis): Prepared face analysis app; only its detector is used.
+            swapper (INSwapper): Swapper model.
+            video_path (str): Path of the input video.
+            latent (np.ndarray): Source latent from SwapEngine.compute_latent or a registered identity.
+            tracker (FaceTracker): Optional tracker, e.g. to read its counters afterwards.
+        """
+        config = self.video_swap_config
+        swap_engine = SwapEngine(swapper)
+        tracker = tracker or FaceTracker(app, config.detect_every, config.scene_change_threshold, config.track_max_error)
+        capture = cv2.VideoCapture(video_path)
+        if not capture.isOpened():
+            raise CustomException(ValueError(f"Could not open video: {video_path}"), sys)
+
+        def decode():
+            try:
+                while True:
+                    ok, frame = capture.read()
+                    if not ok:
+                        return
+                    yield frame
+            finally:
+                capture.release()
+
+        def track(frame):
+            return frame, tracker.update(frame)
+
+        def swap(item):
+            frame, faces = item
+            if faces:
+                swap_engine.swap_batch(frame, faces, latent, inplace=True)
+            return frame
+
+        stop = threading.Event()
+        errors = []
+        decoded = queue.Queue(maxsize=config.queue_size)
+        tracked = queue.Queue(maxsize=config.queue_size)
+        swapped = queue.Queue(maxsize=config.queue_size)
+        threads = [
+            threading.Thread(target=self._run_stage, args=("decode", decode, None, decoded, stop, errors), name="video-decode", daemon=True),
+            threading.Thread(target=self._run_stage, args=("track", track, decoded, tracked, stop, errors), name="video-track", daemon=True),
+            threading.Thread(target=self._run_stage, args=("swap", swap, tracked, swapped, stop, errors), name="video-swap", daemon=True),
+        ]
+        for thread in threads:
+            thread.start()
+        try:
+            while True:
+                frame = self._get(swapped, stop)
+                if frame is _END:
+                    break
+                yield frame
+        finally:
+            stop.set()
+            for thread in threads:
+                thread.join()
+        if errors:
+            raise CustomException(errors[0], sys) from errors[0]
+
+    def swap_video(self, app, swapper, video_path: str, output_path: str, latent) -> VideoSwapArtifact:
+        """
+        Swaps the source face onto every face of a video and encodes the result to output_path.
+        The audio track is not carried over.
+        Returns:
+            VideoSwapArtifact: Output path, frame counts and throughput.
+        """
+        try:
+            config = self.video_swap_config
+            fps, width, height, _ = self.probe(video_path)
+            tracker = FaceTracker(app, config.detect_every, config.scene_change_threshold, config.track_max_error)
+            writer = cv2.VideoWriter(output_path, cv2.VideoWriter_fourcc(*config.fourcc), fps, (width, height))
+            if not writer.isOpened():
+                raise ValueError(f"Could not open video writer for {output_path}")
+
+            started_at = time.perf_counter()
+            frames = 0
+            try:
+                for frame in self.frames(app, swapper, video_path, latent, tracker=tracker):
+                    writer.write(frame)
+                    frames += 1
+            finally:
+                writer.release()
+            elapsed = time.perf_counter() - started_at
+
+            logging.info(f"Swapped {frames} frame(s) in {elapsed:.2f}s with {tracker.detections} detection(s).")
+            return VideoSwapArtifact(
+                output_path=output_path,
+                frames=frames,
+                fps=fps,
+                width=width,
+                height=height,
+                detections=tracker.detections,
+                tracked_frames=tracker.tracked_frames,
+                scene_changes=tracker.scene_changes,
+                elapsed_seconds=round(elapsed, 4),
+                throughput_fps=round(frames / elapsed, 2) if elapsed > 0 else 0.0
+            )
+        except Exception as e:
+            logging.error("Error during video face swap", exc_info=True)
+            raise CustomException(e, sys) from e
@@ -0,0 +1,370 @@
+from src.entity.face_swap_config import ConfigEntity, WorkerSupervisorConfig
+from src.components.model_registry import get_model_registry
+from src.components.model_store import get_model_store
+from src.exceptions import CustomException
+from src.logger import logging
+
+import gc
+import os
+import sys
+import time
+import select
+import signal
+import socket
+import threading
+import uvicorn
+
+STOP_SIGNALS = (signal.SIGINT, signal.SIGTERM, signal.SIGQUIT)
+# A worker that dies before it is ready is restarted after this delay, so a broken build does not spin
+RESTART_DELAY_SECONDS = 1.0
+# Give up when this many workers in a row die before becoming ready
+MAX_STARTUP_FAILURES = 5
+
+# Slot (0 .. workers - 1) of the current process when it is a worker forked by WorkerSupervisor
+_worker_index = None
+
+
+def get_worker_index():
+    """
+    Returns:
+        int: This worker's slot under WorkerSupervisor, or None in any other process.
+    """
+    return _worker_index
+
+
+def fork_unsafe_reason(config: ConfigEntity):
+    """
+    Models loaded before fork are only usable by the children when their ONNX Runtime sessions
+    own no thread pool: the pool's threads are not copied into a forked process.
+    Returns:
+        str: Why preloading is not possible with this configuration, or None.
+    """
+    if not hasattr(os, "fork"):
+        return "os.fork is not available on this platform"
+    if config.ort_intra_op_threads != 1:
+        return f"ONNX Runtime intra-op threads is {config.ort_intra_op_threads}, not 1"
+    if config.ort_execution_mode == "parallel" and config.ort_inter_op_threads != 1:
+        return f"ONNX Runtime runs in parallel mode with {config.ort_inter_op_threads} inter-op threads"
+    return None
+
+
+class _Worker:
+    def __init__(self, index: int, generation: int, pid: int, ready_fd: int):
+        self.index = index
+        self.generation = generation
+        self.pid = pid
+        self.ready_fd = ready_fd
+        self.started_at = time.monotonic()
+        self.ready_at = None
+        self.retiring = False
+
+
+class _WorkerServer(uvicorn.Server):
+    """
+    uvicorn server that tells the parent once its lifespan startup is done and it accepts connections.
+    """
+    def __init__(self, config: uvicorn.Config, ready_fd: int):
+        super().__init__(config)
+        self.ready_fd = ready_fd
+
+    async def startup(self, sockets: list = None) -> None:
+        await super().startup(sockets=sockets)
+        if self.started:
+            os.write(self.ready_fd, b"1")
+            os.close(self.ready_fd)
+
+
+class WorkerSupervisor:
+    """
+    Pre-fork process manager for the API.
+
+    The parent binds the listening socket, loads and warms up the models once and then forks
+    the uvicorn workers, which inherit the socket and the models: the weights and the imported
+    libraries are shared copy-on-write instead of being loaded N times. Workers that die are
+    restarted. SIGHUP reloads gracefully: the parent picks up changed weights, a new set of
+    workers is started, and the old ones are only asked to finish their requests and exit
+    once every new worker is ready. SIGTERM or SIGINT stops the workers gracefully.
+    """
+    def __init__(self, config: ConfigEntity = None):
+        try:
+            logging.info("Creating WorkerSupervisorConfig...")
+            self.worker_supervisor_config = WorkerSupervisorConfig(config=config or ConfigEntity())
+            self._workers = {}
+            self._generation = 0
+            self._signals = []
+            self._restarts = []
+            self._startup_failures = 0
+            self._preloaded = False
+            self._started_at = None
+            self._wakeup_fds = None
+        except Exception as e:
+            logging.error("Failed to initialize WorkerSupervisorConfig", exc_info=True)
+            raise CustomException(e, sys) from e
+
+    def bind(self) -> socket.socket:
+        config = self.worker_supervisor_config
+        family = socket.AF_INET6 if ":" in config.host else socket.AF_INET
+        sock = socket.socket(family, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind((config.host, config.port))
+        sock.listen(config.backlog)
+        sock.set_inheritable(True)
+        logging.info(f"Listening on {config.host}:{config.port}")
+        return sock
+
+    def preload(self) -> bool:
+        """
+        Fetches, loads and warms up the models in this process, when they can be shared with forked workers.
+        Returns:
+            bool: True if the models were loaded; otherwise every worker loads its own copy.
+        """
+        model_registry = get_model_registry()
+        reason = fork_unsafe_reason(model_registry.config)
+        if reason is not None:
+            logging.warning(f"Not preloading the models ({reason}); every worker loads its own copy.")
+            return False
+        try:
+            model_store = get_model_store()
+            if model_store.model_store_config.prefetch_on_startup:
+                for artifact in model_store.prefetch():
+                    if artifact.error is not None:
+                        logging.error(f"Model {artifact.name} is not installed: {artifact.error}")
+            model_registry.load()
+            self._check_no_threads()
+        except Exception:
+            logging.error("Preloading the models failed; every worker loads its own copy.", exc_info=True)
+            # The workers must not inherit models that are half loaded or that depend on threads
+            model_registry.unload()
+            return False
+        return True
+
+    @staticmethod
+    def _check_no_threads() -> None:
+        threads = [thread.name for thread in threading.enumerate() if thread is not threading.current_thread()]
+        if threads:
+            raise RuntimeError(f"Threads started before forking the workers would be missing in them: {threads}")
+
+    def _spawn(self, app, sock: socket.socket, index: int, generation: int) -> _Worker:
+        # Objects that exist now are shared with the worker; keep the collector from touching (and copying) them
+        gc.collect()
+        gc.freeze()
+        ready_r, ready_w = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            code = 1
+            try:
+                os.close(ready_r)
+                self._run_worker(app, sock, index, ready_w)
+                code = 0
+            except SystemExit as e:
+                code = e.code if isinstance(e.code, int) else 1
+            except BaseException:
+                logging.error(f"Worker {index} failed", exc_info=True)
+            finally:
+                os._exit(code)
+        os.close(ready_w)
+        worker = _Worker(index, generation, pid, ready_r)
+        self._workers[pid] = worker
+        logging.info(f"Started worker {index} (pid {pid}, generation {generation}).")
+        return worker
+
+    def _run_worker(self, app, sock: socket.socket, index: int, ready_fd: int) -> None:
+        """
+        Runs in the forked child: drops the parent's signal handling and serves on the inherited socket.
+        """
+        global _worker_index
+        _worker_index = index
+        signal.set_wakeup_fd(-1)
+        for sig in STOP_SIGNALS + (signal.SIGCHLD,):
+            signal.signal(sig, signal.SIG_DFL)
+        # Reloads are the parent's business
+        signal.signal(signal.SIGHUP, signal.SIG_IGN)
+        for fd in self._wakeup_fds:
+            os.close(fd)
+        for worker in self._workers.values():
+            if worker.ready_fd is not None:
+                os.close(worker.ready_fd)
+        self._workers = {}
+
+        config = uvicorn.Config(
+            app,
+            host=self.worker_supervisor_config.host,
+            port=self.worker_supervisor_config.port,
+            lifespan="on",
+            timeout_graceful_shutdown=self.worker_supervisor_config.graceful_timeout_seconds
+        )
+        _WorkerServer(config, ready_fd).run(sockets=[sock])
+
+    def _on_signal(self, sig, frame) -> None:
+        self._signals.append(sig)
+
+    def _install_signal_handlers(self) -> None:
+        wakeup_r, wakeup_w = os.pipe()
+        os.set_blocking(wakeup_r, False)
+        os.set_blocking(wakeup_w, False)
+        self._wakeup_fds = (wakeup_r, wakeup_w)
+        signal.set_wakeup_fd(wakeup_w)
+        for sig in STOP_SIGNALS + (signal.SIGHUP, signal.SIGCHLD):
+            signal.signal(sig, self._on_signal)
+
+    def _poll(self, timeout: float) -> None:
+        """
+        Waits up to timeout for a signal or a worker becoming ready, then reaps exited workers.
+        """
+        ready_fds = {worker.ready_fd: worker for worker in self._workers.values() if worker.ready_fd is not None}
+        readable, _, _ = select.select([self._wakeup_fds[0], *ready_fds], [], [], timeout)
+        for fd in readable:
+            if fd == self._wakeup_fds[0]:
+                try:
+                    os.read(fd, 4096)
+                except BlockingIOError:
+                    pass
+                continue
+            worker = ready_fds[fd]
+            if os.read(fd, 1):
+                worker.ready_at = time.monotonic()
+                self._startup_failures = 0
+                logging.info(f"Worker {worker.index} (pid {worker.pid}) ready in {worker.ready_at - worker.started_at:.2f} s.")
+            os.close(fd)
+            worker.ready_fd = None
+        self._reap()
+
+    def _reap(self) -> None:
+        while self._workers:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            worker = self._workers.pop(pid, None)
+            if worker is None:
+                continue
+            if worker.ready_fd is not None:
+                os.close(worker.ready_fd)
+            code = os.waitstatus_to_exitcode(status)
+            if worker.retiring:
+                logging.info(f"Worker {worker.index} (pid {pid}) exited with {code}.")
+                continue
+            logging.error(f"Worker {worker.index} (pid {pid}) died with {code}; restarting it.")
+            delay = 0.0
+            if worker.ready_at is None:
+                self._startup_failures += 1
+                delay = RESTART_DELAY_SECONDS
+            self._restarts.append((time.monotonic() + delay, worker.index, worker.generation))
+
+    def _current(self) -> list:
+        return [worker for worker in self._workers.values() if not worker.retiring]
+
+    def _stop_requested(self) -> bool:
+        return any(sig in STOP_SIGNALS for sig in self._signals)
+
+    def _retire(self, workers: list) -> None:
+        for worker in workers:
+            worker.retiring = True
+            try:
+                os.kill(worker.pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def reload(self, app, sock: socket.socket) -> bool:
+        """
+        Replaces every worker without dropping connections: the new workers share the listening
+        socket and the old ones stop accepting, finish their requests and exit once all new ones are ready.
+        Returns:
+            bool: True if the new workers took over; the old ones keep serving otherwise.
+        """
+        logging.info("Reloading workers...")
+        if self._preloaded:
+            try:
+                # Rebuilds the models only when the configuration or the weights changed
+                get_model_registry().load()
+                self._check_no_threads()
+            except Exception:
+                logging.error("Model reload failed; the current workers keep serving.", exc_info=True)
+                return False
+        started_at = time.monotonic()
+        old_workers = self._current()
+        generation = self._generation + 1
+        new_workers = [self._spawn(app, sock, index, generation) for index in range(self.worker_supervisor_config.workers)]
+        deadline = started_at + self.worker_supervisor_config.worker_startup_timeout_seconds
+        while time.monotonic() < deadline and not self._stop_requested():
+            if any(worker.pid not in self._workers for worker in new_workers):
+                break
+            if all(worker.ready_at is not None for worker in new_workers):
+                self._generation = generation
+                self._retire(old_workers)
+                self._restarts = [restart for restart in self._restarts if restart[2] == generation]
+                logging.info(f"Reload complete in {time.monotonic() - started_at:.2f} s (generation {generation}).")
+                return True
+            self._poll(0.5)
+        logging.error("New workers did not become ready; the current workers keep serving.")
+        self._restarts = [restart for restart in self._restarts if restart[2] != generation]
+        self._retire([worker for worker in new_workers if worker.pid in self._workers])
+        return False
+
+    def stop(self) -> None:
+        """
+        Asks every worker to finish its requests and exit; kills those still running after the graceful timeout.
+        """
+        logging.info(f"Stopping {len(self._workers)} worker(s)...")
+        self._signals.clear()
+        self._retire(list(self._workers.values()))
+        deadline = time.monotonic() + self.worker_supervisor_config.graceful_timeout_seconds + 5
+        while self._workers and time.monotonic() < deadline:
+            self._poll(0.2)
+            if self._stop_requested():
+                # A second stop signal: do not wait any longer
+                break
+        for worker in list(self._workers.values()):
+            logging.warning(f"Killing worker {worker.index} (pid {worker.pid}).")
+            os.kill(worker.pid, signal.SIGKILL)
+            os.waitpid(worker.pid, 0)
+            self._workers.pop(worker.pid)
+
+    def run(self, app) -> int:
+        """
+        Serves app until SIGTERM or SIGINT.
+        Returns:
+            int: The process exit code.
+        """
+        config = self.worker_supervisor_config
+        self._started_at = time.monotonic()
+        if not hasattr(os, "fork"):
+            logging.warning("os.fork is not available; serving with a single in-process worker.")
+            uvicorn.run(app, host=config.host, port=config.port, backlog=config.backlog,
+                        timeout_graceful_shutdown=config.graceful_timeout_seconds)
+            return 0
+
+        sock = self.bind()
+        try:
+            self._preloaded = config.preload_models and self.preload()
+            self._install_signal_handlers()
+            self._generation = 1
+            for index in range(config.workers):
+                self._spawn(app, sock, index, self._generation)
+
+            all_ready = False
+            while True:
+                self._poll(1.0)
+                signals, self._signals = self._signals, []
+                if any(sig in STOP_SIGNALS for sig in signals):
+                    self.stop()
+                    return 0
+                if signal.SIGHUP in signals:
+                    self.reload(app, sock)
+                if self._startup_failures >= MAX_STARTUP_FAILURES:
+                    logging.error(f"{self._startup_failures} workers in a row died during startup; stopping.")
+                    self.stop()
+                    return 1
+                now = time.monotonic()
+                for restart in [restart for restart in self._restarts if restart[0] <= now]:
+                    self._restarts.remove(restart)
+                    self._spawn(app, sock, restart[1], restart[2])
+                if not all_ready and len(self._current()) == config.workers and all(
+                        worker.ready_at is not None for worker in self._current()):
+                    all_ready = True
+                    logging.info(f"All {config.workers} worker(s) ready after {now - self._started_at:.2f} s "
+                                 f"(models preloaded: {self._preloaded}).")
+        finally:
+            sock.close()
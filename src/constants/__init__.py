@@ -1,4 +1,5 @@
 MODEL_NAME = "buffalo_l"
+MODEL_ROOT = "~/.insightface"  # the model pack is read from MODEL_ROOT/models/MODEL_NAME
 SWAPPER_MODEL_DIR = "weights/inswapper_128.onnx"
 
 CTX_ID = 0
@@ -9,4 +10,154 @@ OUTPUT_DIR = "artifacts"
 RESULT_IMAGE_DIR = "results"
 DETECTED_FACES_DIR = "detected_faces"
 
-DIRECT_URL = "https://drive.usercontent.google.com/download?id=1krOLgjW2tAPaqV-Bw4YALz0xT5zlb5HF&export=download&authuser=0"
\ No newline at end of file
+DIRECT_URL = "https://drive.usercontent.google.com/download?id=1krOLgjW2tAPaqV-Bw4YALz0xT5zlb5HF&export=download&authuser=0"
+
+# Model registry: models are loaded once per process and warmed up with a dummy inference
+WARMUP_ENABLED = True
+WARMUP_IMAGE_SIZE = (640, 640)
+
+# Face detection cache keyed by image content hash and detector configuration
+DETECTION_CACHE_MAX_BYTES = 256 * 1024 * 1024
+DETECTION_CACHE_MAX_ENTRIES = 2048
+
+# Source identities: embedding and precomputed swap latent, persisted as one .npz per identity
+IDENTITY_STORE_DIR = "identities"
+
+# "batched": one swapper call per wave of non-overlapping faces with ROI-local paste-back
+# "sequential": one swapper call and full-frame paste-back per face (reference path)
+SWAP_MODE = "batched"
+
+# In-memory request path: results are encoded once in memory; writing artifacts to disk is optional
+RESULT_IMAGE_FORMAT = "jpeg"
+RESULT_IMAGE_QUALITY = 100
+PERSIST_ARTIFACTS = False
+UPLOADS_DIR = "uploads"
+ARTIFACT_SINK_WORKERS = 2
+
+# Inference executor: blocking model work runs off the event loop in a bounded worker pool
+INFERENCE_EXECUTOR_KIND = "thread"  # "thread" or "process"
+INFERENCE_WORKERS = 2
+INFERENCE_QUEUE_SIZE = 16
+INFERENCE_TIMEOUT_SECONDS = 120
+INFERENCE_RETRY_AFTER_SECONDS = 5
+
+# Per-client upload sessions: "memory" (this process only) or "sqlite" (shared by all workers on the host)
+SESSION_BACKEND = "memory"
+SESSION_TTL_SECONDS = 30 * 60
+SESSION_MAX_ENTRIES = 256
+SESSION_DB_PATH = "sessions.sqlite3"
+
+
+# Batch jobs: albums are swapped by a worker pool against one registered source identity
+BATCH_JOBS_DIR = "jobs"
+BATCH_EXECUTOR_KIND = "process"  # "process" or "thread"
+BATCH_WORKERS = 2
+BATCH_MAX_ITEMS = 5000
+BATCH_INPUT_ROOT = "data"  # server-side directories outside this root are refused
+BATCH_STREAM_POLL_SECONDS = 0.5
+
+# Video swaps: full detection every N frames or on a scene change, optical-flow keypoint tracking in between
+VIDEO_DETECT_EVERY = 10
+VIDEO_SCENE_CHANGE_THRESHOLD = 30.0  # mean absolute difference of 64x36 grayscale thumbnails
+VIDEO_TRACK_MAX_ERROR = 2.0  # forward-backward optical flow error in pixels before forcing a detection
+VIDEO_QUEUE_SIZE = 8
+VIDEO_FOURCC = "mp4v"
+VIDEO_TIMEOUT_SECONDS = 900
+
+# Lean detection: only the detection and recognition models are loaded, and the detector input follows
+# the image size (at most DET_SIZE) instead of always being DET_SIZE
+DETECTION_MODE = "lean"  # "lean" or "full" (every model of the pack at the fixed DET_SIZE)
+DETECTION_MODULES = ("detection", "recognition")
+DETECTION_SIZE_STEP = 32  # detector input sides are rounded up to a multiple of the largest stride
+# A second pass runs only when the first one finds faces smaller than DETECTION_SMALL_FACE_PX detector
+# pixels (or none at all): at up to DETECTION_MULTISCALE_MAX_SIDE for large images, at DET_SIZE for small ones; 0 disables it
+DETECTION_MULTISCALE_MAX_SIDE = 1280
+DETECTION_SMALL_FACE_PX = 32
+
+# ONNX Runtime session options applied to every model (detector, recognition and swapper)
+ORT_PROVIDERS = ("CPUExecutionProvider",)
+ORT_INTRA_OP_THREADS = 0  # 0 lets ONNX Runtime use one thread per physical core
+ORT_INTER_OP_THREADS = 1
+ORT_EXECUTION_MODE = "sequential"  # "sequential" or "parallel"
+ORT_GRAPH_OPTIMIZATION_LEVEL = "all"  # "disabled", "basic", "extended" or "all"
+ORT_ENABLE_CPU_MEM_ARENA = True
+ORT_ENABLE_MEM_PATTERN = True
+ORT_ALLOW_SPINNING = True  # busy-wait between ops; disable when several workers share the cores
+# Optimized graphs are saved here on first load and reused on the next cold start; "" disables the cache
+ORT_OPTIMIZED_MODEL_DIR = "weights/optimized"
+
+# Opt-in dynamically quantized swapper: "fp32" or "int8" (quantized from the FP32 weights on first use)
+SWAPPER_PRECISION = "fp32"
+SWAPPER_INT8_MODEL_PATH = "weights/inswapper_128.int8.onnx"
+
+# Cross-request micro-batching of recognition crops and swapper inputs (models with a dynamic batch dimension only)
+MICRO_BATCH_ENABLED = False
+MICRO_BATCH_MAX_SIZE = 16
+MICRO_BATCH_MAX_WAIT_MS = 5.0
+
+# Metrics: per-stage timing spans exported in the Prometheus text format at /metrics
+METRICS_ENABLED = True
+METRICS_SERVER_TIMING = False  # add a Server-Timing header with the stage durations to every response
+METRICS_LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+METRICS_FACE_COUNT_BUCKETS = (0, 1, 2, 4, 8, 16, 32, 64)
+
+# Local model store: weights are streamed to "<path>.part" (resumed with HTTP Range requests after an
+# interruption), checked against their SHA-256 and moved into place atomically. An entry whose sha256 is
+# None is trusted on first download and pinned in the lock file; "archive" entries are zip files extracted to path.
+# The buffalo_l release asset has no published digest, so it is trusted on first use
+MODEL_STORE_MANIFEST = {
+    "inswapper_128": {
+        "version": "1",
+        "url": DIRECT_URL,
+        "path": SWAPPER_MODEL_DIR,
+        "sha256": "e4a3f08c753cb72d04e10aa0f7dbe3deebbf39567d4ead6dce08e98aa49e16af",
+    },
+    MODEL_NAME: {
+        "version": "0.7",
+        "url": f"https://github.com/deepinsight/insightface/releases/download/v0.7/{MODEL_NAME}.zip",
+        "path": f"{MODEL_ROOT}/models/{MODEL_NAME}",
+        "sha256": None,
+        "archive": True,
+    },
+}
+MODEL_STORE_LOCK_PATH = "weights/models.lock.json"
+MODEL_STORE_CHUNK_SIZE = 1024 * 1024
+MODEL_STORE_TIMEOUT_SECONDS = 60
+MODEL_STORE_RETRIES = 5
+MODEL_STORE_PREFETCH_ON_STARTUP = True
+
+# Face thumbnails returned by /upload-images/: each crop is downscaled to THUMBNAIL_MAX_EDGE and encoded
+# once ("jpeg" or "webp"); "coords" mode returns only the bounding boxes and the client crops the upload itself
+THUMBNAIL_MODE = "inline"  # "inline" or "coords"
+THUMBNAIL_FORMAT = "jpeg"
+THUMBNAIL_MAX_EDGE = 256
+THUMBNAIL_QUALITY = 85
+THUMBNAIL_WORKERS = 4
+THUMBNAIL_PARALLEL_MIN_FACES = 4  # fewer crops are encoded on the calling thread
+
+# Content-addressed result store: swapped images keyed by (target, source or identity, selected faces, model
+# version, output settings), indexed in SQLite and evicted by total size and age
+RESULT_STORE_ENABLED = True
+RESULT_STORE_DIR = "result_store"
+RESULT_STORE_INDEX_PATH = "result_store/index.sqlite3"
+RESULT_STORE_MAX_BYTES = 1024 * 1024 * 1024
+RESULT_STORE_MAX_AGE_SECONDS = 7 * 24 * 60 * 60
+
+# Gallery index: normed recognition embeddings of known people, one float32 row per enrolled face in a
+# memory-mapped matrix; detected faces are matched to people by cosine similarity
+GALLERY_DIR = "gallery"
+GALLERY_EMBEDDING_DIM = 512
+GALLERY_MATCH_THRESHOLD = 0.4
+
+# Serving (serve.py): preforked uvicorn workers share one listening socket. The parent process loads and
+# warms up the models once and forks the workers from it, so the weights are shared copy-on-write
+SERVE_HOST = "0.0.0.0"
+SERVE_PORT = 8000
+SERVE_WORKERS = 0  # 0 starts one worker per CPU core
+SERVE_PRELOAD_MODELS = True
+# ONNX Runtime intra-op threads of each worker. Sessions can only be created before forking when this is 1
+# (a thread pool does not survive fork); None keeps ORT_INTRA_OP_THREADS and loads the models per worker
+SERVE_ORT_INTRA_OP_THREADS = 1
+SERVE_BACKLOG = 2048
+SERVE_GRACEFUL_TIMEOUT_SECONDS = 30
+SERVE_WORKER_STARTUP_TIMEOUT_SECONDS = 120
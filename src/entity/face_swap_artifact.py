@@ -1,4 +1,6 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+from typing import Optional
+import numpy as np
 
 @dataclass
 class ModelInitializationArtifact:
@@ -8,4 +10,168 @@ class ModelInitializationArtifact:
 class SwapperModelArtifact:
     result_image_path: str
     detected_face_paths: list
-    base64_faces: list
\ No newline at end of file
+    thumbnails: list
+    result_image: Optional[np.ndarray] = None
+    result_image_bytes: Optional[bytes] = None
+    result_media_type: Optional[str] = None
+    faces: Optional[list] = None
+    cached: bool = False
+    matches: Optional[list] = None
+
+@dataclass
+class ModelRegistryArtifact:
+    status: str
+    model_name: str
+    swapper_model_path: str
+    load_time_seconds: Optional[float] = None
+    warmup_time_seconds: Optional[float] = None
+    loaded_at: Optional[str] = None
+    reload_count: int = 0
+    error: Optional[str] = None
+
+@dataclass
+class DetectionCacheArtifact:
+    entries: int
+    bytes_used: int
+    max_bytes: int
+    hits: int
+    misses: int
+    evictions: int
+    hit_rate: float
+
+@dataclass
+class SourceIdentityArtifact:
+    identity_id: str
+    embedding: np.ndarray
+    latent: np.ndarray
+    latent_model: str
+    det_score: float
+    created_at: str
+
+@dataclass
+class InferenceExecutorArtifact:
+    kind: str
+    workers: int
+    queue_size: int
+    in_flight: int
+    queue_depth: int
+    completed: int
+    failed: int
+    rejected: int
+    timed_out: int
+    cancelled: int
+    avg_wait_seconds: float
+    p95_wait_seconds: float
+    max_wait_seconds: float
+
+@dataclass
+class SessionArtifact:
+    multi_face_bytes: bytes
+    single_face_bytes: Optional[bytes]
+    multi_face_hash: str
+    identity_id: Optional[str]
+    faces: list
+    detected_faces: list
+    img_multi_faces: Optional[np.ndarray] = None
+    img_single_face: Optional[np.ndarray] = None
+    session_id: Optional[str] = None
+    created_at: float = 0.0
+    expires_at: float = 0.0
+
+@dataclass
+class BatchJobArtifact:
+    job_id: str
+    identity_id: Optional[str]
+    output_format: str
+    status: str
+    created_at: str
+    items: list
+    updated_at: Optional[str] = None
+    finished: list = field(default_factory=list)
+    mapping: Optional[dict] = None
+
+
+@dataclass
+class VideoSwapArtifact:
+    output_path: str
+    frames: int
+    fps: float
+    width: int
+    height: int
+    detections: int
+    tracked_frames: int
+    scene_changes: int
+    elapsed_seconds: float
+    throughput_fps: float
+
+
+@dataclass
+class MicroBatchArtifact:
+    name: str
+    batches: int
+    items: int
+    avg_batch_size: float
+    max_batch_size: int
+    avg_queue_wait_ms: float
+    failed_batches: int
+
+
+@dataclass
+class ModelStoreArtifact:
+    name: str
+    version: str
+    path: str
+    installed: bool
+    sha256: Optional[str] = None
+    size_bytes: Optional[int] = None
+    fetched_at: Optional[str] = None
+    error: Optional[str] = None
+
+
+@dataclass
+class ThumbnailArtifact:
+    index: int
+    bbox: list
+    width: Optional[int] = None
+    height: Optional[int] = None
+    media_type: Optional[str] = None
+    data: Optional[bytes] = None
+    path: Optional[str] = None
+
+
+@dataclass
+class StoredResultArtifact:
+    key: str
+    path: str
+    media_type: str
+    size_bytes: int
+    created_at: float
+    data: Optional[bytes] = None
+
+
+@dataclass
+class ResultStoreArtifact:
+    enabled: bool
+    entries: int
+    bytes_used: int
+    max_bytes: int
+    hits: int
+    misses: int
+    evictions: int
+    hit_rate: float
+
+
+@dataclass
+class GalleryPersonArtifact:
+    person_id: str
+    label: Optional[str]
+    entries: int
+    created_at: str
+
+
+@dataclass
+class GalleryMatchArtifact:
+    face_index: int
+    person_id: Optional[str]
+    label: Optional[str]
+    similarity: float
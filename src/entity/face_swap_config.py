@@ -1,26 +1,281 @@
 from src.exceptions import CustomException
 from src.logger import logging
 from src.constants import *
+import os
+
+# Attribute overrides applied to every ConfigEntity created in this process (and in processes forked
+# from it), e.g. by serve.py for its workers; later reloads keep them
+CONFIG_OVERRIDES = {}
 
 class ConfigEntity:
     def __init__(self):
         self.model_name = MODEL_NAME
+        self.model_root = MODEL_ROOT
         self.swapper_model_dir = SWAPPER_MODEL_DIR
         self.ctx_id = CTX_ID
         self.det_size = DET_SIZE
         self.output_dir = OUTPUT_DIR
         self.result_image_dir = RESULT_IMAGE_DIR
         self.detected_faces_dir = DETECTED_FACES_DIR
+        self.warmup_enabled = WARMUP_ENABLED
+        self.warmup_image_size = WARMUP_IMAGE_SIZE
+        self.detection_cache_max_bytes = DETECTION_CACHE_MAX_BYTES
+        self.detection_cache_max_entries = DETECTION_CACHE_MAX_ENTRIES
+        self.identity_store_dir = IDENTITY_STORE_DIR
+        self.swap_mode = SWAP_MODE
+        self.result_image_format = RESULT_IMAGE_FORMAT
+        self.result_image_quality = RESULT_IMAGE_QUALITY
+        self.persist_artifacts = PERSIST_ARTIFACTS
+        self.uploads_dir = UPLOADS_DIR
+        self.artifact_sink_workers = ARTIFACT_SINK_WORKERS
+        self.inference_executor_kind = INFERENCE_EXECUTOR_KIND
+        self.inference_workers = INFERENCE_WORKERS
+        self.inference_queue_size = INFERENCE_QUEUE_SIZE
+        self.inference_timeout_seconds = INFERENCE_TIMEOUT_SECONDS
+        self.inference_retry_after_seconds = INFERENCE_RETRY_AFTER_SECONDS
+        self.session_backend = SESSION_BACKEND
+        self.session_ttl_seconds = SESSION_TTL_SECONDS
+        self.session_max_entries = SESSION_MAX_ENTRIES
+        self.session_db_path = SESSION_DB_PATH
+        self.batch_jobs_dir = BATCH_JOBS_DIR
+        self.batch_executor_kind = BATCH_EXECUTOR_KIND
+        self.batch_workers = BATCH_WORKERS
+        self.batch_max_items = BATCH_MAX_ITEMS
+        self.batch_input_root = BATCH_INPUT_ROOT
+        self.batch_stream_poll_seconds = BATCH_STREAM_POLL_SECONDS
+        self.video_detect_every = VIDEO_DETECT_EVERY
+        self.video_scene_change_threshold = VIDEO_SCENE_CHANGE_THRESHOLD
+        self.video_track_max_error = VIDEO_TRACK_MAX_ERROR
+        self.video_queue_size = VIDEO_QUEUE_SIZE
+        self.video_fourcc = VIDEO_FOURCC
+        self.video_timeout_seconds = VIDEO_TIMEOUT_SECONDS
+        self.detection_mode = DETECTION_MODE
+        self.detection_modules = DETECTION_MODULES
+        self.detection_size_step = DETECTION_SIZE_STEP
+        self.detection_multiscale_max_side = DETECTION_MULTISCALE_MAX_SIDE
+        self.detection_small_face_px = DETECTION_SMALL_FACE_PX
+        self.ort_providers = ORT_PROVIDERS
+        self.ort_intra_op_threads = ORT_INTRA_OP_THREADS
+        self.ort_inter_op_threads = ORT_INTER_OP_THREADS
+        self.ort_execution_mode = ORT_EXECUTION_MODE
+        self.ort_graph_optimization_level = ORT_GRAPH_OPTIMIZATION_LEVEL
+        self.ort_enable_cpu_mem_arena = ORT_ENABLE_CPU_MEM_ARENA
+        self.ort_enable_mem_pattern = ORT_ENABLE_MEM_PATTERN
+        self.ort_allow_spinning = ORT_ALLOW_SPINNING
+        self.ort_optimized_model_dir = ORT_OPTIMIZED_MODEL_DIR
+        self.swapper_precision = SWAPPER_PRECISION
+        self.swapper_int8_model_path = SWAPPER_INT8_MODEL_PATH
+        self.micro_batch_enabled = MICRO_BATCH_ENABLED
+        self.micro_batch_max_size = MICRO_BATCH_MAX_SIZE
+        self.micro_batch_max_wait_ms = MICRO_BATCH_MAX_WAIT_MS
+        self.metrics_enabled = METRICS_ENABLED
+        self.metrics_server_timing = METRICS_SERVER_TIMING
+        self.metrics_latency_buckets = METRICS_LATENCY_BUCKETS
+        self.metrics_face_count_buckets = METRICS_FACE_COUNT_BUCKETS
+        self.model_store_manifest = MODEL_STORE_MANIFEST
+        self.model_store_lock_path = MODEL_STORE_LOCK_PATH
+        self.model_store_chunk_size = MODEL_STORE_CHUNK_SIZE
+        self.model_store_timeout_seconds = MODEL_STORE_TIMEOUT_SECONDS
+        self.model_store_retries = MODEL_STORE_RETRIES
+        self.model_store_prefetch_on_startup = MODEL_STORE_PREFETCH_ON_STARTUP
+        self.thumbnail_mode = THUMBNAIL_MODE
+        self.thumbnail_format = THUMBNAIL_FORMAT
+        self.thumbnail_max_edge = THUMBNAIL_MAX_EDGE
+        self.thumbnail_quality = THUMBNAIL_QUALITY
+        self.thumbnail_workers = THUMBNAIL_WORKERS
+        self.thumbnail_parallel_min_faces = THUMBNAIL_PARALLEL_MIN_FACES
+        self.result_store_enabled = RESULT_STORE_ENABLED
+        self.result_store_dir = RESULT_STORE_DIR
+        self.result_store_index_path = RESULT_STORE_INDEX_PATH
+        self.result_store_max_bytes = RESULT_STORE_MAX_BYTES
+        self.result_store_max_age_seconds = RESULT_STORE_MAX_AGE_SECONDS
+        self.gallery_dir = GALLERY_DIR
+        self.gallery_embedding_dim = GALLERY_EMBEDDING_DIM
+        self.gallery_match_threshold = GALLERY_MATCH_THRESHOLD
+        self.serve_host = SERVE_HOST
+        self.serve_port = SERVE_PORT
+        self.serve_workers = SERVE_WORKERS
+        self.serve_preload_models = SERVE_PRELOAD_MODELS
+        self.serve_ort_intra_op_threads = SERVE_ORT_INTRA_OP_THREADS
+        self.serve_backlog = SERVE_BACKLOG
+        self.serve_graceful_timeout_seconds = SERVE_GRACEFUL_TIMEOUT_SECONDS
+        self.serve_worker_startup_timeout_seconds = SERVE_WORKER_STARTUP_TIMEOUT_SECONDS
+        for name, value in CONFIG_OVERRIDES.items():
+            if not hasattr(self, name):
+                raise AttributeError(f"Unknown configuration override: {name}")
+            setattr(self, name, value)
 
 class ModelInitializerConfig:
     def __init__(self, config: ConfigEntity):
         self.model_name = config.model_name
+        self.model_root = config.model_root
         self.ctx_id = config.ctx_id
         self.det_size = config.det_size
+        self.swapper_model_dir = config.swapper_model_dir
+        self.detection_mode = config.detection_mode
+        self.detection_modules = config.detection_modules
+        self.swapper_precision = config.swapper_precision
+        self.swapper_int8_model_path = config.swapper_int8_model_path
 
 class SwapperModelConfig:
     def __init__(self, config: ConfigEntity):
         self.swapper_model_dir = config.swapper_model_dir
         self.output_dir = config.output_dir
         self.result_image_dir = config.result_image_dir
-        self.detected_faces_dir = config.detected_faces_dir
\ No newline at end of file
+        self.detected_faces_dir = config.detected_faces_dir
+        self.swap_mode = config.swap_mode
+        self.result_image_format = config.result_image_format
+        self.result_image_quality = config.result_image_quality
+
+class ModelRegistryConfig:
+    def __init__(self, config: ConfigEntity):
+        self.model_name = config.model_name
+        self.model_root = config.model_root
+        self.ctx_id = config.ctx_id
+        self.det_size = config.det_size
+        self.swapper_model_dir = config.swapper_model_dir
+        self.warmup_enabled = config.warmup_enabled
+        self.warmup_image_size = config.warmup_image_size
+        self.detection_mode = config.detection_mode
+        self.detection_modules = config.detection_modules
+        self.swapper_precision = config.swapper_precision
+        self.swapper_int8_model_path = config.swapper_int8_model_path
+        self.onnx_runtime_config = OnnxRuntimeConfig(config)
+
+class DetectionCacheConfig:
+    def __init__(self, config: ConfigEntity):
+        self.max_bytes = config.detection_cache_max_bytes
+        self.max_entries = config.detection_cache_max_entries
+
+class IdentityRegistryConfig:
+    def __init__(self, config: ConfigEntity):
+        self.identity_store_dir = os.path.join(config.output_dir, config.identity_store_dir)
+
+class ArtifactSinkConfig:
+    def __init__(self, config: ConfigEntity):
+        self.enabled = config.persist_artifacts
+        self.output_dir = config.output_dir
+        self.uploads_dir = config.uploads_dir
+        self.workers = config.artifact_sink_workers
+
+class InferenceExecutorConfig:
+    def __init__(self, config: ConfigEntity):
+        self.kind = config.inference_executor_kind
+        self.workers = config.inference_workers
+        self.queue_size = config.inference_queue_size
+        self.timeout_seconds = config.inference_timeout_seconds
+        self.retry_after_seconds = config.inference_retry_after_seconds
+
+class SessionStoreConfig:
+    def __init__(self, config: ConfigEntity):
+        self.backend = config.session_backend
+        self.ttl_seconds = config.session_ttl_seconds
+        self.max_entries = config.session_max_entries
+        self.db_path = os.path.join(config.output_dir, config.session_db_path)
+
+class BatchJobConfig:
+    def __init__(self, config: ConfigEntity):
+        self.jobs_dir = os.path.join(config.output_dir, config.batch_jobs_dir)
+        self.kind = config.batch_executor_kind
+        self.workers = config.batch_workers
+        self.max_items = config.batch_max_items
+        self.input_root = config.batch_input_root
+        self.stream_poll_seconds = config.batch_stream_poll_seconds
+        self.output_format = config.result_image_format
+
+
+class VideoSwapConfig:
+    def __init__(self, config: ConfigEntity):
+        self.detect_every = config.video_detect_every
+        self.scene_change_threshold = config.video_scene_change_threshold
+        self.track_max_error = config.video_track_max_error
+        self.queue_size = config.video_queue_size
+        self.fourcc = config.video_fourcc
+        self.timeout_seconds = config.video_timeout_seconds
+
+
+class FaceDetectorConfig:
+    def __init__(self, config: ConfigEntity):
+        self.mode = config.detection_mode
+        self.det_size = config.det_size
+        self.size_step = config.detection_size_step
+        self.multiscale_max_side = config.detection_multiscale_max_side
+        self.small_face_px = config.detection_small_face_px
+
+
+class OnnxRuntimeConfig:
+    def __init__(self, config: ConfigEntity):
+        self.providers = tuple(config.ort_providers)
+        self.intra_op_threads = config.ort_intra_op_threads
+        self.inter_op_threads = config.ort_inter_op_threads
+        self.execution_mode = config.ort_execution_mode
+        self.graph_optimization_level = config.ort_graph_optimization_level
+        self.enable_cpu_mem_arena = config.ort_enable_cpu_mem_arena
+        self.enable_mem_pattern = config.ort_enable_mem_pattern
+        self.allow_spinning = config.ort_allow_spinning
+        self.optimized_model_dir = config.ort_optimized_model_dir
+
+
+class MicroBatchConfig:
+    def __init__(self, config: ConfigEntity):
+        self.enabled = config.micro_batch_enabled
+        self.max_size = config.micro_batch_max_size
+        self.max_wait_ms = config.micro_batch_max_wait_ms
+
+
+class MetricsConfig:
+    def __init__(self, config: ConfigEntity):
+        self.enabled = config.metrics_enabled
+        self.server_timing = config.metrics_server_timing
+        self.latency_buckets = config.metrics_latency_buckets
+        self.face_count_buckets = config.metrics_face_count_buckets
+
+
+class ModelStoreConfig:
+    def __init__(self, config: ConfigEntity):
+        self.manifest = config.model_store_manifest
+        self.lock_path = config.model_store_lock_path
+        self.chunk_size = config.model_store_chunk_size
+        self.timeout_seconds = config.model_store_timeout_seconds
+        self.retries = config.model_store_retries
+        self.prefetch_on_startup = config.model_store_prefetch_on_startup
+
+
+class ThumbnailConfig:
+    def __init__(self, config: ConfigEntity):
+        self.mode = config.thumbnail_mode
+        self.image_format = config.thumbnail_format
+        self.max_edge = config.thumbnail_max_edge
+        self.quality = config.thumbnail_quality
+        self.workers = config.thumbnail_workers
+        self.parallel_min_faces = config.thumbnail_parallel_min_faces
+        self.detected_faces_dir = config.detected_faces_dir
+
+
+class ResultStoreConfig:
+    def __init__(self, config: ConfigEntity):
+        self.enabled = config.result_store_enabled
+        self.store_dir = os.path.join(config.output_dir, config.result_store_dir)
+        self.index_path = os.path.join(config.output_dir, config.result_store_index_path)
+        self.max_bytes = config.result_store_max_bytes
+        self.max_age_seconds = config.result_store_max_age_seconds
+        self.swap_mode = config.swap_mode
+        self.result_image_quality = config.result_image_quality
+
+
+class GalleryIndexConfig:
+    def __init__(self, config: ConfigEntity):
+        self.gallery_dir = os.path.join(config.output_dir, config.gallery_dir)
+        self.embedding_dim = config.gallery_embedding_dim
+        self.match_threshold = config.gallery_match_threshold
+
+
+class WorkerSupervisorConfig:
+    def __init__(self, config: ConfigEntity):
+        self.host = config.serve_host
+        self.port = config.serve_port
+        self.workers = config.serve_workers or os.cpu_count() or 1
+        self.preload_models = config.serve_preload_models
+        self.backlog = config.serve_backlog
+        self.graceful_timeout_seconds = config.serve_graceful_timeout_seconds
+        self.worker_startup_timeout_seconds = config.serve_worker_startup_timeout_seconds
@@ -15,4 +15,24 @@ class CustomException(Exception):
         self.error_message=error_message_detail(error_message,error_detail=error_detail)
    
     def __str__(self):
-        return self.error_message
\ No newline at end of file
+        return self.error_message
+
+class InferenceQueueFullError(Exception):
+    """
+    Raised when the inference executor's admission queue is full.
+    """
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class InferenceTimeoutError(Exception):
+    """
+    Raised when an inference request does not finish within its timeout.
+    """
+
+
+class ModelIntegrityError(Exception):
+    """
+    Raised when downloaded or installed model weights do not match their expected SHA-256.
+    """
@@ -1,60 +1,301 @@
 import cv2
 import sys
-from src.components.model_initializer import ModelInitializer
+import json
+from src.components.model_registry import ModelRegistry, get_model_registry
 from src.components.faceswap import FaceSwap
+from src.components.identity_registry import IdentityRegistry, get_identity_registry
+from src.components.detection_cache import get_detection_cache
+from src.components.gallery_index import GalleryIndex, get_gallery_index
+from src.components.swap_engine import SwapEngine
+from src.components.video_swap import VideoFaceSwap
+from src.components.metrics import get_metrics
 from src.entity.face_swap_artifact import SwapperModelArtifact
+from src.utils import compute_image_hash, serialize_faces, deserialize_faces
 from src.logger import logging
 from src.exceptions import CustomException
 
-def initiate_face_swapper(multi_face_img_path: str, single_face_img_path: str, selected_indices: list = None):
+def _load_image(image, description: str):
+    """
+    Accepts a file path or an already-decoded BGR array.
+    """
+    if isinstance(image, str):
+        loaded = cv2.imread(image)
+        if loaded is None:
+            raise FileNotFoundError(f"{description} image not found: {image}")
+        return loaded
+    if image is None:
+        raise ValueError(f"{description} image is None")
+    return image
+
+def initiate_face_swapper(multi_face_img_path, single_face_img_path=None, selected_indices: list = None,
+                          model_registry: ModelRegistry = None, source_identity_id: str = None,
+                          identity_registry: IdentityRegistry = None, detect_only: bool = False,
+                          output_format: str = None, multi_face_hash: str = None, faces: list = None,
+                          save_faces: bool = True, name_prefix: str = None, thumbnail_mode: str = None,
+                          mapping: dict = None, match_threshold: float = None, gallery_index: GalleryIndex = None):
+    """
+    Runs detection and, unless detect_only is set, the face swap.
+
+    The images may be file paths or decoded BGR arrays (the in-memory request path).
+    A decoded multi-face array passed in by the caller is never modified; an image the
+    pipeline loads from disk itself is swapped in place. Detections returned by an earlier
+    call (artifact.faces) can be passed back as faces to skip detection and face crops.
+    With save_faces=False the faces are detected without building the face thumbnails;
+    name_prefix (e.g. the session id) names the directory persisted thumbnails go to and
+    thumbnail_mode="coords" returns the face boxes without encoding any crop.
+
+    With a mapping {gallery person id: source identity id} the targets are chosen by who they
+    are: the detected faces are matched against the gallery index and every face matched to a
+    mapped person is swapped with that person's source identity, all in one pass. The matches
+    are returned as artifact.matches; selected_indices, if given, further restricts the faces.
+    """
     try:
         logging.info("=== Starting Face Swap Pipeline ===")
 
-        logging.info("Initializing FaceAnalysis model...")
-        model_initializer = ModelInitializer()
-        face_analysis_app = model_initializer.initialize_model()
+        metrics = get_metrics()
+        logging.info("Fetching models from the model registry...")
+        model_registry = model_registry or get_model_registry()
+        with metrics.span("model_fetch"):
+            face_analysis_app, swapper = model_registry.get_models()
 
-        logging.info(f"Loading input images: {multi_face_img_path}, {single_face_img_path}")
-        img_multi_faces = cv2.imread(multi_face_img_path)
-        img_single_face = cv2.imread(single_face_img_path)
+        source_identity = None
+        mapped_identities = None
+        if mapping is not None:
+            if not mapping:
+                raise ValueError("The mapping must name at least one gallery person")
+            identity_registry = identity_registry or get_identity_registry()
+            gallery_index = gallery_index or get_gallery_index()
+            mapped_identities = {}
+            with metrics.span("identity_lookup"):
+                for person_id, identity_id in mapping.items():
+                    if gallery_index.get(person_id) is None:
+                        raise ValueError(f"Unknown gallery person: {person_id}")
+                    mapped_identities[person_id] = identity_registry.get(identity_id, swapper)
+                    if mapped_identities[person_id] is None:
+                        raise ValueError(f"Unknown source identity: {identity_id}")
+        elif source_identity_id is not None:
+            identity_registry = identity_registry or get_identity_registry()
+            with metrics.span("identity_lookup"):
+                source_identity = identity_registry.get(source_identity_id, swapper)
+            if source_identity is None:
+                raise ValueError(f"Unknown source identity: {source_identity_id}")
+        elif single_face_img_path is None:
+            raise ValueError("Either a single-face image or a source identity id is required")
 
-        if img_multi_faces is None:
-            raise FileNotFoundError(f"Multi-face image not found: {multi_face_img_path}")
-        if img_single_face is None:
-            raise FileNotFoundError(f"Single-face image not found: {single_face_img_path}")
+        logging.info("Loading input images...")
+        with metrics.span("load_images"):
+            img_multi_faces = _load_image(multi_face_img_path, "Multi-face")
+            owns_multi_face_image = isinstance(multi_face_img_path, str)
+
+            img_single_face = None
+            if source_identity is None and mapped_identities is None:
+                img_single_face = _load_image(single_face_img_path, "Single-face")
 
         logging.info("Input images loaded successfully.")
+        if multi_face_hash is None:
+            with metrics.span("image_hash"):
+                multi_face_hash = compute_image_hash(img_multi_faces)
 
         face_swapper = FaceSwap()
-        faces, face_paths, base64_faces = face_swapper.detect_and_save_faces(face_analysis_app, img_multi_faces)
-        logging.info(f"Detected face paths: {face_paths}")
+        # An identical earlier swap (same images, faces, models and output settings) is served from the result store
+        result_key, single_face_hash = None, None
+        if not detect_only and face_swapper.result_store.enabled:
+            if mapped_identities is not None:
+                # Matches depend on the gallery contents and the threshold as well as the mapping
+                source = "mapping:" + json.dumps(
+                    [mapping, match_threshold, gallery_index.version], sort_keys=True, separators=(",", ":"))
+            elif source_identity is not None:
+                source = f"identity:{source_identity.identity_id}"
+            else:
+                with metrics.span("image_hash"):
+                    single_face_hash = compute_image_hash(img_single_face)
+                source = f"image:{single_face_hash}"
+            result_key = face_swapper.result_store.key(
+                multi_face_hash, source, selected_indices, model_registry.version,
+                output_format or face_swapper.swapper_model_config.result_image_format
+            )
+            with metrics.span("result_lookup"):
+                stored = face_swapper.result_store.get(result_key)
+            if stored is not None:
+                logging.info(f"Returning stored result {stored.path}")
+                return SwapperModelArtifact(
+                    result_image_path=stored.path,
+                    detected_face_paths=[],
+                    thumbnails=[],
+                    result_image_bytes=stored.data,
+                    result_media_type=stored.media_type,
+                    faces=faces,
+                    cached=True
+                )
+
+        if faces is not None and mapped_identities is not None and any(face.get("embedding") is None for face in faces):
+            logging.info("Previous detections carry no embeddings; detecting again for gallery matching.")
+            faces = None
+        if faces is not None:
+            logging.info(f"Reusing {len(faces)} previously detected face(s).")
+            faces = deserialize_faces(faces)
+            thumbnails = []
+        elif not save_faces:
+            with metrics.span("detect"):
+                faces = face_swapper.detection_cache.detect(face_analysis_app, img_multi_faces, image_hash=multi_face_hash)
+            metrics.observe_faces(len(faces))
+            thumbnails = []
+        else:
+            faces, thumbnails = face_swapper.detect_and_save_faces(
+                face_analysis_app, img_multi_faces, image_hash=multi_face_hash,
+                name_prefix=name_prefix, thumbnail_mode=thumbnail_mode
+            )
+            metrics.observe_faces(len(faces))
+        face_paths = [thumbnail.path for thumbnail in thumbnails if thumbnail.path]
+        if face_paths:
+            logging.info(f"Detected face paths: {face_paths}")
 
-        artifact = SwapperModelArtifact(result_image_path="", detected_face_paths=face_paths, base64_faces=base64_faces)
+        with metrics.span("serialize_faces"):
+            serialized_faces = serialize_faces(faces)
+        artifact = SwapperModelArtifact(result_image_path="", detected_face_paths=face_paths, thumbnails=thumbnails,
+                                        faces=serialized_faces)
         if selected_indices is None:
             logging.info("No indices provided; selecting all detected faces for swapping.")
             selected_indices = list(range(len(faces)))
 
-        if not faces:
-            logging.info("No faces to swap; returning detection artifact.")
+        if not faces or detect_only:
+            logging.info("Nothing to swap; returning detection artifact.")
             return artifact
 
+        face_latents, matches = None, None
+        if mapped_identities is not None:
+            with metrics.span("gallery_match"):
+                matches = gallery_index.match([face.normed_embedding for face in faces], match_threshold)
+            face_latents = {
+                match.face_index: mapped_identities[match.person_id].latent
+                for match in matches
+                if match.person_id in mapped_identities and match.face_index in selected_indices
+            }
+            logging.info(f"Gallery matches: {[(m.face_index, m.person_id, m.similarity) for m in matches]}")
+            artifact.matches = matches
+            selected_indices = sorted(face_latents)
+
         logging.info(f"Selected face indices: {selected_indices}")
 
         artifact = face_swapper.perform_face_swapping(
             app=face_analysis_app,
+            swapper=swapper,
             img_multi_faces=img_multi_faces,
             img_single_face=img_single_face,
-            selected_indices=selected_indices
+            selected_indices=selected_indices,
+            multi_face_hash=multi_face_hash,
+            single_face_hash=single_face_hash,
+            source_identity=source_identity,
+            inplace=owns_multi_face_image,
+            output_format=output_format,
+            faces_multi=faces,
+            result_key=result_key,
+            face_latents=face_latents
         )
+        artifact.matches = matches
         artifact.detected_face_paths = face_paths
-        artifact.base64_faces = base64_faces
+        artifact.thumbnails = thumbnails
+        artifact.faces = serialized_faces
 
-        logging.info(f"Face swap completed. Result saved at: {artifact.result_image_path}")
-        logging.info(f"Detected faces saved at: {artifact.detected_face_paths}")
+        logging.info(f"Face swap completed. Result path: {artifact.result_image_path or 'not persisted'}")
 
         logging.info("=== Pipeline Completed Successfully ===")
         return artifact
 
     except Exception as e:
         logging.error("Pipeline execution failed.", exc_info=True)
-        raise CustomException(e, sys) from e
\ No newline at end of file
+        raise CustomException(e, sys) from e
+
+def initiate_identity_registration(single_face_img, model_registry: ModelRegistry = None,
+                                   identity_registry: IdentityRegistry = None):
+    """
+    Registers the face in a single-face image (path or decoded BGR array) as a reusable source identity.
+    """
+    try:
+        logging.info("=== Starting Identity Registration ===")
+        model_registry = model_registry or get_model_registry()
+        face_analysis_app, swapper = model_registry.get_models()
+        img_single_face = _load_image(single_face_img, "Single-face")
+        identity_registry = identity_registry or get_identity_registry()
+        return identity_registry.register(face_analysis_app, swapper, img_single_face)
+    except Exception as e:
+        logging.error("Identity registration failed.", exc_info=True)
+        raise CustomException(e, sys) from e
+
+def initiate_gallery_enrollment(image, person_id: str = None, label: str = None,
+                                model_registry: ModelRegistry = None, gallery_index: GalleryIndex = None):
+    """
+    Enrolls the most confidently detected face of an image (path or decoded BGR array) in the
+    gallery index, as a new person or as another photo of person_id.
+    """
+    try:
+        logging.info("=== Starting Gallery Enrollment ===")
+        model_registry = model_registry or get_model_registry()
+        face_analysis_app, _ = model_registry.get_models()
+        img = _load_image(image, "Gallery")
+        faces = get_detection_cache().detect(face_analysis_app, img)
+        if not faces:
+            raise ValueError("No faces detected in the gallery image!")
+        face = max(faces, key=lambda f: f.det_score)
+        gallery_index = gallery_index or get_gallery_index()
+        return gallery_index.add(face.normed_embedding, person_id=person_id, label=label)
+    except Exception as e:
+        logging.error("Gallery enrollment failed.", exc_info=True)
+        raise CustomException(e, sys) from e
+
+def initiate_gallery_match(image, match_threshold: float = None, model_registry: ModelRegistry = None,
+                           gallery_index: GalleryIndex = None):
+    """
+    Detects the faces of an image (path or decoded BGR array) and matches them against the gallery index.
+    Returns:
+        tuple: (serialized faces, one GalleryMatchArtifact per face).
+    """
+    try:
+        model_registry = model_registry or get_model_registry()
+        face_analysis_app, _ = model_registry.get_models()
+        img = _load_image(image, "Multi-face")
+        metrics = get_metrics()
+        with metrics.span("detect"):
+            faces = get_detection_cache().detect(face_analysis_app, img)
+        gallery_index = gallery_index or get_gallery_index()
+        with metrics.span("gallery_match"):
+            matches = gallery_index.match([face.normed_embedding for face in faces], match_threshold)
+        return serialize_faces(faces), matches
+    except Exception as e:
+        logging.error("Gallery matching failed.", exc_info=True)
+        raise CustomException(e, sys) from e
+
+def initiate_video_face_swap(video_path: str, output_path: str, single_face_img_path=None,
+                             source_identity_id: str = None, model_registry: ModelRegistry = None,
+                             identity_registry: IdentityRegistry = None):
+    """
+    Swaps the source face (single-face image or registered identity) onto every face of a video.
+    The source latent is computed once; frames are streamed through VideoFaceSwap.
+    """
+    try:
+        logging.info("=== Starting Video Face Swap Pipeline ===")
+        model_registry = model_registry or get_model_registry()
+        face_analysis_app, swapper = model_registry.get_models()
+        swap_engine = SwapEngine(swapper)
+
+        if source_identity_id is not None:
+            identity_registry = identity_registry or get_identity_registry()
+            source_identity = identity_registry.get(source_identity_id, swapper)
+            if source_identity is None:
+                raise ValueError(f"Unknown source identity: {source_identity_id}")
+            latent = source_identity.latent
+        elif single_face_img_path is not None:
+            img_single_face = _load_image(single_face_img_path, "Single-face")
+            faces_single = get_detection_cache().detect(face_analysis_app, img_single_face)
+            if not faces_single:
+                raise ValueError("No faces detected in the single-face image!")
+            latent = swap_engine.compute_latent(faces_single[0].normed_embedding)
+        else:
+            raise ValueError("Either a single-face image or a source identity id is required")
+
+        artifact = VideoFaceSwap().swap_video(face_analysis_app, swapper, video_path, output_path, latent)
+        logging.info(f"=== Video Pipeline Completed: {artifact.frames} frame(s) at {artifact.throughput_fps} fps ===")
+        return artifact
+    except Exception as e:
+        logging.error("Video pipeline execution failed.", exc_info=True)
+        raise CustomException(e, sys) from e
@@ -1,92 +1,98 @@
 import os
-import requests
-from tqdm import tqdm
-import re
-from urllib.parse import urlencode
-from src.constants import DIRECT_URL
+import hashlib
+import cv2
+import numpy as np
 
-def download_weights(url, save_path):
+def compute_image_hash(image) -> str:
     """
-    Download pre-trained model weights from a Google Drive URL and save them locally.
-    
+    Compute a content hash of a decoded image array (pixels, shape and dtype).
+
     Args:
-        url (str): Direct URL to download the weights from.
-        save_path (str): Local path to save the weights.
+        image (np.ndarray): Decoded image.
+    Returns:
+        str: Hex digest identifying the image content.
     """
-    os.makedirs(os.path.dirname(save_path), exist_ok=True)
+    digest = hashlib.blake2b(digest_size=20)
+    digest.update(f"{image.shape}|{image.dtype}".encode("utf-8"))
+    digest.update(memoryview(image if image.flags.c_contiguous else image.copy()).cast("B"))
+    return digest.hexdigest()
 
-    if os.path.exists(save_path):
-        print(f"Weights already exist at {save_path}")
-        return
+def serialize_faces(faces: list) -> list:
+    """
+    Convert insightface Face objects into plain dicts. Face cannot be pickled, so this is needed
+    before detections cross a process boundary or go into a shared session store.
+    """
+    return [dict(face) for face in faces]
 
-    try:
-        session = requests.Session()
-        response = session.get(url, allow_redirects=True)
+def deserialize_faces(records: list) -> list:
+    """
+    Rebuild insightface Face objects from serialize_faces() output; Face objects pass through unchanged.
+    """
+    from insightface.app.common import Face
+    return [record if isinstance(record, Face) else Face(record) for record in records]
+
+IMAGE_FORMATS = {
+    "jpeg": (".jpg", "image/jpeg", cv2.IMWRITE_JPEG_QUALITY),
+    "webp": (".webp", "image/webp", cv2.IMWRITE_WEBP_QUALITY),
+}
 
-        if "Virus scan warning" in response.text or "Download anyway" in response.text:
-            confirm_match = re.search(r'<input type="hidden" name="confirm" value="([^"]+)"', response.text)
-            uuid_match = re.search(r'<input type="hidden" name="uuid" value="([^"]+)"', response.text)
-            id_match = re.search(r'<input type="hidden" name="id" value="([^"]+)"', response.text)
-            export_match = re.search(r'<input type="hidden" name="export" value="([^"]+)"', response.text)
-            authuser_match = re.search(r'<input type="hidden" name="authuser" value="([^"]+)"', response.text)
+def decode_image_bytes(data: bytes):
+    """
+    Decode an encoded image (JPEG, PNG, WebP, ...) held in memory into a BGR array.
+
+    Args:
+        data (bytes): Encoded image content, e.g. an upload body.
+    Returns:
+        np.ndarray: Decoded BGR image, or None if the bytes are not a decodable image.
+    """
+    if not data:
+        return None
+    return cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
 
-            if confirm_match and uuid_match:
-                form_data = {
-                    "id": id_match.group(1) if id_match else "1krOLgjW2tAPaqV-Bw4YALz0xT5zlb5HF",
-                    "export": export_match.group(1) if export_match else "download",
-                    "authuser": authuser_match.group(1) if authuser_match else "0",
-                    "confirm": confirm_match.group(1),
-                    "uuid": uuid_match.group(1)
-                }
-                print(f"Extracted form parameters: {form_data}")
-                
-                form_action = "https://drive.usercontent.google.com/download"
-                download_url = f"{form_action}?{urlencode(form_data)}"
+def encode_image(image, image_format: str = "jpeg", quality: int = 95) -> tuple[bytes, str, str]:
+    """
+    Encode a BGR image in memory.
 
-                response = session.get(download_url, stream=True, allow_redirects=True)
-            else:
-                print("Could not extract required form parameters.")
-                print(f"Confirm: {confirm_match.group(1) if confirm_match else 'Not found'}")
-                print(f"UUID: {uuid_match.group(1) if uuid_match else 'Not found'}")
-                return
+    Args:
+        image (np.ndarray): BGR image.
+        image_format (str): "jpeg" or "webp".
+        quality (int): Encoder quality, 1-100.
+    Returns:
+        tuple: (encoded bytes, file extension, media type).
+    """
+    if image_format not in IMAGE_FORMATS:
+        raise ValueError(f"Unsupported image format: {image_format}. Expected one of {sorted(IMAGE_FORMATS)}")
+    extension, media_type, quality_flag = IMAGE_FORMATS[image_format]
+    success, buffer = cv2.imencode(extension, image, [int(quality_flag), int(quality)])
+    if not success:
+        raise ValueError(f"Failed to encode image as {image_format}")
+    return buffer.tobytes(), extension, media_type
 
-        if response.status_code == 200:
-            total_size = int(response.headers.get("content-length", 0))
-            if total_size == 0:
-                print("Warning: Content-length not provided, progress bar may not be accurate.")
+def download_weights(url, save_path, expected_sha256=None):
+    """
+    Download pre-trained model weights and save them locally. The download is streamed to
+    "<save_path>.part", resumed after an interruption and only moved into place once complete.
 
-            with open(save_path, "wb") as file, tqdm(
-                desc="Downloading",
-                total=total_size,
-                unit="B",
-                unit_scale=True,
-                unit_divisor=1024,
-            ) as progress_bar:
-                for chunk in response.iter_content(chunk_size=8192):
-                    if chunk:
-                        file.write(chunk)
-                        progress_bar.update(len(chunk))
+    Args:
+        url (str): Direct URL to download the weights from (Google Drive confirmation pages are handled).
+        save_path (str): Local path to save the weights.
+        expected_sha256 (str): Optional SHA-256 the downloaded file must match.
+    """
+    from src.components.model_store import get_model_store
 
-            print(f"Weights downloaded successfully and saved at {save_path}")
-        else:
-            print(f"Failed to download weights. Status code: {response.status_code}")
-            print(f"Response content (first 500 chars): {response.text[:500]}")
-    except Exception as e:
-        print(f"An error occurred: {str(e)}")
+    if os.path.exists(save_path):
+        print(f"Weights already exist at {save_path}")
+        return
+    get_model_store().download(url, save_path, expected_sha256=expected_sha256)
+    print(f"Weights downloaded successfully and saved at {save_path}")
 
 def download_weights_from_google_drive():
-    # Google Drive download URL
-    direct_url = DIRECT_URL 
-    # Determine the project root from src/utils/__init__.py
-    current_file_dir = os.path.dirname(os.path.abspath(__file__))
-    project_root = os.path.abspath(os.path.join(current_file_dir, "..", ".."))
+    """
+    Install the inswapper weights listed in the model store manifest, verifying an existing copy.
 
-    # Target weights directory and file path
-    weights_dir = os.path.join(project_root, "weights")
-    weights_filename = "inswapper_128.onnx"
-    save_path = os.path.join(weights_dir, weights_filename)
+    Returns:
+        str: Path of the weights file.
+    """
+    from src.components.model_store import get_model_store
 
-    # Attempt download
-    print(f"Attempting to download from: {direct_url}")
-    print(f"Saving to: {save_path}")
-    download_weights(direct_url, save_path)
+    return get_model_store().ensure("inswapper_128")
@@ -0,0 +1,11 @@
+import pytest
+
+from benchmarks.stand_in_models import ensure_stand_in_models
+
+
+@pytest.fixture(scope="session")
+def stand_in_models(tmp_path_factory):
+    """
+    (model root, pack name, swapper path) of the stand-in ONNX models, built once per test session.
+    """
+    return ensure_stand_in_models(str(tmp_path_factory.mktemp("stand_in_models")))
@@ -0,0 +1,38 @@
+import io
+
+import pytest
+from fastapi.testclient import TestClient
+
+import src.components.identity_registry as identity_registry_module
+from app import app
+from src.components.identity_registry import IdentityRegistry
+from src.entity.face_swap_config import ConfigEntity
+
+IMAGE = ("image.jpg", io.BytesIO(b"not decoded before the identity is checked"), "image/jpeg")
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    config = ConfigEntity()
+    config.output_dir = str(tmp_path)
+    monkeypatch.setattr(identity_registry_module, "_identity_registry", IdentityRegistry(config=config))
+    # Without the context manager the lifespan does not run, so no models are loaded
+    return TestClient(app)
+
+
+@pytest.mark.parametrize("identity_id, status_code", [("../../etc/passwd", 400), ("0" * 16, 404)])
+def test_upload_images_rejects_bad_identity_ids(client, identity_id, status_code):
+    response = client.post("/upload-images/", files={"multi_face_image": IMAGE}, data={"identity_id": identity_id})
+    assert response.status_code == status_code
+
+
+@pytest.mark.parametrize("identity_id, status_code", [("not-an-id", 400), ("f" * 16, 404)])
+def test_swap_video_rejects_bad_identity_ids(client, identity_id, status_code):
+    response = client.post("/swap-video/", files={"video": ("clip.mp4", io.BytesIO(b""), "video/mp4")},
+                           data={"identity_id": identity_id})
+    assert response.status_code == status_code
+
+
+def test_batch_job_rejects_malformed_identity_id(client):
+    response = client.post("/jobs/", files={"target_images": IMAGE}, data={"identity_id": "x"})
+    assert response.status_code == 400
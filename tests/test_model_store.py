@@ -0,0 +1,167 @@
+import hashlib
+import json
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import src.components.model_store as model_store_module
+from src.components.model_store import ModelStore
+from src.entity.face_swap_config import ConfigEntity
+from src.exceptions import ModelIntegrityError
+
+PAYLOAD = os.urandom(300 * 1024)
+
+
+class _ModelServer(ThreadingHTTPServer):
+    """
+    Serves PAYLOAD with Range support. drop_after cuts the first full response off after that
+    many bytes; corrupt flips a byte in every response.
+    """
+    daemon_threads = True
+
+    def __init__(self, drop_after: int = None, corrupt: bool = False):
+        super().__init__(("127.0.0.1", 0), _ModelHandler)
+        self.drop_after = drop_after
+        self.corrupt = corrupt
+        self.ranges = []
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}/inswapper_128.onnx"
+
+
+class _ModelHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args) -> None:
+        pass
+
+    def do_GET(self) -> None:
+        server = self.server
+        body = bytearray(PAYLOAD)
+        if server.corrupt:
+            body[len(body) // 2] ^= 0xFF
+        requested = self.headers.get("Range")
+        server.ranges.append(requested)
+        start = int(requested[len("bytes="):].rstrip("-")) if requested else 0
+        self.send_response(206 if requested else 200)
+        self.send_header("Content-Type", "application/octet-stream")
+        self.send_header("Content-Length", str(len(body) - start))
+        if requested:
+            self.send_header("Content-Range", f"bytes {start}-{len(body) - 1}/{len(body)}")
+        self.end_headers()
+        if server.drop_after is not None and not requested:
+            # Announce the whole file, send part of it and hang up
+            self.wfile.write(bytes(body[:server.drop_after]))
+            self.wfile.flush()
+            server.drop_after = None
+            self.close_connection = True
+            return
+        self.wfile.write(bytes(body[start:]))
+
+
+@pytest.fixture
+def serve_model():
+    servers = []
+
+    def start(**kwargs) -> _ModelServer:
+        server = _ModelServer(**kwargs)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.fixture(autouse=True)
+def no_retry_delay(monkeypatch):
+    monkeypatch.setattr(model_store_module.time, "sleep", lambda seconds: None)
+
+
+def _store(tmp_path, url: str, sha256: str = None) -> ModelStore:
+    config = ConfigEntity()
+    config.model_store_manifest = {
+        "inswapper_128": {"version": "1", "url": url, "path": str(tmp_path / "weights" / "inswapper_128.onnx"), "sha256": sha256}
+    }
+    config.model_store_lock_path = str(tmp_path / "weights" / "models.lock.json")
+    config.model_store_chunk_size = 16 * 1024
+    config.model_store_timeout_seconds = 10
+    config.model_store_retries = 3
+    return ModelStore(config)
+
+
+def test_dropped_connection_resumes_with_range_request(tmp_path, serve_model):
+    server = serve_model(drop_after=100 * 1024)
+    model_store = _store(tmp_path, server.url, sha256=hashlib.sha256(PAYLOAD).hexdigest())
+
+    path = model_store.ensure("inswapper_128")
+
+    with open(path, "rb") as f:
+        assert f.read() == PAYLOAD
+    # Resumed from the bytes that reached the .part file before the connection dropped
+    assert server.ranges[0] is None
+    assert 0 < int(server.ranges[1][len("bytes="):].rstrip("-")) <= 100 * 1024
+    assert len(server.ranges) == 2
+    assert not os.path.exists(f"{path}.part")
+    with open(tmp_path / "weights" / "models.lock.json") as f:
+        assert json.load(f)["inswapper_128"]["sha256"] == hashlib.sha256(PAYLOAD).hexdigest()
+    assert model_store.verify("inswapper_128")
+
+
+def test_corrupted_body_is_rejected(tmp_path, serve_model):
+    server = serve_model(corrupt=True)
+    model_store = _store(tmp_path, server.url, sha256=hashlib.sha256(PAYLOAD).hexdigest())
+    path = model_store.path("inswapper_128")
+
+    with pytest.raises(ModelIntegrityError):
+        model_store.ensure("inswapper_128")
+
+    assert not os.path.exists(path)
+    assert not os.path.exists(f"{path}.part")
+    assert not model_store.status("inswapper_128").installed
+
+
+def test_stale_partial_file_is_downloaded_again(tmp_path, serve_model):
+    server = serve_model()
+    model_store = _store(tmp_path, server.url, sha256=hashlib.sha256(PAYLOAD).hexdigest())
+    path = model_store.path("inswapper_128")
+    os.makedirs(os.path.dirname(path))
+    with open(f"{path}.part", "wb") as f:
+        f.write(os.urandom(50 * 1024))
+
+    model_store.ensure("inswapper_128")
+
+    # The resumed file fails the checksum, so it is fetched again from the first byte
+    assert server.ranges == [f"bytes={50 * 1024}-", None]
+    with open(path, "rb") as f:
+        assert f.read() == PAYLOAD
+
+
+def test_installed_copy_that_does_not_match_the_pinned_digest_is_replaced(tmp_path, serve_model):
+    server = serve_model()
+    model_store = _store(tmp_path, server.url)
+    path = model_store.path("inswapper_128")
+    os.makedirs(os.path.dirname(path))
+    with open(path, "wb") as f:
+        f.write(bytes(reversed(PAYLOAD)))
+    # Adopted, and trusted on first use, while the manifest pinned no digest
+    model_store.ensure("inswapper_128")
+    assert model_store.status("inswapper_128").installed
+    assert server.ranges == []
+
+    pinned_store = _store(tmp_path, server.url, sha256=hashlib.sha256(PAYLOAD).hexdigest())
+    assert not pinned_store.status("inswapper_128").installed
+    pinned_store.ensure("inswapper_128")
+
+    with open(path, "rb") as f:
+        assert f.read() == PAYLOAD
+    assert any(name.startswith("inswapper_128.onnx.corrupt-") for name in os.listdir(tmp_path / "weights"))
+
+
+def test_pinned_manifest_digests():
+    manifest = ConfigEntity().model_store_manifest
+    assert manifest["inswapper_128"]["sha256"] == "e4a3f08c753cb72d04e10aa0f7dbe3deebbf39567d4ead6dce08e98aa49e16af"
+
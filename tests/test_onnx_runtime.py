@@ -0,0 +1,52 @@
+import os
+import shutil
+
+import src.components.onnx_runtime as onnx_runtime
+from benchmarks.stand_in_models import build_swapper
+from src.components.onnx_runtime import ensure_quantized_swapper
+
+
+def _read(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def test_int8_swapper_follows_the_fp32_weights(stand_in_models, tmp_path, monkeypatch):
+    fp32_path = str(tmp_path / "inswapper_128.onnx")
+    int8_path = str(tmp_path / "inswapper_128.int8.onnx")
+    shutil.copy(stand_in_models[2], fp32_path)
+    quantized = []
+    quantize_swapper = onnx_runtime.quantize_swapper
+    monkeypatch.setattr(onnx_runtime, "quantize_swapper", lambda *args: quantized.append(args) or quantize_swapper(*args))
+
+    ensure_quantized_swapper(fp32_path, int8_path)
+    assert len(quantized) == 1 and os.path.exists(int8_path)
+
+    # Same weights, touched: re-hashed, not quantized again
+    ensure_quantized_swapper(fp32_path, int8_path)
+    stat = os.stat(fp32_path)
+    os.utime(fp32_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    ensure_quantized_swapper(fp32_path, int8_path)
+    assert len(quantized) == 1
+
+    # New weights of the same size
+    first_int8 = _read(int8_path)
+    build_swapper(fp32_path, seed=1)
+    assert os.path.getsize(fp32_path) == os.path.getsize(stand_in_models[2])
+    ensure_quantized_swapper(fp32_path, int8_path)
+    assert len(quantized) == 2
+    assert _read(int8_path) != first_int8
+
+
+def test_int8_swapper_without_source_record_is_quantized_again(stand_in_models, tmp_path):
+    fp32_path = str(tmp_path / "inswapper_128.onnx")
+    int8_path = str(tmp_path / "inswapper_128.int8.onnx")
+    shutil.copy(stand_in_models[2], fp32_path)
+    # A copy left by a version that did not record its source
+    with open(int8_path, "wb") as f:
+        f.write(b"stale")
+
+    ensure_quantized_swapper(fp32_path, int8_path)
+
+    assert _read(int8_path) != b"stale"
+    assert os.path.exists(f"{int8_path}.source.json")
@@ -0,0 +1,44 @@
+import cv2
+import numpy as np
+import pytest
+
+from src.components.session_store import MemorySessionStore, SessionStore, SqliteSessionStore
+from src.entity.face_swap_artifact import SessionArtifact
+from src.entity.face_swap_config import ConfigEntity
+
+
+def test_incomplete_backend_fails_when_created():
+    class NoDeleteSessionStore(SessionStore):
+        def create(self, session):
+            return "id"
+
+        def get(self, session_id):
+            return None
+
+        def __len__(self):
+            return 0
+
+    with pytest.raises(TypeError, match="delete"):
+        NoDeleteSessionStore()
+
+
+@pytest.mark.parametrize("store_class", [MemorySessionStore, SqliteSessionStore])
+def test_session_round_trip(store_class, tmp_path):
+    config = ConfigEntity()
+    config.output_dir = str(tmp_path)
+    session_store = store_class(config=config)
+    image = np.full((32, 48, 3), 127, dtype=np.uint8)
+    session = SessionArtifact(
+        multi_face_bytes=cv2.imencode(".png", image)[1].tobytes(), single_face_bytes=None,
+        multi_face_hash="hash", identity_id="0" * 16, faces=[], detected_faces=[], img_multi_faces=image
+    )
+
+    session_id = session_store.create(session)
+
+    assert len(session_store) == 1
+    stored = session_store.get(session_id)
+    assert stored.identity_id == "0" * 16
+    assert np.array_equal(stored.img_multi_faces, image)
+    assert session_store.delete(session_id)
+    assert session_store.get(session_id) is None
+    assert not session_store.delete(session_id)
@@ -0,0 +1,75 @@
+import cv2
+import numpy as np
+import onnx
+import pytest
+from insightface import model_zoo
+from insightface.app.common import Face
+from insightface.utils.face_align import arcface_dst
+
+from src.components.swap_engine import SwapEngine
+
+
+def _face(center_x: float, center_y: float, size: float) -> Face:
+    """
+    A target face whose five keypoints are the ArcFace template scaled to size and centered on (center_x, center_y).
+    """
+    kps = (arcface_dst - 56.0) / 112.0 * size + np.array([center_x, center_y], dtype=np.float32)
+    return Face(kps=kps.astype(np.float32))
+
+
+def _swapper(swapper_path: str, tmp_path, dynamic_batch: bool):
+    if dynamic_batch:
+        model = onnx.load(swapper_path)
+        for value in list(model.graph.input) + list(model.graph.output):
+            value.type.tensor_type.shape.dim[0].dim_param = "N"
+        swapper_path = str(tmp_path / "inswapper_dynamic.onnx")
+        onnx.save(model, swapper_path)
+    return model_zoo.get_model(swapper_path, providers=["CPUExecutionProvider"])
+
+
+@pytest.mark.parametrize("dynamic_batch", [False, True], ids=["fixed-batch", "dynamic-batch"])
+def test_swap_batch_matches_inswapper_face_by_face(stand_in_models, tmp_path, dynamic_batch):
+    swapper = _swapper(stand_in_models[2], tmp_path, dynamic_batch)
+    swap_engine = SwapEngine(swapper)
+    assert swap_engine.supports_batching == dynamic_batch
+
+    rng = np.random.default_rng(0)
+    img = cv2.GaussianBlur(rng.integers(0, 256, (480, 640, 3), dtype=np.uint8), (7, 7), 0)
+    target_faces = [
+        _face(200, 220, 110),
+        # Overlaps the first face: its crop contains pixels the first face pastes into
+        _face(250, 240, 100),
+        _face(320, 120, 90),
+        # Partly outside the image, at the left edge and in the bottom-right corner
+        _face(15, 300, 100),
+        _face(630, 470, 120),
+        # Further overlapping faces, so the crops of later waves depend on earlier ones
+        _face(275, 255, 95),
+        _face(500, 200, 80),
+    ]
+    source_face = Face(embedding=rng.standard_normal(512).astype(np.float32))
+
+    expected = img.copy()
+    for face in target_faces:
+        expected = swapper.get(expected, face, source_face, paste_back=True)
+    latent = swap_engine.compute_latent(source_face.normed_embedding)
+    result = swap_engine.swap_batch(img, target_faces, latent)
+
+    diff = np.abs(result.astype(np.int16) - expected.astype(np.int16))
+    assert np.count_nonzero(expected != img) > 0
+    assert int(diff.max()) <= 1
+
+
+def test_swap_batch_inplace_matches_copy(stand_in_models, tmp_path):
+    swap_engine = SwapEngine(_swapper(stand_in_models[2], tmp_path, dynamic_batch=True))
+    rng = np.random.default_rng(1)
+    img = cv2.GaussianBlur(rng.integers(0, 256, (360, 480, 3), dtype=np.uint8), (7, 7), 0)
+    target_faces = [_face(150, 180, 120), _face(190, 200, 110), _face(470, 20, 100)]
+    latent = swap_engine.compute_latent(Face(embedding=rng.standard_normal(512).astype(np.float32)).normed_embedding)
+
+    result = swap_engine.swap_batch(img, target_faces, latent)
+    inplace = img.copy()
+    returned = swap_engine.swap_batch(inplace, target_faces, latent, inplace=True)
+
+    assert returned is inplace
+    assert np.array_equal(result, inplace)